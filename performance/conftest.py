@@ -0,0 +1,136 @@
+# Copyright 2019 StreamSets Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+import threading
+import time
+
+import pytest
+
+logger = logging.getLogger(__name__)
+
+HEAP_USED_GAUGE = 'jvm.memory.heap.used'
+
+
+class MetricMonitor:
+    """Samples a metric of a running pipeline from a background thread, recording when every sample was taken.
+
+    Args:
+        sdc_executor (:py:class:`streamsets.testframework.sdc.DataCollector`): Data Collector running the pipeline.
+        pipeline (:py:class:`streamsets.sdk.sdc_models.Pipeline`): Pipeline to sample the metrics of.
+        get_metric (:obj:`callable`): Function taking the pipeline's metrics, as the REST API returns them, to the
+            metric's value, or ``None`` if there is none yet.
+        interval_sec (:obj:`float`, optional): Time between samples. Default: ``1``
+    """
+    def __init__(self, sdc_executor, pipeline, get_metric, interval_sec=1):
+        self.sdc_executor = sdc_executor
+        self.pipeline = pipeline
+        self.get_metric = get_metric
+        self.interval_sec = interval_sec
+        self.samples = []
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    @property
+    def values(self):
+        """Values seen, in sampling order."""
+        return [value for _, value in self.samples]
+
+    def first_time_at_least(self, value):
+        """Return the time of the first sample of at least value."""
+        return next(sample_time for sample_time, sample_value in self.samples if sample_value >= value)
+
+    def wait_for_at_least(self, value, timeout_sec=3600):
+        """Wait until a sample of at least value was taken."""
+        start_time = time.time()
+        while not self.samples or self.samples[-1][1] < value:
+            if time.time() - start_time > timeout_sec:
+                raise TimeoutError(f'Timed out after {timeout_sec} s waiting for a sample of at least {value}')
+            time.sleep(self.interval_sec)
+
+    def _sample(self):
+        try:
+            metrics = self.sdc_executor.api_client.get_pipeline_metrics(self.pipeline.id)
+        except Exception as e:
+            logger.debug('Could not get metrics of pipeline %s: %s', self.pipeline.id, e)
+            return
+        value = self.get_metric(metrics)
+        if value is not None:
+            self.samples.append((time.time(), value))
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._sample()
+            self._stopped.wait(self.interval_sec)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self._stopped.set()
+        self._thread.join()
+        # The last sample has to be taken after whatever the caller waited for.
+        self._sample()
+
+
+class HeapMonitor(MetricMonitor):
+    """Samples the JVM heap usage reported in a running pipeline's metrics from a background thread.
+
+    Args:
+        sdc_executor (:py:class:`streamsets.testframework.sdc.DataCollector`): Data Collector running the pipeline.
+        pipeline (:py:class:`streamsets.sdk.sdc_models.Pipeline`): Pipeline to sample the metrics of.
+        interval_sec (:obj:`float`, optional): Time between samples. Default: ``1``
+    """
+    def __init__(self, sdc_executor, pipeline, interval_sec=1):
+        super().__init__(sdc_executor, pipeline,
+                         lambda metrics: metrics.get('gauges', {}).get(HEAP_USED_GAUGE, {}).get('value'),
+                         interval_sec)
+
+    @property
+    def peak(self):
+        """Highest heap usage seen, in bytes."""
+        return max(self.values, default=0)
+
+    @property
+    def growth(self):
+        """Difference between the last and the first heap usage seen, in bytes."""
+        return self.values[-1] - self.values[0] if self.samples else 0
+
+
+@pytest.fixture
+def heap_monitor(sdc_executor):
+    """Returns a context manager that samples the heap usage of a pipeline while it runs.
+
+    Args:
+        pipeline (:py:class:`streamsets.sdk.sdc_models.Pipeline`): The pipeline to sample.
+        interval_sec (:obj:`float`, optional): Time between samples. Default: ``1``
+    """
+    def heap_monitor_(pipeline, interval_sec=1):
+        return HeapMonitor(sdc_executor, pipeline, interval_sec)
+    return heap_monitor_
+
+
+@pytest.fixture
+def metric_monitor(sdc_executor):
+    """Returns a context manager that samples a metric of a pipeline while it runs.
+
+    Args:
+        pipeline (:py:class:`streamsets.sdk.sdc_models.Pipeline`): The pipeline to sample.
+        get_metric (:obj:`callable`): Function taking the pipeline's metrics to the metric's value, or ``None``.
+        interval_sec (:obj:`float`, optional): Time between samples. Default: ``1``
+    """
+    def metric_monitor_(pipeline, get_metric, interval_sec=1):
+        return MetricMonitor(sdc_executor, pipeline, get_metric, interval_sec)
+    return metric_monitor_
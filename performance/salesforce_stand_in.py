@@ -0,0 +1,811 @@
+# Copyright 2019 StreamSets Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Stand-in for the parts of the Salesforce APIs the Salesforce stages use, for the performance tests to run against
+instead of an org, whose data storage and API requests run out long before the tests are done.
+
+It is an HTTPS server keeping sObjects in memory, which answers:
+
+- SOAP API login, describeSObject, describeSObjects, query, queryAll, queryMore and create calls.
+- Bulk API job and batch requests, for query jobs and for insert jobs with CSV or XML data.
+
+SOQL is understood as far as the tests use it: fields, COUNT aggregates, subqueries on child relationships, conditions
+joined by AND, GROUP BY, ORDER BY and LIMIT. Responses follow the partner WSDL and Bulk API schema of API_VERSION.
+
+The server certificate is issued when the stand-in starts, for the address SDC reaches it at, by a CertificateAuthority
+made for the test session, whose certificate SDC gets to trust from the JKS truststore it writes.
+"""
+
+import collections
+import csv
+import datetime
+import gzip
+import hashlib
+import http.server
+import io
+import ipaddress
+import itertools
+import logging
+import os
+import re
+import socket
+import socketserver
+import ssl
+import struct
+import tempfile
+import threading
+import time
+import urllib.parse
+from xml.etree import ElementTree
+from xml.sax.saxutils import escape
+
+from cryptography import x509
+from cryptography.hazmat.backends import default_backend
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.x509.oid import NameOID
+
+logger = logging.getLogger(__name__)
+
+API_VERSION = '43.0'
+# Days the certificates of the CertificateAuthority are valid for, which only has to outlast a test session.
+CERTIFICATE_VALIDITY_DAYS = 2
+
+ORGANIZATION_ID = '00D000000000001AAA'
+USER_ID = '005000000000001AAA'
+SOAP_PATH = '/services/Soap/u/'
+BULK_PATH = '/services/async/'
+# Records per query response without a QueryOptions header, and the range the header can set.
+DEFAULT_QUERY_BATCH_SIZE = 500
+MIN_QUERY_BATCH_SIZE = 200
+MAX_QUERY_BATCH_SIZE = 2000
+
+SOAP_ENVELOPE_NAMESPACE = 'http://schemas.xmlsoap.org/soap/envelope/'
+BULK_NAMESPACE = 'http://www.force.com/2009/06/asyncapi/dataload'
+XSI_NAMESPACE = 'http://www.w3.org/2001/XMLSchema-instance'
+
+# sObject types the stand-in knows, by name, with their key prefix and their fields by name and type.
+SOBJECT_TYPES = {
+    'Account': {'key_prefix': '001',
+                'fields': {'Id': 'id', 'Name': 'string'}},
+    'Contact': {'key_prefix': '003',
+                'fields': {'Id': 'id', 'AccountId': 'reference', 'FirstName': 'string', 'LastName': 'string',
+                           'Email': 'email', 'LeadSource': 'picklist'}},
+}
+# Reference fields, by sObject type and field name, as the sObject type they point to and their relationship name.
+REFERENCES = {('Contact', 'AccountId'): ('Account', 'Account')}
+# Child relationships, by sObject type and relationship name, as the child sObject type and its reference field.
+CHILD_RELATIONSHIPS = {('Account', 'Contacts'): ('Contact', 'AccountId')}
+SOAP_TYPES = {'id': 'tns:ID', 'reference': 'tns:ID', 'string': 'xsd:string', 'email': 'xsd:string',
+              'picklist': 'xsd:string'}
+FIELD_LENGTHS = {'id': 18, 'reference': 18, 'string': 80, 'email': 80, 'picklist': 40}
+
+SOQL_PATTERN = re.compile(r'SELECT\s+(?P<fields>.+?)\s+FROM\s+(?P<sobject_type>\w+)'
+                          r'(?:\s+WHERE\s+(?P<where>.+?))?'
+                          r'(?:\s+GROUP\s+BY\s+(?P<group_by>\w+))?'
+                          r'(?:\s+ORDER\s+BY\s+(?P<order_by>\w+)(?:\s+(?P<order>ASC|DESC))?)?'
+                          r'(?:\s+LIMIT\s+(?P<limit>\d+))?',
+                          re.IGNORECASE | re.DOTALL)
+SUBQUERY_PATTERN = re.compile(r'\(\s*(SELECT\s[^()]+)\)', re.IGNORECASE)
+CONDITION_PATTERN = re.compile(r"(?P<field>\w+)\s*(?P<operator>=|!=|<=|>=|<|>|LIKE)\s*'(?P<value>(?:[^'\\]|\\.)*)'",
+                               re.IGNORECASE)
+COUNT_PATTERN = re.compile(r'COUNT\(\s*(?P<field>\w*)\s*\)', re.IGNORECASE)
+OPERATORS = {'=': lambda a, b: a == b, '!=': lambda a, b: a != b,
+             '<': lambda a, b: a is not None and a < b, '<=': lambda a, b: a is not None and a <= b,
+             '>': lambda a, b: a is not None and a > b, '>=': lambda a, b: a is not None and a >= b}
+
+Query = collections.namedtuple('Query', ['sobject_type', 'fields', 'conditions', 'group_by', 'order_by',
+                                         'descending', 'limit'])
+Subquery = collections.namedtuple('Subquery', ['sobject_type', 'rows'])
+QueryResult = collections.namedtuple('QueryResult', ['sobject_type', 'rows', 'size'])
+
+
+class SoqlError(Exception):
+    """A query the stand-in doesn't understand, or that refers to sObject types or fields it doesn't know."""
+
+
+class SalesforceStandIn:
+    """HTTPS server answering Salesforce API requests from sObjects it keeps in memory.
+
+    Use it as a context manager, which starts and stops the server. request_counts counts the requests it answered
+    by API call, the way an org's limits count them.
+
+    Args:
+        certificate_authority (:py:class:`CertificateAuthority`): CA to issue the server certificate with.
+        host (:obj:`str`, optional): Address SDC reaches the stand-in at. Default: the address of this host.
+    """
+    def __init__(self, certificate_authority, host=None):
+        self.certificate_authority = certificate_authority
+        self.host = host or socket.gethostbyname(socket.gethostname())
+        self.port = None
+        self.request_counts = collections.Counter()
+        self._sobjects = {sobject_type: {} for sobject_type in SOBJECT_TYPES}
+        self._ids = itertools.count(1)
+        self._cursors = {}
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._server = None
+        self._certificate_directory = None
+
+    @property
+    def auth_endpoint(self):
+        """The authentication endpoint of the Salesforce stages to log in to the stand-in with."""
+        return f'{self.host}:{self.port}'
+
+    def __enter__(self):
+        # The ssl module only loads certificates and keys from files.
+        self._certificate_directory = tempfile.TemporaryDirectory()
+        certificate_file = os.path.join(self._certificate_directory.name, 'server.pem')
+        with open(certificate_file, 'wb') as certificate:
+            certificate.write(self.certificate_authority.issue_certificate(self.host))
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(certificate_file)
+
+        self._server = _Server(('', 0), _RequestHandler)
+        self._server.socket = context.wrap_socket(self._server.socket, server_side=True)
+        self._server.stand_in = self
+        self.port = self._server.server_address[1]
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        logger.info('Salesforce stand-in listening at %s ...', self.auth_endpoint)
+        return self
+
+    def __exit__(self, *exc_info):
+        self._server.shutdown()
+        self._server.server_close()
+        self._certificate_directory.cleanup()
+
+    def insert_records(self, sobject_type, records):
+        """Insert records, dicts of field name to value, of sobject_type.
+
+        Returns:
+            A list of the ids of the inserted records, in order.
+        """
+        ids = []
+        with self._lock:
+            for record in records:
+                unknown_fields = set(record) - set(SOBJECT_TYPES[sobject_type]['fields'])
+                if unknown_fields:
+                    raise ValueError(f'No fields {sorted(unknown_fields)} on {sobject_type}')
+                record_id = f"{SOBJECT_TYPES[sobject_type]['key_prefix']}{next(self._ids):012d}AAA"
+                self._sobjects[sobject_type][record_id] = dict(record, Id=record_id)
+                ids.append(record_id)
+        return ids
+
+    def count_records(self, sobject_type, name_field, name_prefix):
+        """Return the number of records of sobject_type whose name_field starts with name_prefix."""
+        with self._lock:
+            return sum(1 for record in self._sobjects[sobject_type].values()
+                       if (record.get(name_field) or '').startswith(name_prefix))
+
+    def delete_records(self, sobject_type, name_field, name_prefix):
+        """Delete all records of sobject_type whose name_field starts with name_prefix."""
+        with self._lock:
+            records = self._sobjects[sobject_type]
+            for record_id in [record_id for record_id, record in records.items()
+                              if (record.get(name_field) or '').startswith(name_prefix)]:
+                del records[record_id]
+
+    def query(self, query_string):
+        """Run a SOQL query.
+
+        Returns:
+            A :py:obj:`QueryResult` of the sObject type of the rows, the rows and the number of records matched.
+        """
+        query = parse_soql(query_string)
+        with self._lock:
+            return self._run_query(query)
+
+    def handle_soap(self, body):
+        """Answer a SOAP API request.
+
+        Returns:
+            A tuple of the HTTP status, the content type and the body of the response.
+        """
+        envelope = ElementTree.fromstring(body)
+        header = envelope.find(f'{{{SOAP_ENVELOPE_NAMESPACE}}}Header')
+        call = envelope.find(f'{{{SOAP_ENVELOPE_NAMESPACE}}}Body')[0]
+        call_name = _local_name(call.tag)
+        self._count_request(call_name)
+
+        handler = getattr(self, f'_soap_{call_name}', None)
+        try:
+            if handler is None:
+                raise _SoapFault('UNSUPPORTED_API_VERSION', f'The stand-in does not answer {call_name} calls')
+            response = f'<{call_name}Response>{handler(call, header)}</{call_name}Response>'
+            status = 200
+        except SoqlError as e:
+            response, status = _soap_fault('MALFORMED_QUERY', str(e)), 500
+        except _SoapFault as e:
+            response, status = _soap_fault(e.code, e.message), 500
+        return status, 'text/xml; charset=utf-8', _soap_envelope(response)
+
+    def handle_bulk(self, method, path, body, content_type):
+        """Answer a Bulk API request to path, the part of the URL path after the API version.
+
+        Returns:
+            A tuple of the HTTP status, the content type and the body of the response.
+        """
+        parts = path.strip('/').split('/')
+        try:
+            if parts == ['job'] and method == 'POST':
+                self._count_request('createJob')
+                return 201, 'application/xml', self._bulk_create_job(body)
+            job = self._jobs.get(parts[1]) if len(parts) > 1 and parts[0] == 'job' else None
+            if job is None:
+                raise _BulkError('InvalidJob', f'No job at {path}')
+            if len(parts) == 2:
+                self._count_request('updateJob' if method == 'POST' else 'getJobInfo')
+                if method == 'POST':
+                    state = _child_text(ElementTree.fromstring(body), 'state')
+                    job['state'] = state or job['state']
+                return 200, 'application/xml', _bulk_job_info(job)
+            if len(parts) == 3 and parts[2] == 'batch':
+                if method == 'POST':
+                    self._count_request('createBatch')
+                    return 201, 'application/xml', _bulk_batch_info(self._bulk_create_batch(job, body, content_type))
+                self._count_request('getBatchInfoList')
+                return 200, 'application/xml', (f'<?xml version="1.0" encoding="UTF-8"?>'
+                                                f'<batchInfoList xmlns="{BULK_NAMESPACE}">'
+                                                + ''.join(_bulk_batch_info(batch, declaration=False)
+                                                          for batch in job['batches'].values())
+                                                + '</batchInfoList>')
+            batch = job['batches'].get(parts[3]) if len(parts) > 3 and parts[2] == 'batch' else None
+            if batch is None:
+                raise _BulkError('InvalidBatch', f'No batch at {path}')
+            if len(parts) == 4:
+                self._count_request('getBatchInfo')
+                return 200, 'application/xml', _bulk_batch_info(batch)
+            if len(parts) == 5 and parts[4] == 'result':
+                self._count_request('getBatchResult')
+                if job['operation'] == 'query':
+                    return 200, 'application/xml', (f'<?xml version="1.0" encoding="UTF-8"?>'
+                                                    f'<result-list xmlns="{BULK_NAMESPACE}">'
+                                                    f"<result>{batch['result_id']}</result></result-list>")
+                return 200, _bulk_content_type(job), batch['result']
+            if len(parts) == 6 and parts[4] == 'result' and parts[5] == batch.get('result_id'):
+                self._count_request('getQueryResult')
+                return 200, _bulk_content_type(job), batch['result']
+            raise _BulkError('InvalidUrl', f'No resource at {path}')
+        except _BulkError as e:
+            return 400, 'application/xml', (f'<?xml version="1.0" encoding="UTF-8"?><error xmlns="{BULK_NAMESPACE}">'
+                                            f'<exceptionCode>{e.code}</exceptionCode>'
+                                            f'<exceptionMessage>{escape(e.message)}</exceptionMessage></error>')
+
+    def _count_request(self, call_name):
+        with self._lock:
+            self.request_counts[call_name] += 1
+
+    def _run_query(self, query):
+        records = self._select_records(query)
+
+        counts = [field for field in query.fields if isinstance(field, str) and COUNT_PATTERN.fullmatch(field)]
+        if counts == query.fields and len(counts) == 1 and not COUNT_PATTERN.fullmatch(counts[0]).group('field'):
+            # COUNT() gives the number of records as the size of the result, without any rows.
+            return QueryResult(query.sobject_type, [], len(records))
+        if counts or query.group_by:
+            rows = _aggregate(records, query)[:query.limit]
+            return QueryResult('AggregateResult', rows, len(rows))
+
+        records = records[:query.limit]
+        # Children of all the records at once, by the Id of their parent, for every subquery.
+        children = {}
+        for subquery in (field for field in query.fields if isinstance(field, Query)):
+            if (query.sobject_type, subquery.sobject_type) not in CHILD_RELATIONSHIPS:
+                raise SoqlError(f"Didn't understand relationship {subquery.sobject_type} of {query.sobject_type}")
+            child_type, reference_field = CHILD_RELATIONSHIPS[(query.sobject_type, subquery.sobject_type)]
+            children_by_parent = children[subquery.sobject_type] = collections.defaultdict(list)
+            for child in self._select_records(subquery._replace(sobject_type=child_type, limit=None)):
+                children_by_parent[child.get(reference_field)].append(child)
+
+        rows = []
+        for record in records:
+            row = []
+            for field in query.fields:
+                if isinstance(field, Query):
+                    child_records = children[field.sobject_type].get(record['Id'], [])[:field.limit]
+                    child_type = CHILD_RELATIONSHIPS[(query.sobject_type, field.sobject_type)][0]
+                    row.append((field.sobject_type, Subquery(child_type, [_project(child, field.fields)
+                                                                          for child in child_records])))
+                else:
+                    row.append((field, _value(query.sobject_type, record, field)))
+            rows.append(row)
+        return QueryResult(query.sobject_type, rows, len(rows))
+
+    def _select_records(self, query):
+        if query.sobject_type not in SOBJECT_TYPES:
+            raise SoqlError(f'sObject type {query.sobject_type} is not supported')
+        records = [record for record in self._sobjects[query.sobject_type].values()
+                   if all(_matches(record, condition) for condition in query.conditions)]
+        if query.order_by:
+            records.sort(key=lambda record: record.get(query.order_by) or '', reverse=query.descending)
+        return records
+
+    def _query_result(self, result, batch_size):
+        rows, remaining_rows = result.rows[:batch_size], result.rows[batch_size:]
+        query_locator = '<queryLocator xsi:nil="true"/>'
+        if remaining_rows:
+            locator = f'01g{next(self._ids):012d}AAA-{batch_size}'
+            with self._lock:
+                self._cursors[locator] = (result._replace(rows=remaining_rows), batch_size)
+            query_locator = f'<queryLocator>{locator}</queryLocator>'
+        return (f'<result xsi:type="QueryResult"><done>{_boolean(not remaining_rows)}</done>{query_locator}'
+                + ''.join(_soap_record('records', result.sobject_type, row) for row in rows)
+                + f'<size>{result.size}</size></result>')
+
+    def _soap_login(self, call, header):
+        server_url = f'https://{self.auth_endpoint}{SOAP_PATH}{API_VERSION}/{ORGANIZATION_ID}'
+        return (f'<result>'
+                f'<metadataServerUrl>https://{self.auth_endpoint}/services/Soap/m/{API_VERSION}/{ORGANIZATION_ID}'
+                f'</metadataServerUrl>'
+                f'<passwordExpired>false</passwordExpired>'
+                f'<sandbox>true</sandbox>'
+                f'<serverUrl>{server_url}</serverUrl>'
+                f'<sessionId>{ORGANIZATION_ID}!stand-in</sessionId>'
+                f'<userId>{USER_ID}</userId>'
+                f'</result>')
+
+    def _soap_describeSObject(self, call, header):
+        return _describe_sobject(_child_text(call, 'sObjectType'))
+
+    def _soap_describeSObjects(self, call, header):
+        return ''.join(_describe_sobject(element.text) for element in call if _local_name(element.tag) == 'sObjectType')
+
+    def _soap_query(self, call, header):
+        batch_size = DEFAULT_QUERY_BATCH_SIZE
+        query_options = _child(header, 'QueryOptions') if header is not None else None
+        if query_options is not None and _child_text(query_options, 'batchSize'):
+            batch_size = min(max(int(_child_text(query_options, 'batchSize')), MIN_QUERY_BATCH_SIZE),
+                             MAX_QUERY_BATCH_SIZE)
+        return self._query_result(self.query(_child_text(call, 'queryString')), batch_size)
+
+    _soap_queryAll = _soap_query
+
+    def _soap_queryMore(self, call, header):
+        with self._lock:
+            cursor = self._cursors.pop(_child_text(call, 'queryLocator'), None)
+        if cursor is None:
+            raise _SoapFault('INVALID_QUERY_LOCATOR', 'invalid query locator')
+        return self._query_result(*cursor)
+
+    def _soap_create(self, call, header):
+        results = []
+        for sobject in (element for element in call if _local_name(element.tag) == 'sObjects'):
+            sobject_type = _child_text(sobject, 'type')
+            record = {_local_name(element.tag): element.text for element in sobject
+                      if _local_name(element.tag) not in ('type', 'fieldsToNull', 'Id')}
+            try:
+                record_id, = self.insert_records(sobject_type, [record])
+                results.append(f'<result><id>{record_id}</id><success>true</success></result>')
+            except (KeyError, ValueError) as e:
+                results.append(f'<result><errors><message>{escape(str(e))}</message>'
+                               f'<statusCode>INVALID_FIELD</statusCode></errors>'
+                               f'<id xsi:nil="true"/><success>false</success></result>')
+        return ''.join(results)
+
+    def _bulk_create_job(self, body):
+        job_info = ElementTree.fromstring(body)
+        job = {'id': f'750{next(self._ids):012d}AAA',
+               'operation': _child_text(job_info, 'operation'),
+               'object': _child_text(job_info, 'object'),
+               'contentType': _child_text(job_info, 'contentType') or 'CSV',
+               'concurrencyMode': _child_text(job_info, 'concurrencyMode') or 'Parallel',
+               'state': 'Open',
+               'createdDate': _timestamp(),
+               'batches': collections.OrderedDict()}
+        if job['operation'] not in ('query', 'queryAll', 'insert') or job['object'] not in SOBJECT_TYPES:
+            raise _BulkError('InvalidJob', f"The stand-in does not run {job['operation']} jobs on {job['object']}")
+        with self._lock:
+            self._jobs[job['id']] = job
+        return _bulk_job_info(job)
+
+    def _bulk_create_batch(self, job, body, content_type):
+        # Batches are done by the time they are created.
+        batch = {'id': f'751{next(self._ids):012d}AAA', 'jobId': job['id'], 'state': 'Completed',
+                 'createdDate': _timestamp(), 'numberRecordsFailed': 0}
+        if job['operation'] in ('query', 'queryAll'):
+            result = self.query(body.decode('utf-8'))
+            batch['result_id'] = f'752{next(self._ids):012d}AAA'
+            batch['result'] = _bulk_query_result(job, result)
+            batch['numberRecordsProcessed'] = len(result.rows)
+        else:
+            if 'csv' in content_type:
+                records = [{name: value or None for name, value in row.items()}
+                           for row in csv.DictReader(io.StringIO(body.decode('utf-8')))]
+            else:
+                records = [{_local_name(element.tag): element.text for element in sobject}
+                           for sobject in ElementTree.fromstring(body)]
+            ids = self.insert_records(job['object'], records)
+            batch['result'] = _bulk_insert_result(job, ids)
+            batch['numberRecordsProcessed'] = len(ids)
+        with self._lock:
+            job['batches'][batch['id']] = batch
+        return batch
+
+
+class _Server(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    daemon_threads = True
+
+
+class _RequestHandler(http.server.BaseHTTPRequestHandler):
+    # Keep connections open between requests, as the stages' HTTP clients expect.
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self._handle()
+
+    def do_POST(self):
+        self._handle()
+
+    def _handle(self):
+        stand_in = self.server.stand_in
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        if self.headers.get('Content-Encoding') == 'gzip':
+            body = gzip.decompress(body)
+        path = urllib.parse.urlparse(self.path).path
+        try:
+            if path.startswith(SOAP_PATH):
+                status, content_type, response = stand_in.handle_soap(body)
+            elif path.startswith(BULK_PATH):
+                version_path = path[len(BULK_PATH):]
+                status, content_type, response = stand_in.handle_bulk(self.command,
+                                                                      version_path[version_path.find('/'):],
+                                                                      body,
+                                                                      self.headers.get('Content-Type', ''))
+            else:
+                status, content_type, response = 404, 'text/plain', f'No resource at {path}'
+        except Exception as e:
+            logger.exception('Salesforce stand-in failed to answer %s %s', self.command, path)
+            status, content_type, response = 500, 'text/plain', str(e)
+
+        response = response.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(response)))
+        self.end_headers()
+        self.wfile.write(response)
+
+    def log_message(self, format, *args):
+        logger.debug('Salesforce stand-in: ' + format, *args)
+
+
+class _SoapFault(Exception):
+    def __init__(self, code, message):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+
+class _BulkError(_SoapFault):
+    pass
+
+
+class CertificateAuthority:
+    """Certificate authority made up when created, for test servers to get their certificates from.
+
+    Its private key is only ever kept in memory.
+    """
+    def __init__(self):
+        self._key = rsa.generate_private_key(public_exponent=65537, key_size=2048, backend=default_backend())
+        name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, 'Salesforce stand-in test CA')])
+        self.certificate = (_certificate_builder(name, self._key.public_key())
+                            .issuer_name(name)
+                            .add_extension(x509.BasicConstraints(ca=True, path_length=0), critical=True)
+                            .sign(self._key, hashes.SHA256(), default_backend()))
+
+    def issue_certificate(self, host):
+        """Issue a server certificate for host.
+
+        Returns:
+            The certificate followed by its private key, PEM encoded.
+        """
+        key = rsa.generate_private_key(public_exponent=65537, key_size=2048, backend=default_backend())
+        try:
+            subject_alternative_name = x509.IPAddress(ipaddress.ip_address(host))
+        except ValueError:
+            subject_alternative_name = x509.DNSName(host)
+        certificate = (_certificate_builder(x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, host)]),
+                                            key.public_key())
+                       .issuer_name(self.certificate.subject)
+                       .add_extension(x509.SubjectAlternativeName([subject_alternative_name]), critical=False)
+                       .sign(self._key, hashes.SHA256(), default_backend()))
+        return (certificate.public_bytes(serialization.Encoding.PEM)
+                + key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.TraditionalOpenSSL,
+                                    serialization.NoEncryption()))
+
+    def write_truststore(self, path, password):
+        """Write a JKS truststore holding the CA's certificate to path.
+
+        JKS is what the Java 8 runtime of SDC reads trusted certificates from, and as there is nothing in Python to
+        write it, it is written here: a header, a trusted certificate entry and a SHA-1 digest keyed by password.
+        """
+        certificate = self.certificate.public_bytes(serialization.Encoding.DER)
+        data = (struct.pack('>III', 0xFEEDFEED, 2, 1)
+                + struct.pack('>I', 2) + _java_utf('ca') + struct.pack('>q', int(time.time() * 1000))
+                + _java_utf('X.509') + struct.pack('>I', len(certificate)) + certificate)
+        digest = hashlib.sha1(password.encode('utf-16-be') + b'Mighty Aphrodite' + data).digest()
+        with open(path, 'wb') as truststore:
+            truststore.write(data + digest)
+
+
+def _certificate_builder(subject, public_key):
+    now = datetime.datetime.utcnow()
+    return (x509.CertificateBuilder()
+            .subject_name(subject)
+            .public_key(public_key)
+            .serial_number(x509.random_serial_number())
+            .not_valid_before(now - datetime.timedelta(minutes=5))
+            .not_valid_after(now + datetime.timedelta(days=CERTIFICATE_VALIDITY_DAYS)))
+
+
+def _java_utf(string):
+    # Strings as java.io.DataOutput.writeUTF writes them, which is UTF-8 for the ASCII ones written here.
+    encoded = string.encode()
+    return struct.pack('>H', len(encoded)) + encoded
+
+
+def parse_soql(query_string):
+    """Parse the SOQL the stand-in understands into a :py:obj:`Query`, with subqueries as queries in its fields."""
+    subqueries = []
+
+    def take_subquery(match):
+        subqueries.append(parse_soql(match.group(1)))
+        return f'__subquery{len(subqueries) - 1}__'
+
+    match = SOQL_PATTERN.fullmatch(SUBQUERY_PATTERN.sub(take_subquery, query_string.strip()))
+    if match is None:
+        raise SoqlError(f"Didn't understand query {query_string}")
+
+    fields = []
+    for field in (field.strip() for field in match.group('fields').split(',')):
+        subquery = re.fullmatch(r'__subquery(\d+)__', field)
+        fields.append(subqueries[int(subquery.group(1))] if subquery else field)
+
+    conditions = []
+    for condition in re.split(r'\s+AND\s+', match.group('where') or '', flags=re.IGNORECASE):
+        if not condition:
+            continue
+        condition_match = CONDITION_PATTERN.fullmatch(condition.strip())
+        if condition_match is None:
+            raise SoqlError(f"Didn't understand condition {condition}")
+        conditions.append((condition_match.group('field'), condition_match.group('operator').upper(),
+                           re.sub(r'\\(.)', r'\1', condition_match.group('value'))))
+
+    return Query(sobject_type=match.group('sobject_type'),
+                 fields=fields,
+                 conditions=conditions,
+                 group_by=match.group('group_by'),
+                 order_by=match.group('order_by'),
+                 descending=(match.group('order') or '').upper() == 'DESC',
+                 limit=int(match.group('limit')) if match.group('limit') else None)
+
+
+def _matches(record, condition):
+    field, operator, value = condition
+    if operator == 'LIKE':
+        pattern = ''.join('.*' if c == '%' else '.' if c == '_' else re.escape(c) for c in value)
+        return re.fullmatch(pattern, record.get(field) or '', re.IGNORECASE | re.DOTALL) is not None
+    return OPERATORS[operator](record.get(field), value)
+
+
+def _value(sobject_type, record, field):
+    if field not in SOBJECT_TYPES[sobject_type]['fields']:
+        raise SoqlError(f"No such column '{field}' on entity '{sobject_type}'")
+    return record.get(field)
+
+
+def _project(record, fields):
+    sobject_type = next(sobject_type for sobject_type, sobject in SOBJECT_TYPES.items()
+                        if record['Id'].startswith(sobject['key_prefix']))
+    return [(field, _value(sobject_type, record, field)) for field in fields]
+
+
+def _aggregate(records, query):
+    groups = collections.OrderedDict()
+    for record in records:
+        groups.setdefault(record.get(query.group_by) if query.group_by else None, []).append(record)
+    rows = []
+    for group_value, group in groups.items():
+        row, expressions = [], itertools.count()
+        for field in query.fields:
+            count = COUNT_PATTERN.fullmatch(field)
+            if count:
+                counted = [record for record in group if not count.group('field') or record.get(count.group('field'))]
+                row.append((f'expr{next(expressions)}', len(counted)))
+            elif field == query.group_by:
+                row.append((field, group_value))
+            else:
+                raise SoqlError(f'Field {field} must be grouped or aggregated')
+        rows.append(row)
+    return rows
+
+
+def _soap_envelope(body):
+    return (f'<?xml version="1.0" encoding="UTF-8"?>'
+            f'<soapenv:Envelope xmlns:soapenv="{SOAP_ENVELOPE_NAMESPACE}" xmlns="urn:partner.soap.sforce.com"'
+            f' xmlns:sf="urn:sobject.partner.soap.sforce.com" xmlns:xsi="{XSI_NAMESPACE}">'
+            f'<soapenv:Body>{body}</soapenv:Body></soapenv:Envelope>')
+
+
+def _soap_fault(code, message):
+    return (f'<soapenv:Fault xmlns:fault="urn:fault.partner.soap.sforce.com">'
+            f'<faultcode>fault:{code}</faultcode><faultstring>{code}: {escape(message)}</faultstring>'
+            f'</soapenv:Fault>')
+
+
+def _soap_record(tag, sobject_type, row):
+    # The partner API puts the Id ahead of the other fields of an sObject, whether it was queried or not.
+    record_id = dict(row).get('Id')
+    parts = [f'<{tag} xsi:type="sf:sObject"><sf:type>{sobject_type}</sf:type>',
+             f'<sf:Id>{record_id}</sf:Id>' if record_id else '<sf:Id xsi:nil="true"/>']
+    for name, value in row:
+        if isinstance(value, Subquery):
+            parts.append(f'<sf:{name} xsi:type="QueryResult"><done>true</done><queryLocator xsi:nil="true"/>'
+                         + ''.join(_soap_record('records', value.sobject_type, child_row) for child_row in value.rows)
+                         + f'<size>{len(value.rows)}</size></sf:{name}>')
+        elif value is None:
+            parts.append(f'<sf:{name} xsi:nil="true"/>')
+        elif isinstance(value, int):
+            parts.append(f'<sf:{name} xsi:type="xsd:int">{value}</sf:{name}>')
+        else:
+            parts.append(f'<sf:{name}>{escape(value)}</sf:{name}>')
+    parts.append(f'</{tag}>')
+    return ''.join(parts)
+
+
+def _describe_sobject(sobject_type):
+    if sobject_type not in SOBJECT_TYPES:
+        raise _SoapFault('INVALID_TYPE', f'sObject type {sobject_type} is not supported')
+    child_relationships = ''.join(f'<childRelationships><cascadeDelete>false</cascadeDelete>'
+                                  f'<childSObject>{child_type}</childSObject>'
+                                  f'<deprecatedAndHidden>false</deprecatedAndHidden>'
+                                  f'<field>{reference_field}</field>'
+                                  f'<relationshipName>{relationship_name}</relationshipName>'
+                                  f'<restrictedDelete>false</restrictedDelete></childRelationships>'
+                                  for (parent_type, relationship_name), (child_type, reference_field)
+                                  in CHILD_RELATIONSHIPS.items() if parent_type == sobject_type)
+    fields = ''.join(_describe_field(sobject_type, name, field_type)
+                     for name, field_type in SOBJECT_TYPES[sobject_type]['fields'].items())
+    # Elements in the order of the partner WSDL's DescribeSObjectResult type, with its lists as they are.
+    elements = [('activateable', False), ('childRelationships', child_relationships), ('compactLayoutable', True),
+                ('createable', True), ('custom', False), ('customSetting', False), ('deletable', True),
+                ('deprecatedAndHidden', False), ('feedEnabled', False), ('fields', fields), ('hasSubtypes', False),
+                ('isSubtype', False), ('keyPrefix', SOBJECT_TYPES[sobject_type]['key_prefix']),
+                ('label', sobject_type), ('labelPlural', f'{sobject_type}s'), ('layoutable', True),
+                ('mergeable', True), ('mruEnabled', True), ('name', sobject_type), ('networkScopeFieldName', None),
+                ('queryable', True), ('replicateable', True), ('retrieveable', True), ('searchLayoutable', True),
+                ('searchable', True), ('triggerable', True), ('undeletable', True), ('updateable', True)]
+    return '<result>' + ''.join(_element(element, value) for element, value in elements) + '</result>'
+
+
+def _describe_field(sobject_type, name, field_type):
+    is_id = field_type == 'id'
+    reference = REFERENCES.get((sobject_type, name))
+    # Elements in the order of the partner WSDL's Field type.
+    elements = [('aggregatable', True), ('autoNumber', False), ('byteLength', FIELD_LENGTHS[field_type] * 3),
+                ('calculated', False), ('cascadeDelete', False), ('caseSensitive', False),
+                ('createable', not is_id), ('custom', False), ('defaultedOnCreate', is_id),
+                ('dependentPicklist', False), ('deprecatedAndHidden', False), ('digits', 0),
+                ('displayLocationInDecimal', False), ('encrypted', False), ('externalId', False),
+                ('filterable', True), ('groupable', True), ('highScaleNumber', False), ('htmlFormatted', False),
+                ('idLookup', is_id or field_type == 'email'), ('label', name), ('length', FIELD_LENGTHS[field_type]),
+                ('name', name), ('nameField', name in ('Name', 'LastName')), ('namePointing', False),
+                ('nillable', not is_id and name != 'LastName'), ('permissionable', not is_id and name != 'LastName'),
+                ('polymorphicForeignKey', False), ('precision', 0), ('queryByDistance', False)]
+    if reference:
+        elements += [('referenceTo', reference[0]), ('relationshipName', reference[1])]
+    elements += [('restrictedDelete', False), ('restrictedPicklist', False), ('scale', 0),
+                 ('searchPrefilterable', False), ('soapType', SOAP_TYPES[field_type]), ('sortable', True),
+                 ('type', field_type), ('unique', False), ('updateable', not is_id),
+                 ('writeRequiresMasterRead', False)]
+    return '<fields>' + ''.join(_element(element, value) for element, value in elements) + '</fields>'
+
+
+def _bulk_content_type(job):
+    return 'text/csv' if job['contentType'] == 'CSV' else 'application/xml'
+
+
+def _bulk_job_info(job):
+    batches = job['batches'].values()
+    elements = [('id', job['id']), ('operation', job['operation']), ('object', job['object']),
+                ('createdById', USER_ID), ('createdDate', job['createdDate']), ('systemModstamp', _timestamp()),
+                ('state', job['state']), ('concurrencyMode', job['concurrencyMode']),
+                ('contentType', job['contentType']), ('numberBatchesQueued', 0), ('numberBatchesInProgress', 0),
+                ('numberBatchesCompleted', len(batches)), ('numberBatchesFailed', 0),
+                ('numberBatchesTotal', len(batches)),
+                ('numberRecordsProcessed', sum(batch['numberRecordsProcessed'] for batch in batches)),
+                ('numberRetries', 0), ('apiVersion', API_VERSION), ('numberRecordsFailed', 0),
+                ('totalProcessingTime', 0), ('apiActiveProcessingTime', 0), ('apexProcessingTime', 0)]
+    return (f'<?xml version="1.0" encoding="UTF-8"?><jobInfo xmlns="{BULK_NAMESPACE}">'
+            + ''.join(f'<{element}>{value}</{element}>' for element, value in elements)
+            + '</jobInfo>')
+
+
+def _bulk_batch_info(batch, declaration=True):
+    elements = [('id', batch['id']), ('jobId', batch['jobId']), ('state', batch['state']),
+                ('createdDate', batch['createdDate']), ('systemModstamp', batch['createdDate']),
+                ('numberRecordsProcessed', batch['numberRecordsProcessed']),
+                ('numberRecordsFailed', batch['numberRecordsFailed']), ('totalProcessingTime', 0),
+                ('apiActiveProcessingTime', 0), ('apexProcessingTime', 0)]
+    return (('<?xml version="1.0" encoding="UTF-8"?>' if declaration else '')
+            + (f'<batchInfo xmlns="{BULK_NAMESPACE}">' if declaration else '<batchInfo>')
+            + ''.join(f'<{element}>{value}</{element}>' for element, value in elements)
+            + '</batchInfo>')
+
+
+def _bulk_query_result(job, result):
+    if job['contentType'] == 'CSV':
+        output = io.StringIO()
+        writer = csv.writer(output, quoting=csv.QUOTE_ALL, lineterminator='\n')
+        writer.writerow([name for name, _ in result.rows[0]] if result.rows else [])
+        writer.writerows([['' if value is None else value for _, value in row] for row in result.rows])
+        return output.getvalue()
+    return (f'<?xml version="1.0" encoding="UTF-8"?>'
+            f'<queryResult xmlns="{BULK_NAMESPACE}" xmlns:xsi="{XSI_NAMESPACE}">'
+            + ''.join(_bulk_record(result.sobject_type, row) for row in result.rows)
+            + '</queryResult>')
+
+
+def _bulk_record(sobject_type, row):
+    parts = [f'<records xsi:type="sObject"><type>{sobject_type}</type>']
+    for name, value in row:
+        if isinstance(value, Subquery):
+            parts.append(f'<{name} xsi:type="QueryResult"><done>true</done><queryLocator xsi:nil="true"/>'
+                         + ''.join(_bulk_record(value.sobject_type, child_row) for child_row in value.rows)
+                         + f'<size>{len(value.rows)}</size></{name}>')
+        elif value is None:
+            parts.append(f'<{name} xsi:nil="true"/>')
+        else:
+            parts.append(f'<{name}>{escape(str(value))}</{name}>')
+    parts.append('</records>')
+    return ''.join(parts)
+
+
+def _bulk_insert_result(job, ids):
+    if job['contentType'] == 'CSV':
+        return '"Id","Success","Created","Error"\n' + ''.join(f'"{record_id}","true","true",""\n'
+                                                               for record_id in ids)
+    return (f'<?xml version="1.0" encoding="UTF-8"?><results xmlns="{BULK_NAMESPACE}">'
+            + ''.join(f'<result><id>{record_id}</id><success>true</success><created>true</created></result>'
+                      for record_id in ids)
+            + '</results>')
+
+
+def _child(element, name):
+    return next((child for child in element if _local_name(child.tag) == name), None)
+
+
+def _child_text(element, name):
+    child = _child(element, name)
+    return child.text if child is not None else None
+
+
+def _local_name(tag):
+    return tag.rsplit('}', 1)[-1]
+
+
+def _element(element, value):
+    if element in ('childRelationships', 'fields'):
+        return value
+    if value is None:
+        return f'<{element} xsi:nil="true"/>'
+    return f'<{element}>{_boolean(value) if isinstance(value, bool) else value}</{element}>'
+
+
+def _boolean(value):
+    return 'true' if value else 'false'
+
+
+def _timestamp():
+    return time.strftime('%Y-%m-%dT%H:%M:%S.000Z', time.gmtime())
@@ -0,0 +1,269 @@
+# Copyright 2019 StreamSets Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+The tests in this module are for running high-volume Kinesis pipelines over a varying number of shards, for the
+purpose of performance testing.
+
+Consumer benchmarks read a seeded backlog, which gives throughput. While the backlog drains, its iterator age is
+sampled: how long ago the record the consumer is at was put on the stream, as in the GetRecords.IteratorAgeMilliseconds
+metric, which a local stand-in doesn't publish. Then two things are timed once the backlog is drained: how long after
+the last record left the pipeline its checkpoints in the KCL lease table catch up (checkpoint lag), and how long a
+record put on the drained stream takes to come out of the pipeline (probe latency), its latency when idle.
+The tests are meant to be run with the aws environment pointed at a local Kinesis and DynamoDB stand-in.
+"""
+
+import bisect
+import logging
+import string
+import time
+import uuid
+
+import pytest
+from streamsets.testframework.markers import aws
+from streamsets.testframework.utils import get_random_string
+
+from performance.utils import run_until_output_records_count
+
+logger = logging.getLogger(__name__)
+
+MESSAGE = 'Hello World from SDC & DPM! Very Long Message In Order To Spend More Time'
+# Maximum number of records a single PutRecords call accepts.
+MAX_RECORDS_PER_PUT = 500
+NUMBER_OF_LATENCY_PROBES = 20
+# Seconds between samples of the iterator age.
+ITERATOR_AGE_SAMPLE_INTERVAL_SEC = 1
+
+
+@pytest.fixture(scope='module')
+def sdc_builder_hook():
+    def hook(data_collector):
+        data_collector.SDC_JAVA_OPTS = '-Xmx8192m -Xms8192m'
+    return hook
+
+
+@aws('kinesis')
+@pytest.mark.parametrize('max_batch_size', (100, 1000))
+@pytest.mark.parametrize('shard_count', (1, 4, 16))
+@pytest.mark.parametrize('number_of_records', (1_000_000,))
+def test_kinesis_consumer(sdc_builder, sdc_executor, aws, benchmark, number_of_records, shard_count, max_batch_size):
+    """Performance benchmark a Kinesis Consumer to trash pipeline over a multi-shard stream.
+
+    The consumer runs a record processor per shard, so the shard count is also what sets its parallelism. Every round
+    reads a stream of its own, seeded right before it, so that all rounds start out with the same iterator age.
+
+    Kinesis Consumer pipeline:
+        kinesis_consumer >> trash
+    """
+    builder = sdc_builder.get_pipeline_builder()
+    builder.add_error_stage('Discard')
+
+    kinesis_consumer = builder.add_stage('Kinesis Consumer')
+    kinesis_consumer.set_attributes(data_format='TEXT', initial_position='TRIM_HORIZON')
+    kinesis_consumer.configuration.update({'kinesisConfig.maxBatchSize': max_batch_size})
+
+    trash = builder.add_stage('Trash')
+
+    kinesis_consumer >> trash
+
+    pipeline = builder.build(title='Kinesis Consumer performance pipeline').configure_for_environment(aws)
+
+    client = aws.kinesis
+    stream_names = []
+    application_names = []
+    seeded = {}
+    try:
+        def seed_stream(pipeline):
+            stream_name = '{}_{}'.format(aws.kinesis_stream_prefix, get_random_string(string.ascii_letters, 10))
+            stream_names.append(stream_name)
+            logger.info('Creating %s Kinesis stream with %s shards ...', stream_name, shard_count)
+            client.create_stream(StreamName=stream_name, ShardCount=shard_count)
+            aws.wait_for_stream_status(stream_name=stream_name, status='ACTIVE')
+            pipeline[0].stream_name = stream_name
+            seeded.update(zip(('last_sequence_numbers', 'put_times'),
+                              put_kinesis_records(client, stream_name, [MESSAGE] * number_of_records)))
+
+        def benchmark_pipeline(executor, pipeline):
+            # A new application per round gets a new lease table, so every round starts from TRIM_HORIZON again.
+            application_name = get_random_string(string.ascii_letters, 10)
+            application_names.append(application_name)
+            pipeline[0].application_name = application_name
+            pipeline.id = str(uuid.uuid4())
+            executor.add_pipeline(pipeline)
+
+            last_sequence_numbers = seeded['last_sequence_numbers']
+            start_time = time.time()
+            pipeline_command = executor.start_pipeline(pipeline)
+            try:
+                iterator_ages = sample_iterator_ages(executor, pipeline, seeded['put_times'], number_of_records)
+                end_time = time.time()
+
+                wait_for_checkpoints(aws.dynamodb, application_name, last_sequence_numbers)
+                checkpoint_lag = time.time() - end_time
+
+                latencies = []
+                for i in range(1, NUMBER_OF_LATENCY_PROBES + 1):
+                    probe_time = time.time()
+                    last_sequence_numbers.update(put_kinesis_records(client, pipeline[0].stream_name, [MESSAGE])[0])
+                    pipeline_command.wait_for_pipeline_output_records_count(number_of_records + i, timeout_sec=60)
+                    latencies.append(time.time() - probe_time)
+                latencies.sort()
+            finally:
+                # The pipeline keeps going past the backlog for the checkpoints and latency probes, so unlike
+                # run_until_output_records_count it's only stopped here, even if any of the waits fails.
+                executor.stop_pipeline(pipeline).wait_for_stopped()
+            executor.remove_pipeline(pipeline)
+
+            throughput = number_of_records / (end_time - start_time)
+            logger.info('Read %s records at %.2f records/s with iterator age up to %.2f s, checkpoints caught up '
+                        'after %.2f s, median probe latency %.3f s', number_of_records, throughput,
+                        max(iterator_ages, default=0), checkpoint_lag, latencies[len(latencies) // 2])
+            benchmark.extra_info.setdefault('records_per_sec', []).append(throughput)
+            benchmark.extra_info.setdefault('iterator_age_sec', []).append(iterator_ages)
+            benchmark.extra_info.setdefault('checkpoint_lag_sec', []).append(checkpoint_lag)
+            benchmark.extra_info.setdefault('probe_latency_sec', []).append(latencies)
+
+        benchmark.pedantic(benchmark_pipeline, args=(sdc_executor, pipeline), setup=lambda: seed_stream(pipeline),
+                           rounds=2)
+    finally:
+        for stream_name in stream_names:
+            logger.info('Deleting %s Kinesis stream ...', stream_name)
+            client.delete_stream(StreamName=stream_name)
+        for application_name in application_names:
+            logger.info('Deleting %s DynamoDB table ...', application_name)
+            try:
+                aws.dynamodb.delete_table(TableName=application_name)
+            except Exception as e:
+                # The KCL may not have created the table yet; don't let that hide why the test failed.
+                logger.warning('Could not delete %s DynamoDB table: %s', application_name, e)
+
+
+@aws('kinesis')
+@pytest.mark.parametrize('aggregation_enabled', (False, True))
+@pytest.mark.parametrize('shard_count', (1, 4, 16))
+@pytest.mark.parametrize('number_of_records', (1_000_000,))
+def test_kinesis_producer(sdc_builder, sdc_executor, aws, benchmark, number_of_records, shard_count,
+                          aggregation_enabled):
+    """Performance benchmark a Dev Raw Data Source to Kinesis Producer pipeline over a multi-shard stream.
+
+    Kinesis Producer pipeline:
+        dev_raw_data_source >> kinesis_producer
+    """
+    stream_name = '{}_{}'.format(aws.kinesis_stream_prefix, get_random_string(string.ascii_letters, 10))
+
+    builder = sdc_builder.get_pipeline_builder()
+    builder.add_error_stage('Discard')
+
+    dev_raw_data_source = builder.add_stage('Dev Raw Data Source')
+    dev_raw_data_source.set_attributes(data_format='TEXT', raw_data='\n'.join([MESSAGE] * 1000))
+
+    kinesis_producer = builder.add_stage('Kinesis Producer')
+    kinesis_producer.set_attributes(data_format='TEXT', stream_name=stream_name)
+    kinesis_producer.configuration.update({'kinesisConfig.producerConfigs': [
+        {'key': 'AggregationEnabled', 'value': str(aggregation_enabled).lower()}
+    ]})
+
+    dev_raw_data_source >> kinesis_producer
+
+    pipeline = builder.build(title='Kinesis Producer performance pipeline').configure_for_environment(aws)
+
+    client = aws.kinesis
+    try:
+        logger.info('Creating %s Kinesis stream with %s shards ...', stream_name, shard_count)
+        client.create_stream(StreamName=stream_name, ShardCount=shard_count)
+        aws.wait_for_stream_status(stream_name=stream_name, status='ACTIVE')
+
+        def benchmark_pipeline(executor, pipeline):
+            pipeline.id = str(uuid.uuid4())
+            executor.add_pipeline(pipeline)
+
+            duration, _ = run_until_output_records_count(executor, pipeline, number_of_records)
+            executor.remove_pipeline(pipeline)
+
+            throughput = number_of_records / duration
+            logger.info('Wrote %s records at %.2f records/s', number_of_records, throughput)
+            benchmark.extra_info.setdefault('records_per_sec', []).append(throughput)
+
+        benchmark.pedantic(benchmark_pipeline, args=(sdc_executor, pipeline), rounds=2)
+    finally:
+        logger.info('Deleting %s Kinesis stream ...', stream_name)
+        client.delete_stream(StreamName=stream_name)
+
+
+def put_kinesis_records(client, stream_name, messages):
+    """Put messages on a stream with random partition keys, MAX_RECORDS_PER_PUT at a time, retrying rejected ones.
+
+    Returns:
+        A tuple of a dict of shard ID to the sequence number of the last record put on that shard, and a list of
+        (number of records put, time) after every PutRecords call, in order.
+    """
+    logger.info('Putting %s records on Kinesis stream %s ...', len(messages), stream_name)
+    last_sequence_numbers = {}
+    put_times = []
+    for start in range(0, len(messages), MAX_RECORDS_PER_PUT):
+        records = [{'Data': message, 'PartitionKey': str(uuid.uuid4())}
+                   for message in messages[start:start + MAX_RECORDS_PER_PUT]]
+        while records:
+            response = client.put_records(Records=records, StreamName=stream_name)
+            for entry in response['Records']:
+                if 'SequenceNumber' in entry:
+                    shard_id = entry['ShardId']
+                    last_sequence_numbers[shard_id] = max(int(entry['SequenceNumber']),
+                                                          last_sequence_numbers.get(shard_id, 0))
+            # Records get rejected when a shard is over its throughput limit; put those again.
+            records = [record for record, entry in zip(records, response['Records']) if 'ErrorCode' in entry]
+        put_times.append((min(start + MAX_RECORDS_PER_PUT, len(messages)), time.time()))
+    return last_sequence_numbers, put_times
+
+
+def sample_iterator_ages(sdc_executor, pipeline, put_times, number_of_records, timeout_sec=3600):
+    """Sample the pipeline's iterator age every ITERATOR_AGE_SAMPLE_INTERVAL_SEC until it put out number_of_records.
+
+    The iterator age is the time since the record the pipeline is at was put, taken to be the record whose number is
+    its output records count. Records are spread evenly over the shards, which are read in parallel, so that holds
+    for all of them alike.
+
+    Returns:
+        A list of the iterator ages sampled, in seconds.
+    """
+    counts = [count for count, _ in put_times]
+    iterator_ages = []
+    start_time = time.time()
+    while True:
+        metrics = sdc_executor.api_client.get_pipeline_metrics(pipeline.id)
+        output_records_count = (metrics.get('counters', {})
+                                       .get('pipeline.batchOutputRecords.counter', {})
+                                       .get('count', 0))
+        if output_records_count >= number_of_records:
+            return iterator_ages
+        # The record numbered output_records_count is the next one to come out; its put is the first to cover it.
+        put_time = put_times[bisect.bisect_right(counts, output_records_count)][1]
+        iterator_ages.append(time.time() - put_time)
+        if time.time() - start_time > timeout_sec:
+            raise TimeoutError(f'Timed out after {timeout_sec} s with {output_records_count} of {number_of_records} '
+                               'records put out')
+        time.sleep(ITERATOR_AGE_SAMPLE_INTERVAL_SEC)
+
+
+def wait_for_checkpoints(dynamodb, application_name, last_sequence_numbers, timeout_sec=600):
+    """Wait until the KCL lease table of application_name has every shard checkpointed at its last sequence number."""
+    start_time = time.time()
+    while time.time() - start_time < timeout_sec:
+        items = dynamodb.scan(TableName=application_name, ConsistentRead=True)['Items']
+        checkpoints = {item['leaseKey']['S']: item['checkpoint']['S'] for item in items}
+        if all(checkpoints.get(shard_id, '').isdigit() and int(checkpoints[shard_id]) >= sequence_number
+               for shard_id, sequence_number in last_sequence_numbers.items()):
+            return
+        time.sleep(0.5)
+    raise TimeoutError('KCL checkpoints of {} did not catch up within {} s.'.format(application_name, timeout_sec))
@@ -0,0 +1,148 @@
+# Copyright 2019 StreamSets Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+The tests in this module are for running the Amazon S3 origin over buckets with many small objects, for the purpose
+of performance testing. With that many objects, listing and read order dominate the run time rather than parsing.
+The data sets are big enough that these tests are meant to be run with the aws environment pointed at a local S3
+stand-in (e.g. MinIO) rather than at AWS itself.
+"""
+
+import json
+import logging
+import time
+import uuid
+
+import pytest
+from streamsets.testframework.markers import aws, sdc_min_version
+from streamsets.testframework.utils import get_random_string
+
+from stage.test_aws_s3_origin import S3_SANDBOX_PREFIX, delete_s3_objects, put_s3_objects
+
+logger = logging.getLogger(__name__)
+
+# Number of sub-prefixes under every level of the nested prefix structure.
+PREFIX_FANOUT = 10
+RECORD = json.dumps(dict(f1='Hello World from SDC & DPM!', f2='Very Long Message In Order To Spend More Time'))
+# Data sets to read, as number of objects, object size and prefix depth. Each one is seeded once for all the
+# parametrizations reading it.
+DATA_SETS = [(number_of_objects, object_size, prefix_depth)
+             for number_of_objects in (10_000, 100_000, 500_000)
+             for object_size in (100, 10_000)
+             for prefix_depth in (0, 2)]
+
+
+@pytest.fixture(scope='module')
+def sdc_builder_hook():
+    def hook(data_collector):
+        data_collector.SDC_JAVA_OPTS = '-Xmx8192m -Xms8192m'
+    return hook
+
+
+@pytest.fixture(scope='module', params=DATA_SETS, ids=lambda data_set: '{}-objects-{}-bytes-depth-{}'.format(*data_set))
+def s3_data_set(request, aws):
+    """Seed a data set of DATA_SETS under a key of its own and delete it once all tests reading it are done.
+
+    Being parametrized and module-scoped, the fixture makes pytest group the tests by data set.
+
+    Returns:
+        A dict with the data set's number_of_objects, object_size, prefix_depth, records_per_object and s3_key.
+    """
+    number_of_objects, object_size, prefix_depth = request.param
+    s3_bucket = aws.s3_bucket_name
+    s3_key = f'{S3_SANDBOX_PREFIX}/{get_random_string()}/sdc'
+    # Every object holds as many newline-separated JSON records as fit into object_size.
+    records_per_object = max(object_size // (len(RECORD) + 1), 1)
+    body = '\n'.join([RECORD] * records_per_object)
+
+    client = aws.s3
+    try:
+        logger.info('Adding %s objects of %s records under %s ...', number_of_objects, records_per_object, s3_key)
+        put_s3_objects(client, s3_bucket,
+                       ((get_nested_key(s3_key, i, prefix_depth), body) for i in range(number_of_objects)))
+        yield dict(number_of_objects=number_of_objects, object_size=object_size, prefix_depth=prefix_depth,
+                   records_per_object=records_per_object, s3_key=s3_key)
+    finally:
+        delete_s3_objects(client, s3_bucket, s3_key)
+
+
+@aws('s3')
+@sdc_min_version('3.7.0')
+@pytest.mark.parametrize('read_order', ('LEXICOGRAPHICAL', 'TIMESTAMP'))
+@pytest.mark.parametrize('number_of_threads', (1, 4, 16))
+def test_s3_origin_many_objects(sdc_builder, sdc_executor, aws, benchmark, s3_data_set, number_of_threads,
+                                read_order):
+    """Performance benchmark an Amazon S3 origin to trash pipeline over many objects under nested prefixes.
+
+    S3 Origin pipeline:
+        s3_origin >> trash
+        s3_origin >= pipeline_finished_executor
+    """
+    s3_bucket = aws.s3_bucket_name
+    s3_key = s3_data_set['s3_key']
+    number_of_objects = s3_data_set['number_of_objects']
+    number_of_records = number_of_objects * s3_data_set['records_per_object']
+
+    builder = sdc_builder.get_pipeline_builder()
+    builder.add_error_stage('Discard')
+
+    s3_origin = builder.add_stage('Amazon S3', type='origin')
+    s3_origin.set_attributes(bucket=s3_bucket, data_format='JSON',
+                             prefix_pattern=f'{s3_key}/{"*/" * s3_data_set["prefix_depth"]}*',
+                             number_of_threads=number_of_threads, read_order=read_order,
+                             max_batch_size_in_records=1000)
+
+    trash = builder.add_stage('Trash')
+
+    pipeline_finished_executor = builder.add_stage('Pipeline Finisher Executor')
+    pipeline_finished_executor.set_attributes(stage_record_preconditions=["${record:eventType() == 'no-more-data'}"])
+
+    s3_origin >> trash
+    s3_origin >= pipeline_finished_executor
+
+    pipeline = builder.build(title='Amazon S3 origin performance pipeline').configure_for_environment(aws)
+    pipeline.configuration['shouldRetry'] = False
+
+    def benchmark_pipeline(executor, pipeline):
+        pipeline.id = str(uuid.uuid4())
+        executor.add_pipeline(pipeline)
+
+        start_time = time.time()
+        pipeline_command = executor.start_pipeline(pipeline)
+        pipeline_command.wait_for_pipeline_output_records_count(1, timeout_sec=3600)
+        first_record_time = time.time()
+        pipeline_command.wait_for_finished(timeout_sec=3600)
+        end_time = time.time()
+
+        history = executor.get_pipeline_history(pipeline)
+        records_read = history.latest.metrics.counter('pipeline.batchOutputRecords.counter').count
+        executor.remove_pipeline(pipeline)
+
+        assert records_read == number_of_records
+
+        duration = end_time - start_time
+        logger.info('Read %s objects at %.2f objects/s and %.2f records/s, first record after %.2f s',
+                    number_of_objects, number_of_objects / duration, number_of_records / duration,
+                    first_record_time - start_time)
+        benchmark.extra_info.setdefault('objects_per_sec', []).append(number_of_objects / duration)
+        benchmark.extra_info.setdefault('records_per_sec', []).append(number_of_records / duration)
+        benchmark.extra_info.setdefault('time_to_first_record_sec', []).append(first_record_time - start_time)
+
+    benchmark.pedantic(benchmark_pipeline, args=(sdc_executor, pipeline), rounds=2)
+
+
+def get_nested_key(s3_key, index, prefix_depth):
+    """Return the key of the object number index, spread over prefix_depth levels of PREFIX_FANOUT sub-prefixes."""
+    sub_prefixes = [f'p{(index // PREFIX_FANOUT ** level) % PREFIX_FANOUT}' for level in range(prefix_depth)]
+    return '/'.join([s3_key] + sub_prefixes + [str(index)])
@@ -0,0 +1,166 @@
+# Copyright 2019 StreamSets Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+The tests in this module are for writing sustained volume to Azure Data Lake Store and Azure Event Hub, for the
+purpose of performance testing. For Data Lake Store we also count the files written, as every file roll costs a
+close and a create round trip; comparing runs that only differ in roll size gives that overhead.
+The tests are meant to be run with the azure environment pointed at local emulators.
+"""
+
+import json
+import logging
+import string
+import uuid
+
+import pytest
+from streamsets.testframework.markers import azure, sdc_min_version
+from streamsets.testframework.utils import get_random_string
+
+from performance.utils import run_until_output_records_count
+from stage.test_azure_stages import AZURE_DATA_LAKE_STORAGE_STAGE_NAME
+
+logger = logging.getLogger(__name__)
+
+RECORDS_PER_BATCH = 1000
+RECORD = dict(name='Jane Smith', phone=2124050000, zip_code=27023,
+              description='Very Long Message In Order To Spend More Time')
+
+
+@pytest.fixture(scope='module')
+def sdc_builder_hook():
+    def hook(data_collector):
+        data_collector.SDC_JAVA_OPTS = '-Xmx8192m -Xms8192m'
+    return hook
+
+
+@azure('datalake')
+@sdc_min_version('3.0.0.0')
+@pytest.mark.parametrize('data_format', ('JSON', 'DELIMITED'))
+@pytest.mark.parametrize('max_records_in_file', (1_000, 100_000))
+@pytest.mark.parametrize('number_of_directories', (1, 10))
+@pytest.mark.parametrize('number_of_records', (1_000_000,))
+def test_datalake_destination(sdc_builder, sdc_executor, azure, benchmark,
+                              number_of_records, number_of_directories, max_records_in_file, data_format):
+    """Performance benchmark a Dev Raw Data Source to Azure Data Lake Store pipeline.
+
+    Records are spread over number_of_directories directories, and files roll every max_records_in_file records,
+    which together set the number of files per directory.
+
+    Data Lake Store Destination pipeline:
+        dev_raw_data_source >> azure_data_lake_store_destination
+    """
+    directory_name = get_random_string(string.ascii_letters, 10)
+    directory_template = f"{directory_name}/${{record:value('/directory')}}"
+    raw_data = json.dumps([dict(RECORD, directory=i % number_of_directories) for i in range(RECORDS_PER_BATCH)])
+
+    builder = sdc_builder.get_pipeline_builder()
+    builder.add_error_stage('Discard')
+
+    dev_raw_data_source = builder.add_stage('Dev Raw Data Source')
+    dev_raw_data_source.set_attributes(data_format='JSON', json_content='ARRAY_OBJECTS', raw_data=raw_data)
+
+    azure_data_lake_store_destination = builder.add_stage(name=AZURE_DATA_LAKE_STORAGE_STAGE_NAME, type='destination')
+    azure_data_lake_store_destination.set_attributes(data_format=data_format,
+                                                     directory_template=directory_template,
+                                                     files_prefix='sdc-${sdc:id()}',
+                                                     max_records_in_file=max_records_in_file)
+
+    dev_raw_data_source >> azure_data_lake_store_destination
+
+    pipeline = builder.build(title='Azure Data Lake Store performance pipeline').configure_for_environment(azure)
+
+    dl_fs = azure.datalake.file_system
+    try:
+        def delete_directory():
+            if dl_fs.exists(directory_name):
+                dl_fs.rm(directory_name, recursive=True)
+
+        def benchmark_pipeline(executor, pipeline):
+            pipeline.id = str(uuid.uuid4())
+            executor.add_pipeline(pipeline)
+
+            duration, _ = run_until_output_records_count(executor, pipeline, number_of_records)
+            executor.remove_pipeline(pipeline)
+
+            number_of_files = len(dl_fs.walk(directory_name))
+            throughput = number_of_records / duration
+            logger.info('Wrote %s records to %s files at %.2f records/s',
+                        number_of_records, number_of_files, throughput)
+            benchmark.extra_info.setdefault('records_per_sec', []).append(throughput)
+            benchmark.extra_info.setdefault('files_per_sec', []).append(number_of_files / duration)
+            benchmark.extra_info.setdefault('number_of_files', []).append(number_of_files)
+
+        # Every round starts from an empty directory, so that the files of earlier rounds don't get counted.
+        benchmark.pedantic(benchmark_pipeline, args=(sdc_executor, pipeline), setup=delete_directory, rounds=2)
+    finally:
+        logger.info('Azure Data Lake directory %s and underlying files will be deleted.', directory_name)
+        delete_directory()
+
+
+@azure('eventhub')
+@sdc_min_version('2.7.1.0')
+@pytest.mark.parametrize('records_per_batch', (100, 1000))
+@pytest.mark.parametrize('number_of_partition_keys', (None, 1, 32))
+@pytest.mark.parametrize('number_of_records', (1_000_000,))
+def test_azure_event_hub_producer(sdc_builder, sdc_executor, azure, benchmark,
+                                  number_of_records, number_of_partition_keys, records_per_batch):
+    """Performance benchmark a Dev Raw Data Source to Azure Event Hub Producer pipeline.
+
+    Without partition keys events are spread round robin, otherwise they are keyed by an expression over
+    number_of_partition_keys distinct values.
+
+    Azure Event Hub Producer pipeline:
+        dev_raw_data_source >> azure_event_hub_producer
+    """
+    event_hub_name = get_random_string(string.ascii_letters, 10)
+    raw_data = json.dumps([dict(RECORD, key=i % (number_of_partition_keys or 1)) for i in range(records_per_batch)])
+
+    builder = sdc_builder.get_pipeline_builder()
+    builder.add_error_stage('Discard')
+
+    dev_raw_data_source = builder.add_stage('Dev Raw Data Source')
+    dev_raw_data_source.set_attributes(data_format='JSON', json_content='ARRAY_OBJECTS', raw_data=raw_data)
+
+    azure_event_hub_producer = builder.add_stage('Azure Event Hub Producer')
+    azure_event_hub_producer.set_attributes(data_format='JSON', event_hub_name=event_hub_name,
+                                            json_content='MULTIPLE_OBJECTS')
+    if number_of_partition_keys:
+        azure_event_hub_producer.set_attributes(partition_strategy='EXPRESSION',
+                                                partition_expression="${record:value('/key')}")
+
+    dev_raw_data_source >> azure_event_hub_producer
+
+    pipeline = builder.build(title='Azure Event Hub Producer performance pipeline').configure_for_environment(azure)
+
+    eh_service_bus = azure.event_hubs.service_bus
+    try:
+        logger.info('Creating event hub %s under event hub namespace %s', event_hub_name, azure.event_hubs.namespace)
+        assert eh_service_bus.create_event_hub(event_hub_name)
+
+        def benchmark_pipeline(executor, pipeline):
+            pipeline.id = str(uuid.uuid4())
+            executor.add_pipeline(pipeline)
+
+            duration, _ = run_until_output_records_count(executor, pipeline, number_of_records)
+            executor.remove_pipeline(pipeline)
+
+            throughput = number_of_records / duration
+            logger.info('Sent %s events at %.2f events/s', number_of_records, throughput)
+            benchmark.extra_info.setdefault('events_per_sec', []).append(throughput)
+
+        benchmark.pedantic(benchmark_pipeline, args=(sdc_executor, pipeline), rounds=2)
+    finally:
+        logger.info('Deleting event hub %s under event hub namespace %s', event_hub_name, azure.event_hubs.namespace)
+        eh_service_bus.delete_event_hub(event_hub_name)
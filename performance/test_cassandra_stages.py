@@ -0,0 +1,149 @@
+# Copyright 2019 StreamSets Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+The tests in this module are for writing millions of rows into Cassandra, for the purpose of performance testing.
+
+Batches that time out on the Cassandra side end up as error records of the destination, so those are reported as
+write timeouts. Rows are counted afterwards with one SELECT COUNT(*) per token range, as a single count over the whole
+table would itself time out at these sizes.
+"""
+
+import logging
+import string
+import uuid
+
+import pytest
+from streamsets.testframework.markers import cassandra
+from streamsets.testframework.utils import get_random_string
+
+from performance.utils import run_until_output_records_count
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 1000
+FIELDS_TO_GENERATE = [{'field': 'name', 'type': 'STRING'},
+                      {'field': 'value', 'type': 'LONG'}]
+# Murmur3Partitioner, the default partitioner, hashes keys to tokens in [-2**63, 2**63 - 1].
+MIN_TOKEN = -2 ** 63
+MAX_TOKEN = 2 ** 63 - 1
+NUMBER_OF_TOKEN_RANGES = 64
+
+
+@pytest.fixture(scope='module')
+def sdc_builder_hook():
+    def hook(data_collector):
+        data_collector.SDC_JAVA_OPTS = '-Xmx8192m -Xms8192m'
+    return hook
+
+
+@cassandra
+@pytest.mark.parametrize('number_of_threads', (1, 4, 16))
+@pytest.mark.parametrize('compression', ('NONE', 'LZ4'))
+@pytest.mark.parametrize('protocol_version', ('V3', 'V4'))
+@pytest.mark.parametrize('max_batch_size', (10, 100))
+@pytest.mark.parametrize('batch_type', ('LOGGED', 'UNLOGGED'))
+@pytest.mark.parametrize('number_of_records', (1_000_000, 5_000_000))
+def test_cassandra_destination(sdc_builder, sdc_executor, cassandra, benchmark, number_of_records, batch_type,
+                               max_batch_size, protocol_version, compression, number_of_threads):
+    """Performance benchmark a Cassandra destination pipeline.
+
+    Concurrency comes from the number of Dev Data Generator threads, each of which runs its own pipeline runner
+    and so its own destination. Records get a random UUID as their key, as the runners can't share a counter.
+
+    Cassandra pipeline:
+        dev_data_generator >> expression_evaluator >> cassandra_destination
+    """
+    cassandra_keyspace = get_random_string(string.ascii_letters, 10)
+    cassandra_table = 'perf'
+
+    builder = sdc_builder.get_pipeline_builder()
+    builder.add_error_stage('Discard')
+
+    dev_data_generator = builder.add_stage('Dev Data Generator')
+    dev_data_generator.set_attributes(batch_size=BATCH_SIZE, delay_between_batches=0,
+                                      number_of_threads=number_of_threads)
+    dev_data_generator.fields_to_generate = FIELDS_TO_GENERATE
+
+    expression_evaluator = builder.add_stage('Expression Evaluator')
+    expression_evaluator.field_expressions = [{'fieldToSet': '/id', 'expression': '${uuid:uuid()}'}]
+
+    cassandra_destination = builder.add_stage('Cassandra', type='destination')
+    cassandra_destination.set_attributes(field_to_column_mapping=[{'field': '/id', 'columnName': 'id'},
+                                                                  {'field': '/name', 'columnName': 'name'},
+                                                                  {'field': '/value', 'columnName': 'value'}],
+                                         fully_qualified_table_name=f'{cassandra_keyspace}.{cassandra_table}',
+                                         batch_type=batch_type,
+                                         max_batch_size=max_batch_size,
+                                         protocol_version=protocol_version,
+                                         compression=compression)
+    if cassandra.kerberos_enabled:
+        cassandra_destination.set_attributes(authentication_provider='KERBEROS')
+    else:
+        cassandra_destination.set_attributes(authentication_provider='PLAINTEXT', password=cassandra.password,
+                                             username=cassandra.username)
+
+    dev_data_generator >> expression_evaluator >> cassandra_destination
+
+    pipeline = builder.build(title='Cassandra destination performance pipeline').configure_for_environment(cassandra)
+    pipeline.configuration['shouldRetry'] = False
+
+    client = cassandra.client
+    session = client.session
+    try:
+        session.execute(f"CREATE KEYSPACE {cassandra_keyspace} WITH replication = "
+                        f"{{'class': 'SimpleStrategy', 'replication_factor': 1}}")
+        session.execute(f'CREATE TABLE {cassandra_keyspace}.{cassandra_table} '
+                        f'(id text PRIMARY KEY, name text, value bigint)')
+
+        def truncate_table():
+            # Every round writes into an empty table, so that the rows of earlier rounds don't get counted.
+            session.execute(f'TRUNCATE {cassandra_keyspace}.{cassandra_table}')
+
+        def benchmark_pipeline(executor, pipeline):
+            pipeline.id = str(uuid.uuid4())
+            executor.add_pipeline(pipeline)
+
+            duration, history = run_until_output_records_count(executor, pipeline, number_of_records)
+            metrics = history.latest.metrics
+            input_records = metrics.counter(f'stage.{cassandra_destination.instance_name}.inputRecords.counter').count
+            write_timeouts = metrics.counter(f'stage.{cassandra_destination.instance_name}.errorRecords.counter').count
+            executor.remove_pipeline(pipeline)
+
+            # Records that reach the destination either end up as rows or, if their batch timed out, as error records.
+            row_count = count_rows(session, cassandra_keyspace, cassandra_table)
+            assert row_count == input_records - write_timeouts
+
+            throughput = number_of_records / duration
+            logger.info('Wrote %s rows at %.2f rows/s with %s write timeouts', row_count, throughput, write_timeouts)
+            benchmark.extra_info.setdefault('rows_per_sec', []).append(throughput)
+            benchmark.extra_info.setdefault('write_timeouts', []).append(write_timeouts)
+
+        benchmark.pedantic(benchmark_pipeline, args=(sdc_executor, pipeline), setup=truncate_table, rounds=2)
+    finally:
+        # drop table and keyspace from Cassandra
+        session.execute(f'DROP TABLE IF EXISTS {cassandra_keyspace}.{cassandra_table}')
+        session.execute(f'DROP KEYSPACE IF EXISTS {cassandra_keyspace}')
+        client.cluster.shutdown()
+
+
+def count_rows(session, cassandra_keyspace, cassandra_table):
+    """Return the number of rows in a table, counted per token range over NUMBER_OF_TOKEN_RANGES ranges."""
+    statement = session.prepare(f'SELECT COUNT(*) FROM {cassandra_keyspace}.{cassandra_table} '
+                                f'WHERE token(id) >= ? AND token(id) <= ?')
+    range_size = (MAX_TOKEN - MIN_TOKEN) // NUMBER_OF_TOKEN_RANGES
+    range_starts = [MIN_TOKEN + i * range_size for i in range(NUMBER_OF_TOKEN_RANGES)]
+    range_ends = [start - 1 for start in range_starts[1:]] + [MAX_TOKEN]
+    return sum(session.execute(statement, (start, end), timeout=60).one()[0]
+               for start, end in zip(range_starts, range_ends))
@@ -0,0 +1,138 @@
+# Copyright 2019 StreamSets Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+The tests in this module are for writing documents into Couchbase at a sustained rate, for the purpose of performance
+testing.
+
+The pipeline is rate limited to the docs/s under test, so the numbers to look at are whether it keeps up with that rate
+and the share of documents that end up as error records, which is where writes that miss their durability requirement
+go. Document keys go through a key space that fits half of the bucket's memory quota in turn, so that writes beyond it
+update documents in place rather than outgrow the bucket, and the bucket ends up with a document per key written.
+"""
+
+import logging
+import string
+import time
+import uuid
+
+import pytest
+from streamsets.testframework.markers import couchbase, sdc_min_version
+from streamsets.testframework.utils import get_random_string
+
+from performance.utils import run_until_batch_count
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 1000
+WRITE_DURATION_SEC = 30
+BUCKET_RAM_QUOTA_MB = 1024
+# Share of the bucket's memory quota the document values may take up, leaving the rest for keys and metadata.
+DOCUMENT_DATA_SHARE = 0.5
+FIELDS_TO_GENERATE = [{'field': 'key', 'type': 'LONG_SEQUENCE'}]
+# Seconds the bucket's item count, which Couchbase updates in the background, gets to catch up with the writes.
+ITEM_COUNT_TIMEOUT_SEC = 60
+
+
+@pytest.fixture(scope='module')
+def sdc_builder_hook():
+    def hook(data_collector):
+        data_collector.SDC_JAVA_OPTS = '-Xmx8192m -Xms8192m'
+    return hook
+
+
+@couchbase
+@sdc_min_version('3.9.0')
+@pytest.mark.parametrize('persist_to', ('NONE', 'MASTER'))
+@pytest.mark.parametrize('document_size', (100, 1000, 10_000))
+@pytest.mark.parametrize('docs_per_sec', (10_000, 50_000))
+def test_couchbase_destination(sdc_builder, sdc_executor, couchbase, benchmark, docs_per_sec, document_size,
+                               persist_to):
+    """Performance benchmark a Couchbase destination pipeline at a sustained rate.
+
+    With persist_to set to MASTER, a write only succeeds once the active node has persisted it to disk. Replication
+    requirements need more than a single node, so they are left out.
+
+    Couchbase pipeline:
+        dev_data_generator >> expression_evaluator >> couchbase_destination
+    """
+    couchbase_host = f'{couchbase.hostname}:{couchbase.port}'
+    bucket_name = get_random_string(string.ascii_letters, 10)
+    number_of_documents = docs_per_sec * WRITE_DURATION_SEC
+    number_of_keys = int(BUCKET_RAM_QUOTA_MB * 2 ** 20 * DOCUMENT_DATA_SHARE) // document_size
+
+    builder = sdc_builder.get_pipeline_builder()
+    builder.add_error_stage('Discard')
+
+    dev_data_generator = builder.add_stage('Dev Data Generator')
+    dev_data_generator.set_attributes(batch_size=BATCH_SIZE, delay_between_batches=0)
+    dev_data_generator.fields_to_generate = FIELDS_TO_GENERATE
+
+    expression_evaluator = builder.add_stage('Expression Evaluator')
+    expression_evaluator.field_expressions = [
+        {'fieldToSet': '/id', 'expression': f"doc${{record:value('/key') mod {number_of_keys}}}"},
+        {'fieldToSet': '/payload', 'expression': get_random_string(string.ascii_letters, document_size)}
+    ]
+
+    couchbase_destination = builder.add_stage('Couchbase', type='destination')
+    couchbase_destination.set_attributes(authentication_mode='USER', document_key="${record:value('/id')}",
+                                         bucket=bucket_name, user_name=couchbase.username,
+                                         password=couchbase.password, node_list=couchbase_host,
+                                         persist_to=persist_to, replicate_to='NONE')
+
+    dev_data_generator >> expression_evaluator >> couchbase_destination
+
+    pipeline = builder.build(title='Couchbase destination performance pipeline').configure_for_environment(couchbase)
+    pipeline.configuration['shouldRetry'] = False
+    pipeline.rate_limit = docs_per_sec
+
+    documents_written = []
+    try:
+        logger.info('Creating %s Couchbase bucket ...', bucket_name)
+        couchbase.admin.bucket_create(name=bucket_name, bucket_type='couchbase', ram_quota=BUCKET_RAM_QUOTA_MB)
+        couchbase.wait_for_healthy_bucket(bucket_name)
+
+        def benchmark_pipeline(executor, pipeline):
+            pipeline.id = str(uuid.uuid4())
+            executor.add_pipeline(pipeline)
+
+            duration, history = run_until_batch_count(executor, pipeline, number_of_documents // BATCH_SIZE)
+            metrics = history.latest.metrics
+            documents_sent = metrics.counter(f'stage.{couchbase_destination.instance_name}.inputRecords.counter').count
+            error_records = metrics.counter(f'stage.{couchbase_destination.instance_name}.errorRecords.counter').count
+            executor.remove_pipeline(pipeline)
+            documents_written.append(documents_sent - error_records)
+
+            throughput = number_of_documents / duration
+            error_rate = error_records / documents_sent
+            logger.info('Wrote %s docs of %s bytes at %.2f docs/s (target %s) with error rate %.4f',
+                        documents_sent, document_size, throughput, docs_per_sec, error_rate)
+            benchmark.extra_info.setdefault('docs_per_sec', []).append(throughput)
+            benchmark.extra_info.setdefault('error_rate', []).append(error_rate)
+
+        benchmark.pedantic(benchmark_pipeline, args=(sdc_executor, pipeline), rounds=2)
+
+        # Every round writes the keys from the first one on again, so the round that wrote the most covers the others.
+        # Writes that end up as error records count as not written.
+        expected_item_count = min(number_of_keys, max(documents_written))
+        start_time = time.time()
+        while True:
+            item_count = couchbase.admin.bucket_info(bucket_name).value['basicStats']['itemCount']
+            if item_count == expected_item_count or time.time() - start_time > ITEM_COUNT_TIMEOUT_SEC:
+                break
+            time.sleep(1)
+        assert item_count == expected_item_count
+    finally:
+        logger.info('Deleting %s Couchbase bucket ...', bucket_name)
+        couchbase.admin.bucket_delete(bucket_name)
@@ -0,0 +1,230 @@
+# Copyright 2019 StreamSets Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+The tests in this module are for running sustained-load Elasticsearch pipelines, for the purpose of performance testing.
+
+The Elasticsearch origin reads an index seeded with millions of documents through a scroll, one page per batch,
+optionally split into parallel slices. Next to docs/s we track SDC's heap while scrolling.
+
+The Elasticsearch destination sends one bulk request per batch, so records per batch is its bulk size. Next to docs/s
+we count the bulk requests Elasticsearch rejected, from its write thread pool stats, and how long after the pipeline
+wrote its last batch it took for all documents to become visible to search. Indexes get a fixed refresh interval,
+which is subtracted from the latter, as no document can be expected to be visible sooner.
+The tests are meant to be run with the elasticsearch environment pointed at a local Elasticsearch container.
+"""
+
+import logging
+import string
+import time
+import uuid
+
+import pytest
+from elasticsearch.helpers import bulk
+from elasticsearch_dsl import Index, Search as ESSearch
+from elasticsearch_dsl.connections import connections
+from streamsets.testframework.markers import elasticsearch
+from streamsets.testframework.utils import get_random_string
+
+from performance.utils import add_generated_record_source, run_until_batch_count
+
+logger = logging.getLogger(__name__)
+
+ES_MAPPING = 'doc'
+MB = 1024 * 1024
+MESSAGE = 'Hello World from SDC & DPM! Very Long Message In Order To Spend More Time'
+SEED_CHUNK_SIZE = 10_000
+REFRESH_INTERVAL_SEC = 1
+
+
+@pytest.fixture(scope='module')
+def sdc_builder_hook():
+    def hook(data_collector):
+        data_collector.SDC_JAVA_OPTS = '-Xmx8192m -Xms8192m'
+        # Let batches grow past the default limit of 1000 records.
+        data_collector.sdc_properties['production.maxBatchSize'] = '10000'
+    return hook
+
+
+@elasticsearch
+@pytest.mark.parametrize('number_of_slices', (1, 4))
+@pytest.mark.parametrize('max_batch_size', (100, 1000, 10_000))
+@pytest.mark.parametrize('cursor_timeout', ('1m', '10m'))
+@pytest.mark.parametrize('number_of_documents', (1_000_000, 5_000_000))
+def test_elasticsearch_origin(sdc_builder, sdc_executor, elasticsearch, benchmark, heap_monitor, number_of_documents,
+                              cursor_timeout, max_batch_size, number_of_slices):
+    """Performance benchmark an Elasticsearch origin to trash pipeline over a large index.
+
+    Elasticsearch origin pipeline:
+        es_origin >> trash
+    """
+    es_index = get_random_string(string.ascii_letters, 10).lower()  # Elasticsearch indexes must be lower case
+
+    builder = sdc_builder.get_pipeline_builder()
+    builder.add_error_stage('Discard')
+
+    es_origin = builder.add_stage('Elasticsearch', type='origin')
+    es_origin.set_attributes(index=es_index, query="{'query': {'match_all': {}}}")
+    es_origin.configuration.update({'conf.cursorTimeout': cursor_timeout,
+                                    'conf.maxBatchSize': max_batch_size,
+                                    'conf.numSlices': number_of_slices})
+
+    trash = builder.add_stage('Trash')
+
+    es_origin >> trash
+
+    pipeline = builder.build(title='Elasticsearch origin performance pipeline').configure_for_environment(elasticsearch)
+
+    elasticsearch.connect()
+    try:
+        seed_documents(es_index, number_of_documents)
+
+        def benchmark_pipeline(executor, pipeline):
+            pipeline.id = str(uuid.uuid4())
+            executor.add_pipeline(pipeline)
+
+            with heap_monitor(pipeline) as heap:
+                start_time = time.time()
+                # The origin finishes the pipeline once it has scrolled through the whole index.
+                executor.start_pipeline(pipeline).wait_for_finished(timeout_sec=3600)
+                end_time = time.time()
+
+            history = executor.get_pipeline_history(pipeline)
+            output_records_count = history.latest.metrics.counter('pipeline.batchOutputRecords.counter').count
+            executor.remove_pipeline(pipeline)
+            assert output_records_count == number_of_documents
+
+            throughput = number_of_documents / (end_time - start_time)
+            logger.info('Read %s docs at %.2f docs/s with a peak heap of %.2f MB',
+                        number_of_documents, throughput, heap.peak / MB)
+            benchmark.extra_info.setdefault('docs_per_sec', []).append(throughput)
+            benchmark.extra_info.setdefault('heap_growth_mb', []).append(heap.growth / MB)
+            benchmark.extra_info.setdefault('peak_heap_mb', []).append(heap.peak / MB)
+
+        benchmark.pedantic(benchmark_pipeline, args=(sdc_executor, pipeline), rounds=2)
+    finally:
+        # Clean up test data in ES
+        Index(es_index).delete(ignore=404)
+
+
+@elasticsearch
+@pytest.mark.parametrize('default_operation', ('INDEX', 'UPSERT'))
+@pytest.mark.parametrize('additional_properties', ('{}', '{"_retry_on_conflict":3}'))
+@pytest.mark.parametrize('number_of_indexes', (1, 10))
+@pytest.mark.parametrize('records_per_batch', (100, 1000, 10_000))
+@pytest.mark.parametrize('number_of_records', (1_000_000,))
+def test_elasticsearch_target(sdc_builder, sdc_executor, elasticsearch, benchmark, number_of_records,
+                              records_per_batch, number_of_indexes, additional_properties, default_operation):
+    """Performance benchmark an Elasticsearch destination pipeline.
+
+    With more than one index, the index of every record is given by an expression over the record.
+
+    Elasticsearch target pipeline:
+        dev_data_generator >> expression_evaluator >> es_target
+    """
+    es_index_prefix = get_random_string(string.ascii_letters, 10).lower()  # Elasticsearch indexes must be lower case
+    es_indexes = [f'{es_index_prefix}-{i}' for i in range(number_of_indexes)]
+
+    builder = sdc_builder.get_pipeline_builder()
+    builder.add_error_stage('Discard')
+
+    expression_evaluator = add_generated_record_source(builder, number_of_records,
+                                                       {'index': f"${{record:value('/id') mod {number_of_indexes}}}",
+                                                        'text': MESSAGE},
+                                                       'id', records_per_batch)
+
+    es_target = builder.add_stage('Elasticsearch', type='destination')
+    es_target.set_attributes(default_operation=default_operation,
+                             document_id="${record:value('/id')}",
+                             index=(es_indexes[0] if number_of_indexes == 1
+                                    else f"{es_index_prefix}-${{record:value('/index')}}"),
+                             mapping=ES_MAPPING,
+                             additional_properties=additional_properties)
+
+    expression_evaluator >> es_target
+
+    pipeline = builder.build(title='Elasticsearch target performance pipeline').configure_for_environment(elasticsearch)
+    pipeline.configuration['shouldRetry'] = False
+
+    elasticsearch.connect()
+    try:
+        def create_indexes():
+            # Every round writes into empty indexes, so that the documents of earlier rounds don't count as visible.
+            for es_index in es_indexes:
+                index = Index(es_index)
+                index.delete(ignore=404)
+                index.settings(number_of_replicas=0, refresh_interval=f'{REFRESH_INTERVAL_SEC}s')
+                index.create()
+
+        def benchmark_pipeline(executor, pipeline):
+            pipeline.id = str(uuid.uuid4())
+            executor.add_pipeline(pipeline)
+
+            rejected_before = get_bulk_rejected_count()
+            start_time = time.time()
+            duration, history = run_until_batch_count(executor, pipeline, number_of_records // records_per_batch)
+            end_time = start_time + duration
+            wait_for_document_count(f'{es_index_prefix}-*', number_of_records)
+            visibility_latency = max(time.time() - end_time - REFRESH_INTERVAL_SEC, 0)
+            rejected = get_bulk_rejected_count() - rejected_before
+
+            error_records = history.latest.metrics.counter(f'stage.{es_target.instance_name}.errorRecords.counter')
+            executor.remove_pipeline(pipeline)
+
+            throughput = number_of_records / duration
+            logger.info('Indexed %s docs at %.2f docs/s with %s bulk rejections and %s error records; '
+                        'all visible %.2f s after the refresh interval',
+                        number_of_records, throughput, rejected, error_records.count, visibility_latency)
+            benchmark.extra_info.setdefault('docs_per_sec', []).append(throughput)
+            benchmark.extra_info.setdefault('bulk_rejections', []).append(rejected)
+            benchmark.extra_info.setdefault('error_records', []).append(error_records.count)
+            benchmark.extra_info.setdefault('visibility_latency_sec', []).append(visibility_latency)
+
+        benchmark.pedantic(benchmark_pipeline, args=(sdc_executor, pipeline), setup=create_indexes, rounds=2)
+    finally:
+        # Clean up test data in ES
+        for es_index in es_indexes:
+            Index(es_index).delete(ignore=404)
+
+
+def seed_documents(es_index, number_of_documents):
+    """Index number_of_documents documents into es_index through the bulk API, then refresh it."""
+    logger.info('Seeding %s documents into Elasticsearch index %s ...', number_of_documents, es_index)
+    index = Index(es_index)
+    index.settings(number_of_replicas=0)
+    index.create()
+    actions = ({'_index': es_index, '_type': ES_MAPPING, '_id': i, 'text': MESSAGE} for i in range(number_of_documents))
+    bulk(connections.get_connection(), actions, chunk_size=SEED_CHUNK_SIZE)
+    index.refresh()
+
+
+def get_bulk_rejected_count():
+    """Return the number of bulk requests rejected by the write thread pools of all Elasticsearch nodes.
+
+    The thread pool is called bulk before Elasticsearch 6.3, so we add up both.
+    """
+    stats = connections.get_connection().nodes.stats(metric='thread_pool')
+    return sum(node['thread_pool'].get(thread_pool, {}).get('rejected', 0)
+               for node in stats['nodes'].values()
+               for thread_pool in ('bulk', 'write'))
+
+
+def wait_for_document_count(es_index, count, timeout_sec=600):
+    """Wait until count documents of es_index are visible to search, without forcing a refresh."""
+    start_time = time.time()
+    while time.time() - start_time < timeout_sec:
+        if ESSearch(index=es_index).count() >= count:
+            return
+        time.sleep(0.1)
+    raise TimeoutError('Less than {} documents of {} were visible after {} s.'.format(count, es_index, timeout_sec))
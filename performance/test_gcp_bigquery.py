@@ -0,0 +1,124 @@
+# Copyright 2019 StreamSets Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+The tests in this module are for running the Google BigQuery origin over result sets of millions of rows, for the
+purpose of performance testing. The origin fetches the query results a page at a time, with the page size tied to the
+maximum batch size, so next to throughput we track the time to the first batch and SDC's heap growth: if the origin
+streams pages, neither should grow with the size of the result set.
+The tests are meant to be run with the gcp environment pointed at a local BigQuery emulator.
+"""
+
+import logging
+import tempfile
+import time
+import uuid
+from string import ascii_letters
+
+import pytest
+from google.cloud.bigquery import Dataset, LoadJobConfig, SchemaField, SourceFormat, Table
+from streamsets.testframework.markers import gcp, sdc_min_version
+from streamsets.testframework.utils import get_random_string
+
+logger = logging.getLogger(__name__)
+
+MB = 1024 * 1024
+SCHEMA = [SchemaField('id', 'INTEGER', mode='REQUIRED'),
+          SchemaField('payload', 'STRING', mode='REQUIRED')]
+
+
+@pytest.fixture(scope='module')
+def sdc_builder_hook():
+    def hook(data_collector):
+        data_collector.SDC_JAVA_OPTS = '-Xmx8192m -Xms8192m'
+    return hook
+
+
+@gcp
+@sdc_min_version('2.7.0.0')
+@pytest.mark.parametrize('row_size', (100, 1000))
+@pytest.mark.parametrize('max_batch_size_in_records', (100, 1000))
+@pytest.mark.parametrize('number_of_rows', (1_000_000, 5_000_000))
+def test_google_bigquery_origin(sdc_builder, sdc_executor, gcp, benchmark, heap_monitor,
+                                number_of_rows, max_batch_size_in_records, row_size):
+    """Performance benchmark a Google BigQuery origin to trash pipeline over a large result set.
+
+    Google BigQuery pipeline:
+        google_bigquery >> trash
+    """
+    dataset_name = get_random_string(ascii_letters, 5)
+    table_name = get_random_string(ascii_letters, 5)
+
+    builder = sdc_builder.get_pipeline_builder()
+    builder.add_error_stage('Discard')
+
+    google_bigquery = builder.add_stage('Google BigQuery', type='origin')
+    google_bigquery.set_attributes(query=f'SELECT * FROM {dataset_name}.{table_name}',
+                                   max_batch_size_in_records=max_batch_size_in_records)
+
+    trash = builder.add_stage('Trash')
+    google_bigquery >> trash
+
+    pipeline = builder.build(title='Google BigQuery origin performance pipeline').configure_for_environment(gcp)
+
+    bigquery_client = gcp.bigquery_client
+    dataset = Dataset(bigquery_client.dataset(dataset_name))
+    try:
+        bigquery_client.create_dataset(dataset)
+        table = bigquery_client.create_table(Table(dataset.table(table_name), schema=SCHEMA))
+        load_rows(bigquery_client, table, number_of_rows, row_size)
+
+        def benchmark_pipeline(executor, pipeline):
+            pipeline.id = str(uuid.uuid4())
+            executor.add_pipeline(pipeline)
+
+            with heap_monitor(pipeline) as heap:
+                start_time = time.time()
+                pipeline_command = executor.start_pipeline(pipeline)
+                pipeline_command.wait_for_pipeline_output_records_count(1, timeout_sec=3600)
+                first_batch_time = time.time()
+                pipeline_command.wait_for_finished(timeout_sec=3600)
+                end_time = time.time()
+
+            history = executor.get_pipeline_history(pipeline)
+            output_records_count = history.latest.metrics.counter('pipeline.batchOutputRecords.counter').count
+            executor.remove_pipeline(pipeline)
+            assert output_records_count == number_of_rows
+
+            throughput = number_of_rows / (end_time - start_time)
+            logger.info('Read %s rows at %.2f rows/s, first batch after %.2f s, heap grew by %.2f MB',
+                        number_of_rows, throughput, first_batch_time - start_time, heap.growth / MB)
+            benchmark.extra_info.setdefault('rows_per_sec', []).append(throughput)
+            benchmark.extra_info.setdefault('time_to_first_batch_sec', []).append(first_batch_time - start_time)
+            benchmark.extra_info.setdefault('heap_growth_mb', []).append(heap.growth / MB)
+            benchmark.extra_info.setdefault('peak_heap_mb', []).append(heap.peak / MB)
+
+        benchmark.pedantic(benchmark_pipeline, args=(sdc_executor, pipeline), rounds=2)
+    finally:
+        bigquery_client.delete_dataset(dataset, delete_contents=True)
+
+
+def load_rows(bigquery_client, table, number_of_rows, row_size):
+    """Fill table with number_of_rows rows of roughly row_size bytes using a single load job.
+
+    Streaming inserts are capped per request, so the rows are spooled to a CSV file and loaded in one go instead.
+    """
+    payload = get_random_string(ascii_letters, row_size)
+    logger.info('Loading %s rows of %s bytes into %s ...', number_of_rows, row_size, table.table_id)
+    with tempfile.TemporaryFile() as csv_file:
+        for i in range(number_of_rows):
+            csv_file.write(f'{i},{payload}\n'.encode())
+        csv_file.seek(0)
+        job_config = LoadJobConfig(schema=SCHEMA, source_format=SourceFormat.CSV)
+        bigquery_client.load_table_from_file(csv_file, table, job_config=job_config).result()
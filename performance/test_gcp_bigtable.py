@@ -0,0 +1,115 @@
+# Copyright 2019 StreamSets Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+The tests in this module are for writing sustained volume to Google Bigtable, for the purpose of performance testing.
+The destination sends its mutations whenever its buffer fills up and at the end of every batch, so next to throughput
+we report the mutation batch latency as the destination's batch processing time divided by the flushes per batch.
+The tests are meant to be run with the gcp environment pointed at a local Bigtable emulator.
+"""
+
+import logging
+import math
+import uuid
+from string import ascii_letters
+
+import pytest
+from streamsets.testframework.markers import gcp, sdc_min_version
+from streamsets.testframework.utils import get_random_string
+
+from performance.utils import run_until_output_records_count
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 10_000
+NUMBER_OF_FIELDS = 8
+FIELDS_TO_GENERATE = ([{'field': 'id', 'type': 'LONG'}, {'field': 'region', 'type': 'STRING'}] +
+                      [{'field': f'field{i}', 'type': 'STRING'} for i in range(NUMBER_OF_FIELDS)])
+
+
+@pytest.fixture(scope='module')
+def sdc_builder_hook():
+    def hook(data_collector):
+        data_collector.SDC_JAVA_OPTS = '-Xmx8192m -Xms8192m'
+        # Batches have to be bigger than the largest mutation buffer for the buffer size to make a difference.
+        data_collector.sdc_properties['production.maxBatchSize'] = str(BATCH_SIZE)
+    return hook
+
+
+@gcp
+@sdc_min_version('2.7.0.0')
+@pytest.mark.parametrize('row_key', ('SINGLE', 'COMPOSITE'))
+@pytest.mark.parametrize('number_of_column_families', (1, 4))
+@pytest.mark.parametrize('number_of_records_to_buffer', (100, 1_000, 10_000))
+@pytest.mark.parametrize('number_of_records', (1_000_000,))
+def test_google_bigtable_destination(sdc_builder, sdc_executor, gcp, benchmark,
+                                     number_of_records, number_of_records_to_buffer, number_of_column_families,
+                                     row_key):
+    """Performance benchmark a Dev Data Generator to Google Bigtable pipeline.
+
+    Google Bigtable pipeline:
+        dev_data_generator >> google_bigtable
+    """
+    table_name = get_random_string(ascii_letters, 5)
+
+    builder = sdc_builder.get_pipeline_builder()
+    builder.add_error_stage('Discard')
+
+    dev_data_generator = builder.add_stage('Dev Data Generator')
+    dev_data_generator.set_attributes(batch_size=BATCH_SIZE, delay_between_batches=0)
+    dev_data_generator.fields_to_generate = FIELDS_TO_GENERATE
+
+    google_bigtable = builder.add_stage('Google Bigtable', type='destination')
+    # Columns are spread round robin over the column families.
+    fields_list = [{'source': f'/field{i}', 'storageType': 'TEXT', 'column': f'cf{i % number_of_column_families}:f{i}'}
+                   for i in range(NUMBER_OF_FIELDS)]
+    google_bigtable.set_attributes(create_table_and_column_families=True,
+                                   explicit_column_family_mapping=True,
+                                   fields=fields_list,
+                                   number_of_records_to_buffer=number_of_records_to_buffer,
+                                   table_name=table_name)
+    if row_key == 'SINGLE':
+        google_bigtable.set_attributes(row_key='/id')
+    else:
+        google_bigtable.set_attributes(create_composite_row_key=True,
+                                       row_key_fields=[{'rowKeyComponent': '/region', 'columnWidth': 16},
+                                                       {'rowKeyComponent': '/id', 'columnWidth': 20}])
+
+    dev_data_generator >> google_bigtable
+
+    pipeline = builder.build(title='Google Bigtable performance pipeline').configure_for_environment(gcp)
+
+    table = gcp.bigtable_instance.table(table_name)
+    try:
+        def benchmark_pipeline(executor, pipeline):
+            pipeline.id = str(uuid.uuid4())
+            executor.add_pipeline(pipeline)
+
+            duration, history = run_until_output_records_count(executor, pipeline, number_of_records)
+            batch_timer = history.latest.metrics.timer(f'stage.{google_bigtable.instance_name}.batchProcessing.timer')
+            executor.remove_pipeline(pipeline)
+
+            throughput = number_of_records / duration
+            flushes_per_batch = math.ceil(BATCH_SIZE / number_of_records_to_buffer)
+            latencies = {percentile: batch_timer._data.get(percentile) / flushes_per_batch
+                         for percentile in ('mean', 'p99')}
+            logger.info('Wrote %s rows at %.2f rows/s, mean mutation batch latency %.3f s',
+                        number_of_records, throughput, latencies['mean'])
+            benchmark.extra_info.setdefault('rows_per_sec', []).append(throughput)
+            for percentile, latency in latencies.items():
+                benchmark.extra_info.setdefault(f'mutation_batch_latency_{percentile}_sec', []).append(latency)
+
+        benchmark.pedantic(benchmark_pipeline, args=(sdc_executor, pipeline), rounds=2)
+    finally:
+        table.delete()
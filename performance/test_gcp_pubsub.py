@@ -0,0 +1,194 @@
+# Copyright 2019 StreamSets Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+The tests in this module are for running high-volume Google Pub/Sub pipelines, for the purpose of performance testing.
+They are meant to be run with the gcp environment pointed at the local Pub/Sub emulator, where publishing and
+pulling a few million messages costs nothing.
+"""
+
+import logging
+import time
+import uuid
+from string import ascii_letters
+
+import pytest
+from streamsets.testframework.markers import gcp, sdc_min_version
+from streamsets.testframework.utils import get_random_string
+
+from performance.utils import run_until_output_records_count
+from stage.test_gcp_stages import MSG_DATA, PubSubMessageCollector
+
+logger = logging.getLogger(__name__)
+
+# Number of publish futures we let pile up before waiting for them.
+PUBLISH_WINDOW = 1000
+
+
+@pytest.fixture(scope='module')
+def sdc_builder_hook():
+    def hook(data_collector):
+        data_collector.SDC_JAVA_OPTS = '-Xmx8192m -Xms8192m'
+    return hook
+
+
+@gcp
+@sdc_min_version('2.7.0.0')
+@pytest.mark.parametrize('max_batch_size_in_records', (100, 1000))
+@pytest.mark.parametrize('subscriber_thread_pool_size', (1, 4))
+@pytest.mark.parametrize('num_pipeline_runners', (1, 4))
+@pytest.mark.parametrize('number_of_messages', (100_000, 1_000_000))
+def test_google_pubsub_subscriber(sdc_builder, sdc_executor, gcp, benchmark, number_of_messages,
+                                  num_pipeline_runners, subscriber_thread_pool_size, max_batch_size_in_records):
+    """Performance benchmark a Google Pub/Sub Subscriber to trash pipeline over a seeded subscription.
+
+    Google Pub/Sub Subscriber pipeline:
+        google_pubsub_subscriber >> trash
+    """
+    topic_name = get_random_string(ascii_letters, 5)
+
+    builder = sdc_builder.get_pipeline_builder()
+    builder.add_error_stage('Discard')
+
+    google_pubsub_subscriber = builder.add_stage('Google Pub Sub Subscriber', type='origin')
+    google_pubsub_subscriber.set_attributes(batch_wait_time_in_ms=1000,
+                                            data_format='TEXT',
+                                            max_batch_size_in_records=max_batch_size_in_records,
+                                            num_pipeline_runners=num_pipeline_runners,
+                                            subscriber_thread_pool_size=subscriber_thread_pool_size)
+
+    trash = builder.add_stage('Trash')
+    google_pubsub_subscriber >> trash
+
+    pipeline = builder.build(title='Google Pub Sub Subscriber performance pipeline').configure_for_environment(gcp)
+
+    pubsub_publisher_client = gcp.pubsub_publisher_client
+    pubsub_subscriber_client = gcp.pubsub_subscriber_client
+
+    project_id = gcp.project_id
+    topic_path = pubsub_publisher_client.topic_path(project_id, topic_name)
+    subscription_paths = []
+    try:
+        pubsub_publisher_client.create_topic(topic_path)
+
+        def seed_subscription(pipeline):
+            # Messages are only delivered to subscriptions that existed when they were published, so every round
+            # gets a new subscription and its own copy of the messages.
+            subscription_id = get_random_string(ascii_letters, 5)
+            subscription_path = pubsub_subscriber_client.subscription_path(project_id, subscription_id)
+            pubsub_subscriber_client.create_subscription(subscription_path, topic_path)
+            subscription_paths.append(subscription_path)
+            publish_messages(pubsub_publisher_client, topic_path, number_of_messages)
+            pipeline[0].subscription_id = subscription_id
+
+        def benchmark_pipeline(executor, pipeline):
+            pipeline.id = str(uuid.uuid4())
+            executor.add_pipeline(pipeline)
+
+            duration, _ = run_until_output_records_count(executor, pipeline, number_of_messages)
+            executor.remove_pipeline(pipeline)
+
+            throughput = number_of_messages / duration
+            logger.info('Read %s messages at %.2f msgs/s', number_of_messages, throughput)
+            benchmark.extra_info.setdefault('msgs_per_sec', []).append(throughput)
+
+        benchmark.pedantic(benchmark_pipeline, args=(sdc_executor, pipeline),
+                           setup=lambda: seed_subscription(pipeline), rounds=2)
+    finally:
+        for subscription_path in subscription_paths:
+            pubsub_subscriber_client.delete_subscription(subscription_path)
+        pubsub_publisher_client.delete_topic(topic_path)
+
+
+@gcp
+@sdc_min_version('2.7.0.0')
+@pytest.mark.parametrize('records_per_batch', (1, 100, 1000))
+@pytest.mark.parametrize('number_of_messages', (100_000, 1_000_000))
+def test_google_pubsub_publisher(sdc_builder, sdc_executor, gcp, benchmark, number_of_messages, records_per_batch):
+    """Performance benchmark a Dev Raw Data Source to Google Pub/Sub Publisher pipeline.
+
+    Next to the pipeline's own throughput, a client subscription counts the messages as they are delivered, which
+    gives the end-to-end rate.
+
+    Google Pub/Sub Publisher pipeline:
+        dev_raw_data_source >> google_pubsub_publisher
+    """
+    topic_name = get_random_string(ascii_letters, 5)
+
+    builder = sdc_builder.get_pipeline_builder()
+    builder.add_error_stage('Discard')
+
+    dev_raw_data_source = builder.add_stage('Dev Raw Data Source')
+    dev_raw_data_source.set_attributes(data_format='TEXT', raw_data='\n'.join([MSG_DATA] * records_per_batch))
+
+    google_pubsub_publisher = builder.add_stage('Google Pub Sub Publisher', type='destination')
+    google_pubsub_publisher.set_attributes(topic_id=topic_name, data_format='TEXT')
+
+    dev_raw_data_source >> google_pubsub_publisher
+
+    pipeline = builder.build(title='Google Pub Sub Publisher performance pipeline').configure_for_environment(gcp)
+
+    pubsub_publisher_client = gcp.pubsub_publisher_client
+    pubsub_subscriber_client = gcp.pubsub_subscriber_client
+
+    project_id = gcp.project_id
+    topic_path = pubsub_publisher_client.topic_path(project_id, topic_name)
+    subscription_paths = []
+    try:
+        pubsub_publisher_client.create_topic(topic_path)
+
+        def benchmark_pipeline(executor, pipeline):
+            subscription_id = get_random_string(ascii_letters, 5)
+            subscription_path = pubsub_subscriber_client.subscription_path(project_id, subscription_id)
+            pubsub_subscriber_client.create_subscription(subscription_path, topic_path)
+            subscription_paths.append(subscription_path)
+
+            collector = PubSubMessageCollector(keep_messages=False)
+            future = pubsub_subscriber_client.subscribe(subscription_path, collector)
+            try:
+                pipeline.id = str(uuid.uuid4())
+                executor.add_pipeline(pipeline)
+
+                start_time = time.time()
+                duration, _ = run_until_output_records_count(executor, pipeline, number_of_messages)
+                executor.remove_pipeline(pipeline)
+                # The messages are all published by now, only their delivery can still be underway.
+                collector.wait_for_messages(number_of_messages, timeout_sec=3600)
+                end_time = time.time()
+            finally:
+                future.cancel()
+
+            throughput = number_of_messages / duration
+            delivered_throughput = number_of_messages / (end_time - start_time)
+            logger.info('Wrote %s messages at %.2f msgs/s, delivered at %.2f msgs/s',
+                        number_of_messages, throughput, delivered_throughput)
+            benchmark.extra_info.setdefault('msgs_per_sec', []).append(throughput)
+            benchmark.extra_info.setdefault('delivered_msgs_per_sec', []).append(delivered_throughput)
+
+        benchmark.pedantic(benchmark_pipeline, args=(sdc_executor, pipeline), rounds=2)
+    finally:
+        for subscription_path in subscription_paths:
+            pubsub_subscriber_client.delete_subscription(subscription_path)
+        pubsub_publisher_client.delete_topic(topic_path)
+
+
+def publish_messages(pubsub_publisher_client, topic_path, number_of_messages, window=PUBLISH_WINDOW):
+    """Publish number_of_messages copies of MSG_DATA, waiting for the publish futures a window at a time."""
+    data = MSG_DATA.encode()
+    logger.info('Publishing %s messages to %s ...', number_of_messages, topic_path)
+    for start in range(0, number_of_messages, window):
+        futures = [pubsub_publisher_client.publish(topic_path, data)
+                   for _ in range(min(window, number_of_messages - start))]
+        for future in futures:
+            future.result()
@@ -0,0 +1,107 @@
+# Copyright 2019 StreamSets Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+The tests in this module are for writing sustained volume to Google Cloud Storage, for the purpose of performance
+testing. The destination writes an object per batch, so the batch size is also the object roll size.
+The tests are meant to be run with the gcp environment pointed at a local Cloud Storage emulator.
+"""
+
+import logging
+import uuid
+from string import ascii_lowercase
+
+import pytest
+from streamsets.testframework.markers import gcp, sdc_min_version
+from streamsets.testframework.utils import get_random_string
+
+from performance.utils import run_until_output_records_count
+
+logger = logging.getLogger(__name__)
+
+FIELDS_TO_GENERATE = [{'field': 'id', 'type': 'LONG'},
+                      {'field': 'name', 'type': 'STRING'},
+                      {'field': 'price', 'type': 'DOUBLE'},
+                      {'field': 'created', 'type': 'DATETIME'},
+                      {'field': 'description', 'type': 'STRING'}]
+COMMON_PREFIX = 'gcs-perf'
+
+
+@pytest.fixture(scope='module')
+def sdc_builder_hook():
+    def hook(data_collector):
+        data_collector.SDC_JAVA_OPTS = '-Xmx8192m -Xms8192m'
+        # Let batches, and so objects, grow past the default limit of 1000 records.
+        data_collector.sdc_properties['production.maxBatchSize'] = '50000'
+    return hook
+
+
+@gcp
+@sdc_min_version('3.0.0.0')
+@pytest.mark.parametrize('data_format', ('JSON', 'DELIMITED'))
+@pytest.mark.parametrize('batch_size', (1_000, 10_000, 50_000))
+@pytest.mark.parametrize('number_of_records', (1_000_000,))
+def test_google_storage_destination(sdc_builder, sdc_executor, gcp, benchmark,
+                                    number_of_records, batch_size, data_format):
+    """Performance benchmark a Dev Data Generator to Google Cloud Storage pipeline.
+
+    Google Cloud Storage pipeline:
+        dev_data_generator >> google_cloud_storage
+    """
+    bucket_name = get_random_string(ascii_lowercase, 10)
+
+    builder = sdc_builder.get_pipeline_builder()
+    builder.add_error_stage('Discard')
+
+    dev_data_generator = builder.add_stage('Dev Data Generator')
+    dev_data_generator.set_attributes(batch_size=batch_size, delay_between_batches=0)
+    dev_data_generator.fields_to_generate = FIELDS_TO_GENERATE
+
+    google_cloud_storage = builder.add_stage('Google Cloud Storage', type='destination')
+    google_cloud_storage.set_attributes(bucket=bucket_name,
+                                        common_prefix=COMMON_PREFIX,
+                                        partition_prefix='${sdc:id()}',
+                                        data_format=data_format,
+                                        file_suffix=data_format.lower())
+
+    dev_data_generator >> google_cloud_storage
+
+    pipeline = builder.build(title='Google Cloud Storage performance pipeline').configure_for_environment(gcp)
+
+    bucket = gcp.storage_client.create_bucket(bucket_name)
+    try:
+        def delete_objects():
+            bucket.delete_blobs(list(bucket.list_blobs()))
+
+        def benchmark_pipeline(executor, pipeline):
+            pipeline.id = str(uuid.uuid4())
+            executor.add_pipeline(pipeline)
+
+            duration, _ = run_until_output_records_count(executor, pipeline, number_of_records)
+            executor.remove_pipeline(pipeline)
+
+            blobs = list(bucket.list_blobs(prefix=COMMON_PREFIX))
+            megabytes = sum(blob.size for blob in blobs) / 1024 / 1024
+            throughput = number_of_records / duration
+            logger.info('Wrote %s rows in %s objects (%.2f MB) at %.2f rows/s',
+                        number_of_records, len(blobs), megabytes, throughput)
+            benchmark.extra_info.setdefault('rows_per_sec', []).append(throughput)
+            benchmark.extra_info.setdefault('mb_per_sec', []).append(megabytes / duration)
+            benchmark.extra_info.setdefault('number_of_objects', []).append(len(blobs))
+
+        # Every round starts from an empty bucket, so that the objects of earlier rounds don't get counted.
+        benchmark.pedantic(benchmark_pipeline, args=(sdc_executor, pipeline), setup=delete_objects, rounds=2)
+    finally:
+        delete_objects()
+        bucket.delete()
@@ -0,0 +1,142 @@
+# Copyright 2019 StreamSets Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+The tests in this module are for bulk writing into HBase, for the purpose of performance testing.
+
+Rows are numbered by a Dev Data Generator sequence, which lets the test derive every row the pipeline wrote.
+Verification then streams the table through a batched scan and compares the row count and an order-independent hash of
+the rows with the expected ones, so that tables of millions of rows never have to be held in memory.
+"""
+
+import hashlib
+import logging
+import string
+import struct
+import time
+import uuid
+
+import pytest
+from streamsets.testframework.markers import cluster
+from streamsets.testframework.utils import get_random_string
+
+from performance.utils import add_generated_record_source, run_until_batch_count
+
+logger = logging.getLogger(__name__)
+
+RECORDS_PER_BATCH = 1000
+SCAN_BATCH_SIZE = 10_000
+# Fields of the numbered records, as expressions of the record number, which is the LONG in cf:b.
+FIELDS = {'key': "row${record:value('/cf:b')}", 'cf:a': "value${record:value('/cf:b')}"}
+
+
+@pytest.fixture(scope='module')
+def sdc_builder_hook():
+    def hook(data_collector):
+        data_collector.SDC_JAVA_OPTS = '-Xmx8192m -Xms8192m'
+    return hook
+
+
+@cluster('cdh', 'hdp')
+@pytest.mark.parametrize('time_basis', ('', '${time:now()}'))
+@pytest.mark.parametrize('implicit_field_mapping', (False, True))
+@pytest.mark.parametrize('storage_type', ('TEXT', 'BINARY'))
+@pytest.mark.parametrize('number_of_rows', (100_000, 1_000_000, 10_000_000))
+def test_hbase_destination(sdc_builder, sdc_executor, cluster, benchmark,
+                           number_of_rows, storage_type, implicit_field_mapping, time_basis):
+    """Performance benchmark an HBase destination pipeline.
+
+    HBase pipeline:
+        dev_data_generator >> expression_evaluator >> hbase
+    """
+    table_name = get_random_string(string.ascii_letters, 10)
+
+    builder = sdc_builder.get_pipeline_builder()
+    builder.add_error_stage('Discard')
+
+    expression_evaluator = add_generated_record_source(builder, number_of_rows, FIELDS, 'cf:b', RECORDS_PER_BATCH)
+
+    hbase = builder.add_stage('HBase', type='destination')
+    hbase.set_attributes(table_name=table_name,
+                         row_key='/key',
+                         storage_type=storage_type,
+                         implicit_field_mapping=implicit_field_mapping,
+                         ignore_invalid_column=implicit_field_mapping,
+                         time_basis=time_basis)
+    if not implicit_field_mapping:
+        hbase.fields = [dict(columnValue='/cf:a', columnStorageType=storage_type, columnName='cf:a'),
+                        dict(columnValue='/cf:b', columnStorageType=storage_type, columnName='cf:b')]
+
+    expression_evaluator >> hbase
+
+    pipeline = builder.build(title='HBase destination performance pipeline').configure_for_environment(cluster)
+    pipeline.configuration['shouldRetry'] = False
+
+    client = cluster.hbase.client
+    try:
+        def create_table():
+            # Every round writes into an empty table, so that the rows of earlier rounds don't get verified.
+            if table_name.encode() in client.tables():
+                client.delete_table(name=table_name, disable=True)
+            logger.info('Creating HBase table %s ...', table_name)
+            client.create_table(name=table_name, families={'cf:': {}})
+
+        def benchmark_pipeline(executor, pipeline):
+            pipeline.id = str(uuid.uuid4())
+            executor.add_pipeline(pipeline)
+
+            duration, _ = run_until_batch_count(executor, pipeline, number_of_rows // RECORDS_PER_BATCH)
+            executor.remove_pipeline(pipeline)
+
+            throughput = number_of_rows / duration
+            logger.info('Wrote %s rows at %.2f rows/s', number_of_rows, throughput)
+            benchmark.extra_info.setdefault('rows_per_sec', []).append(throughput)
+
+        benchmark.pedantic(benchmark_pipeline, args=(sdc_executor, pipeline), setup=create_table, rounds=2)
+
+        # happybase fetches the rows a batch at a time as the scan is iterated.
+        start_time = time.time()
+        scanned = count_and_hash(client.table(table_name).scan(batch_size=SCAN_BATCH_SIZE))
+        logger.info('Scanned %s rows in %.2f s', scanned[0], time.time() - start_time)
+        assert scanned == count_and_hash(get_expected_row(i, storage_type) for i in range(number_of_rows))
+    finally:
+        logger.info('Deleting HBase table %s ...', table_name)
+        try:
+            client.delete_table(name=table_name, disable=True)
+        except Exception as e:
+            # The table may not have been created; don't let that hide why the test failed.
+            logger.warning('Could not delete HBase table %s: %s', table_name, e)
+
+
+def get_expected_row(index, storage_type):
+    """Return the row FIELDS turn record number index into, as a scan would return it."""
+    cf_b = str(index).encode() if storage_type == 'TEXT' else struct.pack('>q', index)
+    return b'row%d' % index, {b'cf:a': b'value%d' % index, b'cf:b': cf_b}
+
+
+def count_and_hash(rows):
+    """Return the number of (key, data) rows in an iterable and a hash of them that does not depend on their order.
+
+    Rows are consumed one at a time, so this works on a generator of any length in constant memory.
+    """
+    count = 0
+    combined_hash = 0
+    for key, data in rows:
+        row_hash = hashlib.md5(key)
+        for column in sorted(data):
+            row_hash.update(b'\0' + column + b'\0' + data[column])
+        combined_hash = (combined_hash + int.from_bytes(row_hash.digest(), 'big')) % 2 ** 128
+        count += 1
+    return count, combined_hash
+
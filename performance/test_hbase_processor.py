@@ -0,0 +1,160 @@
+# Copyright 2019 StreamSets Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+The tests in this module are for running the HBase Lookup processor over different key distributions, for the
+purpose of performance testing its local cache.
+
+Next to lookups/s we read the table's read request count from the RegionServer's JMX servlet before and after every
+run, once it stopped changing, as the RegionServer only refreshes it every few seconds. Every lookup the cache
+doesn't answer is a Get on the RegionServer, so one minus the ratio of read requests to lookups is the cache hit
+ratio. The JMX servlet is reached on the host of the HBase Thrift server, so the numbers are only complete on
+clusters that run a single RegionServer there.
+"""
+
+import logging
+import string
+import time
+import uuid
+
+import pytest
+import requests
+from streamsets.testframework.markers import cluster
+from streamsets.testframework.utils import get_random_string
+
+from performance.utils import add_generated_key_source, run_until_output_records_count
+
+logger = logging.getLogger(__name__)
+
+NUMBER_OF_KEYS = 100_000
+RECORDS_PER_BATCH = 1000
+# Port of the RegionServer web UI and JMX servlet (60030 before HBase 1.0).
+REGION_SERVER_INFO_PORT = 16030
+# Seconds between reads of the read request count, longer than the period the RegionServer refreshes its metrics at
+# (hbase.regionserver.metrics.period, 5 seconds by default).
+READ_REQUEST_COUNT_POLL_INTERVAL_SEC = 6
+
+
+@pytest.fixture(scope='module')
+def sdc_builder_hook():
+    def hook(data_collector):
+        data_collector.SDC_JAVA_OPTS = '-Xmx8192m -Xms8192m'
+    return hook
+
+
+@cluster('cdh', 'hdp')
+@pytest.mark.parametrize('mode', ('BATCH', 'RECORD'))
+@pytest.mark.parametrize('maximum_entries_to_cache, expiration_time', ((None, None),
+                                                                       (1_000, 60),
+                                                                       (NUMBER_OF_KEYS, 1),
+                                                                       (NUMBER_OF_KEYS, 60)))
+@pytest.mark.parametrize('distribution', ('UNIFORM', 'HOT_KEY', 'ALL_MISS'))
+@pytest.mark.parametrize('number_of_lookups', (1_000_000,))
+def test_hbase_lookup_processor(sdc_builder, sdc_executor, cluster, benchmark, number_of_lookups, distribution,
+                                maximum_entries_to_cache, expiration_time, mode):
+    """Performance benchmark an HBase Lookup processor with keys from a given distribution.
+
+    Without maximum_entries_to_cache the local cache is disabled.
+
+    HBase Lookup pipeline:
+        dev_data_generator >> expression_evaluator >> hbase_lookup >> trash
+    """
+    table_name = get_random_string(string.ascii_letters, 10)
+    lookup_parameters = [dict(rowExpr="${record:value('/key')}",
+                              columnExpr='info:value',
+                              outputFieldPath='/value',
+                              timestampExpr='')]
+
+    builder = sdc_builder.get_pipeline_builder()
+    builder.add_error_stage('Discard')
+
+    expression_evaluator = add_generated_key_source(builder, distribution, NUMBER_OF_KEYS, 'key', 'row',
+                                                    RECORDS_PER_BATCH)
+
+    hbase_lookup = builder.add_stage('HBase Lookup')
+    hbase_lookup.set_attributes(lookup_parameters=lookup_parameters, table_name=table_name, mode=mode,
+                                enable_local_caching=maximum_entries_to_cache is not None)
+    if maximum_entries_to_cache is not None:
+        hbase_lookup.set_attributes(maximum_entries_to_cache=maximum_entries_to_cache,
+                                    eviction_policy_type='EXPIRE_AFTER_WRITE',
+                                    expiration_time=expiration_time,
+                                    time_unit='SECONDS')
+
+    trash = builder.add_stage('Trash')
+
+    expression_evaluator >> hbase_lookup >> trash
+
+    pipeline = builder.build(title='HBase Lookup performance pipeline').configure_for_environment(cluster)
+    pipeline.configuration['shouldRetry'] = False
+
+    client = cluster.hbase.client
+    try:
+        logger.info('Creating HBase table %s with %s rows ...', table_name, NUMBER_OF_KEYS)
+        client.create_table(name=table_name, families={'info': {}})
+        with client.table(table_name).batch(batch_size=10_000) as batch:
+            for i in range(NUMBER_OF_KEYS):
+                batch.put(b'row%d' % i, {b'info:value': b'value%d' % i})
+
+        def benchmark_pipeline(executor, pipeline):
+            pipeline.id = str(uuid.uuid4())
+            executor.add_pipeline(pipeline)
+
+            read_requests_before = get_settled_read_request_count(client.host, table_name)
+            duration, history = run_until_output_records_count(executor, pipeline, number_of_lookups)
+            read_requests = get_settled_read_request_count(client.host, table_name) - read_requests_before
+
+            lookups = history.latest.metrics.counter('pipeline.batchOutputRecords.counter').count
+            executor.remove_pipeline(pipeline)
+
+            throughput = number_of_lookups / duration
+            hit_ratio = max(1 - read_requests / lookups, 0)
+            logger.info('Looked up %s keys at %.2f lookups/s with %s RegionServer read requests (hit ratio %.4f)',
+                        lookups, throughput, read_requests, hit_ratio)
+            benchmark.extra_info.setdefault('lookups_per_sec', []).append(throughput)
+            benchmark.extra_info.setdefault('region_server_read_requests', []).append(read_requests)
+            benchmark.extra_info.setdefault('cache_hit_ratio', []).append(hit_ratio)
+
+        benchmark.pedantic(benchmark_pipeline, args=(sdc_executor, pipeline), rounds=2)
+    finally:
+        logger.info('Deleting HBase table %s ...', table_name)
+        try:
+            client.delete_table(name=table_name, disable=True)
+        except Exception as e:
+            # The table may not have been created; don't let that hide why the test failed.
+            logger.warning('Could not delete HBase table %s: %s', table_name, e)
+
+
+def get_read_request_count(host, table_name):
+    """Return the number of read requests served for table_name's regions, from the RegionServer JMX servlet."""
+    response = requests.get(f'http://{host}:{REGION_SERVER_INFO_PORT}/jmx',
+                            params={'qry': 'Hadoop:service=HBase,name=RegionServer,sub=Regions'})
+    response.raise_for_status()
+    region_prefix = f'Namespace_default_table_{table_name}_region_'
+    return sum(value
+               for bean in response.json()['beans']
+               for name, value in bean.items()
+               if name.startswith(region_prefix) and name.endswith('_metric_readRequestCount'))
+
+
+def get_settled_read_request_count(host, table_name, timeout_sec=120):
+    """Return the read request count of table_name's regions once two reads a refresh period apart agree."""
+    start_time = time.time()
+    read_request_count = get_read_request_count(host, table_name)
+    while True:
+        time.sleep(READ_REQUEST_COUNT_POLL_INTERVAL_SEC)
+        previous_read_request_count, read_request_count = read_request_count, get_read_request_count(host, table_name)
+        if read_request_count == previous_read_request_count:
+            return read_request_count
+        if time.time() - start_time > timeout_sec:
+            raise TimeoutError(f'Read request count of HBase table {table_name} still changing after {timeout_sec} s')
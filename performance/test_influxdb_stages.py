@@ -0,0 +1,150 @@
+# Copyright 2019 StreamSets Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+The tests in this module are for writing points into InfluxDB at a sustained rate, for the purpose of performance
+testing.
+
+The pipeline is rate limited to the points/s under test, so the numbers to look at are whether it keeps up with that
+rate and the share of points that end up as error records. Points are timestamped with the time they pass through the
+pipeline plus a random number of nanoseconds, so a point only rarely overwrites another one in the same series. The
+number of points in the measurement is checked afterwards against the number of points written.
+"""
+
+import logging
+import string
+import uuid
+
+import pytest
+from streamsets.testframework.markers import influxdb
+from streamsets.testframework.utils import get_random_string
+
+from performance.utils import run_until_batch_count
+
+logger = logging.getLogger(__name__)
+
+WRITE_DURATION_SEC = 60
+FIELDS_TO_GENERATE = [{'field': 'tag', 'type': 'INTEGER'},
+                      {'field': 'value', 'type': 'LONG'}]
+
+
+@pytest.fixture(scope='module')
+def sdc_builder_hook():
+    def hook(data_collector):
+        data_collector.SDC_JAVA_OPTS = '-Xmx8192m -Xms8192m'
+        # Let batches grow past the default limit of 1000 records.
+        data_collector.sdc_properties['production.maxBatchSize'] = '10000'
+    return hook
+
+
+@influxdb
+@pytest.mark.parametrize('retention_policy', ('', '1h'))
+@pytest.mark.parametrize('tag_cardinality', (10, 10_000, 100_000))
+@pytest.mark.parametrize('records_per_batch', (1000, 10_000))
+@pytest.mark.parametrize('points_per_sec', (100_000, 500_000))
+def test_influxdb_destination(sdc_builder, sdc_executor, influxdb, benchmark, points_per_sec, records_per_batch,
+                              tag_cardinality, retention_policy):
+    """Performance benchmark an InfluxDB destination pipeline at a sustained rate.
+
+    Every batch is written as one request of line protocol, so records per batch is the line batch size. Without a
+    retention policy, points go into the default one of the database.
+
+    InfluxDB pipeline:
+        dev_data_generator >> expression_evaluator >> influxdb_destination
+    """
+    client = influxdb.client
+    measurement = get_random_string(string.ascii_letters, 10)
+    retention_policy_name = get_random_string(string.ascii_letters, 10) if retention_policy else ''
+    number_of_points = points_per_sec * WRITE_DURATION_SEC
+
+    builder = sdc_builder.get_pipeline_builder()
+    builder.add_error_stage('Discard')
+
+    dev_data_generator = builder.add_stage('Dev Data Generator')
+    dev_data_generator.set_attributes(batch_size=records_per_batch, delay_between_batches=0)
+    dev_data_generator.fields_to_generate = FIELDS_TO_GENERATE
+
+    expression_evaluator = builder.add_stage('Expression Evaluator')
+    # Points are timestamped from now on, so that they fall within the retention policy.
+    expression_evaluator.field_expressions = [
+        {'fieldToSet': '/measurement', 'expression': measurement},
+        {'fieldToSet': '/host', 'expression': f"host${{math:abs(record:value('/tag')) mod {tag_cardinality}}}"},
+        {'fieldToSet': '/time',
+         'expression': ("${time:dateTimeToMilliseconds(time:now()) * 1000000 + "
+                        "math:abs(record:value('/value')) mod 1000000}")}
+    ]
+
+    influxdb_destination = builder.add_stage('InfluxDB', type='destination')
+    influxdb_destination.set_attributes(auto_create_database=False, record_mapping='CUSTOM',
+                                        measurement_field='/measurement',
+                                        time_field='/time',
+                                        time_unit='NANOSECONDS',
+                                        tag_fields=['/host'],
+                                        value_fields=['/value'],
+                                        retention_policy=retention_policy_name)
+
+    dev_data_generator >> expression_evaluator >> influxdb_destination
+
+    pipeline = builder.build(title='InfluxDB destination performance pipeline').configure_for_environment(influxdb)
+    pipeline.configuration['shouldRetry'] = False
+    pipeline.rate_limit = points_per_sec
+
+    # Determine if database already exists or not. If it does not, then only have the test create it.
+    create_db = not any(database['name'] == influxdb.database for database in client.get_list_database())
+    try:
+        if create_db:
+            logger.info('Creating InfluxDB database %s ...', influxdb.database)
+            client.create_database(influxdb.database)
+        if retention_policy_name:
+            logger.info('Creating InfluxDB retention policy %s with duration %s ...',
+                        retention_policy_name, retention_policy)
+            client.create_retention_policy(retention_policy_name, retention_policy, 1, database=influxdb.database)
+        measurement_path = f'"{retention_policy_name}"."{measurement}"' if retention_policy_name else measurement
+
+        def drop_measurement():
+            # Every round starts without the points of earlier rounds, so that they don't get counted.
+            influxdb.drop_measurement(measurement)
+
+        def benchmark_pipeline(executor, pipeline):
+            pipeline.id = str(uuid.uuid4())
+            executor.add_pipeline(pipeline)
+
+            duration, history = run_until_batch_count(executor, pipeline, number_of_points // records_per_batch)
+            metrics = history.latest.metrics
+            points_sent = metrics.counter(f'stage.{influxdb_destination.instance_name}.inputRecords.counter').count
+            error_records = metrics.counter(f'stage.{influxdb_destination.instance_name}.errorRecords.counter').count
+            executor.remove_pipeline(pipeline)
+
+            # Points that draw the same timestamp in the same series overwrite each other.
+            result = client.query(f'SELECT COUNT("value") FROM {measurement_path}')
+            points_written = next(result.get_points(), {}).get('count', 0)
+            assert 0 < points_written <= points_sent - error_records
+
+            throughput = number_of_points / duration
+            error_rate = error_records / points_sent
+            logger.info('Wrote %s points at %.2f points/s (target %s) with error rate %.4f',
+                        points_written, throughput, points_per_sec, error_rate)
+            benchmark.extra_info.setdefault('points_per_sec', []).append(throughput)
+            benchmark.extra_info.setdefault('error_rate', []).append(error_rate)
+
+        benchmark.pedantic(benchmark_pipeline, args=(sdc_executor, pipeline), setup=drop_measurement, rounds=2)
+    finally:
+        logger.info('Dropping InfluxDB measurement %s in the database %s ...', measurement, influxdb.database)
+        influxdb.drop_measurement(measurement)
+        if retention_policy_name:
+            logger.info('Dropping InfluxDB retention policy %s ...', retention_policy_name)
+            client.drop_retention_policy(retention_policy_name, database=influxdb.database)
+        if create_db:
+            logger.info('Dropping InfluxDB database %s ...', influxdb.database)
+            client.drop_database(influxdb.database)
@@ -0,0 +1,226 @@
+# Copyright 2019 StreamSets Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+The tests in this module are for flooding ActiveMQ queues and topics through the JMS Consumer and JMS Producer, for
+the purpose of performance testing.
+
+Both stages use a transacted session that gets committed once per batch, so the batch size is what sets how often
+messages get acknowledged. What the broker's client does besides that, like how many messages it prefetches, is set
+through ActiveMQ connection factory properties. Messages are sent and received on the test side over STOMP.
+"""
+
+import logging
+import string
+import time
+import uuid
+
+import pytest
+from stomp.listener import ConnectionListener
+from streamsets.testframework.markers import jms, sdc_min_version
+from streamsets.testframework.utils import get_random_string
+
+from performance.utils import run_until_output_records_count
+from stage.test_jms_stages import (DEFAULT_PASSWORD, DEFAULT_USERNAME, JMS_INITIAL_CONTEXT_FACTORY,
+                                   JNDI_CONNECTION_FACTORY)
+
+logger = logging.getLogger(__name__)
+
+# STOMP destinations of the JMS destination types.
+STOMP_DESTINATION_PREFIXES = {'QUEUE': '/queue/', 'TOPIC': '/topic/'}
+
+
+@pytest.fixture(scope='module')
+def sdc_builder_hook():
+    def hook(data_collector):
+        data_collector.SDC_JAVA_OPTS = '-Xmx8192m -Xms8192m'
+        # Let batches grow past the default limit of 1000 records.
+        data_collector.sdc_properties['production.maxBatchSize'] = '10000'
+    return hook
+
+
+@jms('activemq')
+@sdc_min_version('3.9.0')
+@pytest.mark.parametrize('prefetch', (1, 1000))
+@pytest.mark.parametrize('max_batch_size_in_records', (100, 1000, 10_000))
+@pytest.mark.parametrize('message_size', (100, 1000, 10_000))
+@pytest.mark.parametrize('jms_destination_type', ('QUEUE', 'TOPIC'))
+@pytest.mark.parametrize('number_of_messages', (100_000,))
+def test_jms_consumer(sdc_builder, sdc_executor, jms, benchmark, number_of_messages, jms_destination_type,
+                      message_size, max_batch_size_in_records, prefetch):
+    """Performance benchmark a JMS Consumer pipeline reading a flooded queue or topic.
+
+    Topics are read through a durable subscription, so that the messages sent before the pipeline starts are kept for
+    it.
+
+    JMS Consumer pipeline:
+        jms_consumer >> trash
+    """
+    destination_name = get_random_string(string.ascii_letters, 10)
+    message = get_random_string(string.ascii_letters, message_size)
+
+    builder = sdc_builder.get_pipeline_builder()
+    builder.add_error_stage('Discard')
+
+    jms_consumer = builder.add_stage('JMS Consumer')
+    # TEXT records get cut off at max_line_length characters, which is 1024 by default.
+    jms_consumer.set_attributes(data_format='TEXT',
+                                max_line_length=message_size + 1,
+                                jms_destination_name=destination_name,
+                                jms_destination_type=jms_destination_type,
+                                jms_initial_context_factory=JMS_INITIAL_CONTEXT_FACTORY,
+                                jndi_connection_factory=JNDI_CONNECTION_FACTORY,
+                                password=DEFAULT_PASSWORD,
+                                username=DEFAULT_USERNAME,
+                                max_batch_size_in_records=max_batch_size_in_records,
+                                additional_jms_configuration_properties=[{'key': 'prefetchPolicy.all',
+                                                                          'value': str(prefetch)}])
+    if jms_destination_type == 'TOPIC':
+        jms_consumer.set_attributes(client_id=f'client{destination_name}',
+                                    durable_subscription=True,
+                                    durable_subscription_name=f'sub{destination_name}')
+
+    trash = builder.add_stage('Trash')
+
+    jms_consumer >> trash
+
+    pipeline = builder.build(title='JMS Consumer performance pipeline').configure_for_environment(jms)
+    pipeline.configuration['shouldRetry'] = False
+
+    connection = jms.client_connection
+    try:
+        connection.start()
+        connection.connect(login=DEFAULT_USERNAME, passcode=DEFAULT_PASSWORD)
+
+        if jms_destination_type == 'TOPIC':
+            # Running the pipeline once creates the durable subscription, which then keeps the messages sent to it.
+            logger.info('Creating durable subscription to JMS topic %s ...', destination_name)
+            pipeline.id = str(uuid.uuid4())
+            sdc_executor.add_pipeline(pipeline)
+            sdc_executor.start_pipeline(pipeline)
+            sdc_executor.stop_pipeline(pipeline)
+            sdc_executor.remove_pipeline(pipeline)
+
+        def send_messages():
+            logger.info('Sending %s messages to JMS %s %s ...', number_of_messages, jms_destination_type,
+                        destination_name)
+            stomp_destination = f'{STOMP_DESTINATION_PREFIXES[jms_destination_type]}{destination_name}'
+            for _ in range(number_of_messages):
+                connection.send(stomp_destination, message, persistent='false')
+
+        def benchmark_pipeline(executor, pipeline):
+            pipeline.id = str(uuid.uuid4())
+            executor.add_pipeline(pipeline)
+
+            duration, _ = run_until_output_records_count(executor, pipeline, number_of_messages)
+            executor.remove_pipeline(pipeline)
+
+            messages_per_sec = number_of_messages / duration
+            logger.info('Consumed %s messages of %s bytes at %.2f msgs/s',
+                        number_of_messages, message_size, messages_per_sec)
+            benchmark.extra_info.setdefault('msgs_per_sec', []).append(messages_per_sec)
+
+        benchmark.pedantic(benchmark_pipeline, args=(sdc_executor, pipeline), setup=send_messages, rounds=2)
+    finally:
+        connection.disconnect()
+
+
+@jms('activemq')
+@pytest.mark.parametrize('records_per_batch', (100, 1000, 10_000))
+@pytest.mark.parametrize('message_size', (100, 1000, 10_000))
+@pytest.mark.parametrize('jms_destination_type', ('QUEUE', 'TOPIC'))
+@pytest.mark.parametrize('number_of_messages', (100_000,))
+def test_jms_producer(sdc_builder, sdc_executor, jms, benchmark, number_of_messages, jms_destination_type,
+                      message_size, records_per_batch):
+    """Performance benchmark a JMS Producer pipeline flooding a queue or topic.
+
+    A STOMP subscriber counts the messages that arrive, which also keeps them from piling up on the broker.
+
+    JMS Producer pipeline:
+        dev_data_generator >> expression_evaluator >> jms_producer
+    """
+    destination_name = get_random_string(string.ascii_letters, 10)
+
+    builder = sdc_builder.get_pipeline_builder()
+    builder.add_error_stage('Discard')
+
+    dev_data_generator = builder.add_stage('Dev Data Generator')
+    dev_data_generator.set_attributes(batch_size=records_per_batch, delay_between_batches=0)
+    dev_data_generator.fields_to_generate = [{'field': 'key', 'type': 'LONG'}]
+
+    # The JMS Producer sends the /text field of records as the messages of the TEXT data format.
+    expression_evaluator = builder.add_stage('Expression Evaluator')
+    expression_evaluator.field_expressions = [
+        {'fieldToSet': '/text', 'expression': get_random_string(string.ascii_letters, message_size)}
+    ]
+
+    jms_producer = builder.add_stage('JMS Producer', type='destination')
+    jms_producer.set_attributes(data_format='TEXT',
+                                jms_destination_name=destination_name,
+                                jms_destination_type=jms_destination_type,
+                                jms_initial_context_factory=JMS_INITIAL_CONTEXT_FACTORY,
+                                jndi_connection_factory=JNDI_CONNECTION_FACTORY,
+                                password=DEFAULT_PASSWORD,
+                                username=DEFAULT_USERNAME)
+
+    dev_data_generator >> expression_evaluator >> jms_producer
+
+    pipeline = builder.build(title='JMS Producer performance pipeline').configure_for_environment(jms)
+    pipeline.configuration['shouldRetry'] = False
+
+    connection = jms.client_connection
+    try:
+        listener = MessageCounter()
+        connection.set_listener('', listener)
+        connection.start()
+        connection.connect(login=DEFAULT_USERNAME, passcode=DEFAULT_PASSWORD)
+        connection.subscribe(destination=f'{STOMP_DESTINATION_PREFIXES[jms_destination_type]}{destination_name}',
+                             id=destination_name)
+
+        def benchmark_pipeline(executor, pipeline):
+            pipeline.id = str(uuid.uuid4())
+            executor.add_pipeline(pipeline)
+
+            messages_received_before = listener.count
+            duration, history = run_until_output_records_count(executor, pipeline, number_of_messages)
+            messages_sent = history.latest.metrics.counter('pipeline.batchOutputRecords.counter').count
+            executor.remove_pipeline(pipeline)
+
+            listener.wait_for_count(messages_received_before + messages_sent)
+
+            messages_per_sec = number_of_messages / duration
+            logger.info('Produced %s messages of %s bytes at %.2f msgs/s',
+                        messages_sent, message_size, messages_per_sec)
+            benchmark.extra_info.setdefault('msgs_per_sec', []).append(messages_per_sec)
+
+        benchmark.pedantic(benchmark_pipeline, args=(sdc_executor, pipeline), rounds=2)
+    finally:
+        connection.disconnect()
+
+
+class MessageCounter(ConnectionListener):
+    """STOMP listener counting the messages it receives, without keeping them."""
+    def __init__(self):
+        self.count = 0
+
+    def on_message(self, headers, message):
+        self.count += 1
+
+    def wait_for_count(self, count, timeout_sec=600):
+        """Wait until at least count messages have been received."""
+        start_time = time.time()
+        while self.count < count:
+            if time.time() - start_time > timeout_sec:
+                raise TimeoutError(f'Timed out after {timeout_sec} s with {self.count} of {count} messages received')
+            time.sleep(1)
@@ -0,0 +1,245 @@
+# Copyright 2019 StreamSets Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+The tests in this module are for running high-volume Kafka pipelines in cluster mode (YARN streaming), for the
+purpose of performance testing. To have a baseline to compare against, the same data set is also read by a
+standalone multithreaded pipeline. In both cases records are sent through SDC RPC to a standalone receiver pipeline
+and throughput is measured at that receiver, so the numbers cover the whole end-to-end path.
+"""
+
+import logging
+import string
+import time
+import uuid
+
+import pytest
+from kafka.admin import KafkaAdminClient, NewTopic
+from streamsets.sdk.utils import Version
+from streamsets.testframework.environments import cloudera
+from streamsets.testframework.environments.cloudera import ClouderaManagerCluster
+from streamsets.testframework.environments.kafka import KafkaCluster
+from streamsets.testframework.markers import cluster, sdc_min_version
+from streamsets.testframework.utils import get_random_string
+
+logger = logging.getLogger(__name__)
+
+# Specify a port for SDC RPC stages to use.
+SDC_RPC_PORT = 20000
+NUMBER_OF_PARTITIONS = 16
+MESSAGE = 'Hello World from SDC & DPM! ' * 4
+MIN_SDC_VERSION_WITH_SPARK_2_LIB = Version('3.3.0')
+
+
+@pytest.fixture(scope='module')
+def sdc_builder_hook():
+    def hook(data_collector):
+        data_collector.SDC_JAVA_OPTS = '-Xmx8192m -Xms8192m'
+    return hook
+
+
+@pytest.fixture(autouse=True)
+def kafka_check(cluster):
+    if isinstance(cluster, ClouderaManagerCluster) and not hasattr(cluster, 'kafka'):
+        pytest.skip('Kafka tests require Kafka to be installed on the cluster')
+
+
+@cluster('cdh')
+@pytest.mark.parametrize('rate_limit_per_partition', (1_000, 10_000, 100_000))
+@pytest.mark.parametrize('number_of_executors', (1, 2, 4, 8, 16))
+@pytest.mark.parametrize('number_of_records', (1_000_000, 10_000_000))
+def test_kafka_origin_cluster(sdc_builder, sdc_executor, cluster, benchmark,
+                              number_of_records, number_of_executors, rate_limit_per_partition):
+    """Performance benchmark a cluster mode Kafka Consumer to SDC RPC pipeline.
+
+    Kafka Consumer Origin pipeline with cluster mode:
+        kafka_consumer >> sdc_rpc_destination
+
+    Receiver pipeline:
+        sdc_rpc_origin >> trash
+
+    Besides the pytest-benchmark timings, YARN startup latency (time until the first record reaches the receiver)
+    and steady-state throughput (records/s after the first record) are recorded in the benchmark's extra info.
+    """
+    if (Version(sdc_builder.version) < MIN_SDC_VERSION_WITH_SPARK_2_LIB and
+            ('kafka' in cluster.kerberized_services or cluster.kafka.is_ssl_enabled)):
+        pytest.skip('Kafka cluster mode test only '
+                    f'runs against cluster with the non-secured Kafka for SDC version {sdc_builder.version}.')
+
+    topic = get_random_string(string.ascii_letters, 10)
+
+    builder = sdc_builder.get_pipeline_builder()
+    builder.add_error_stage('Discard')
+    if Version(sdc_builder.version) < MIN_SDC_VERSION_WITH_SPARK_2_LIB:
+        kafka_cluster_stage_lib = cluster.kafka.cluster_stage_lib_spark1
+    else:
+        kafka_cluster_stage_lib = cluster.kafka.cluster_stage_lib_spark2
+    kafka_consumer = builder.add_stage('Kafka Consumer', type='origin', library=kafka_cluster_stage_lib)
+    kafka_consumer.set_attributes(data_format='TEXT',
+                                  batch_wait_time_in_ms=2000,
+                                  max_batch_size_in_records=1000,
+                                  rate_limit_per_partition_in_kafka_messages=rate_limit_per_partition,
+                                  topic=topic,
+                                  kafka_configuration=[{'key': 'auto.offset.reset', 'value': 'earliest'}])
+    sdc_rpc_destination = get_rpc_destination(builder, sdc_executor)
+    kafka_consumer >> sdc_rpc_destination
+    kafka_consumer_pipeline = builder.build(title='Cluster Kafka performance pipeline')
+    kafka_consumer_pipeline.configure_for_environment(cluster)
+    kafka_consumer_pipeline.configuration['executionMode'] = 'CLUSTER_YARN_STREAMING'
+    kafka_consumer_pipeline.configuration['workerCount'] = number_of_executors
+    kafka_consumer_pipeline.configuration['shouldRetry'] = False
+
+    receiver_pipeline = get_receiver_pipeline(sdc_builder, sdc_rpc_destination)
+
+    create_kafka_topic(cluster, topic)
+    produce_kafka_messages(topic, cluster, number_of_records)
+
+    def benchmark_pipeline(executor, pipelines):
+        # A fresh consumer group per round so that every round reads the topic from the beginning.
+        pipelines[0][0].consumer_group = get_random_string(string.ascii_letters, 10)
+        run_and_measure(executor, *pipelines, number_of_records, benchmark.extra_info)
+
+    benchmark.pedantic(benchmark_pipeline, args=(sdc_executor, (kafka_consumer_pipeline, receiver_pipeline)),
+                       rounds=2)
+
+
+@cluster('cdh', 'kafka')
+@sdc_min_version('3.0.0.0')
+@pytest.mark.parametrize('number_of_threads', (1, 2, 4, 8, 16))
+@pytest.mark.parametrize('number_of_records', (1_000_000, 10_000_000))
+def test_kafka_multitopic_origin_standalone(sdc_builder, sdc_executor, cluster, benchmark,
+                                            number_of_records, number_of_threads):
+    """Performance benchmark a standalone multithreaded Kafka Multitopic Consumer to SDC RPC pipeline. This is the
+    baseline that :py:func:`test_kafka_origin_cluster` is compared against.
+
+    Kafka Multitopic Consumer pipeline with standalone mode:
+        kafka_multitopic_consumer >> sdc_rpc_destination
+
+    Receiver pipeline:
+        sdc_rpc_origin >> trash
+    """
+    topic = get_random_string(string.ascii_letters, 10)
+
+    builder = sdc_builder.get_pipeline_builder()
+    builder.add_error_stage('Discard')
+    stages_library = cluster.kafka.standalone_stage_lib
+    if isinstance(cluster, ClouderaManagerCluster):
+        cdh_version_tuple = tuple(int(i) for i in cluster.version[3:].split('.'))
+        if cdh_version_tuple >= cloudera.EARLIEST_CDH_VERSION_WITH_KAFKA:
+            stages_library = cluster.sdc_stage_libs[0]
+    kafka_multitopic_consumer = builder.add_stage('Kafka Multitopic Consumer', type='origin', library=stages_library)
+    kafka_multitopic_consumer.set_attributes(data_format='TEXT',
+                                             batch_wait_time_in_ms=2000,
+                                             max_batch_size_in_records=1000,
+                                             number_of_threads=number_of_threads,
+                                             topic_list=[topic],
+                                             configuration_properties=[{'key': 'auto.offset.reset',
+                                                                        'value': 'earliest'}])
+    sdc_rpc_destination = get_rpc_destination(builder, sdc_executor)
+    kafka_multitopic_consumer >> sdc_rpc_destination
+    kafka_consumer_pipeline = builder.build(title='Standalone Kafka performance pipeline')
+    kafka_consumer_pipeline.configure_for_environment(cluster)
+    kafka_consumer_pipeline.configuration['executionMode'] = 'STANDALONE'
+    kafka_consumer_pipeline.configuration['shouldRetry'] = False
+
+    receiver_pipeline = get_receiver_pipeline(sdc_builder, sdc_rpc_destination)
+
+    create_kafka_topic(cluster, topic)
+    produce_kafka_messages(topic, cluster, number_of_records)
+
+    def benchmark_pipeline(executor, pipelines):
+        pipelines[0][0].consumer_group = get_random_string(string.ascii_letters, 10)
+        run_and_measure(executor, *pipelines, number_of_records, benchmark.extra_info)
+
+    benchmark.pedantic(benchmark_pipeline, args=(sdc_executor, (kafka_consumer_pipeline, receiver_pipeline)),
+                       rounds=2)
+
+
+def get_rpc_destination(builder, sdc_executor):
+    """Create and return rpc destination stage with basic configuration"""
+    sdc_rpc_destination = builder.add_stage(name='com_streamsets_pipeline_stage_destination_sdcipc_SdcIpcDTarget')
+    sdc_rpc_destination.sdc_rpc_connection.append('{}:{}'.format(sdc_executor.server_host, SDC_RPC_PORT))
+    sdc_rpc_destination.sdc_rpc_id = get_random_string(string.ascii_letters, 10)
+
+    return sdc_rpc_destination
+
+
+def get_receiver_pipeline(sdc_builder, sdc_rpc_destination):
+    """Create and return the standalone pipeline that receives the records over SDC RPC."""
+    builder = sdc_builder.get_pipeline_builder()
+    builder.add_error_stage('Discard')
+
+    sdc_rpc_origin = builder.add_stage(name='com_streamsets_pipeline_stage_origin_sdcipc_SdcIpcDSource')
+    sdc_rpc_origin.sdc_rpc_listening_port = SDC_RPC_PORT
+    sdc_rpc_origin.sdc_rpc_id = sdc_rpc_destination.sdc_rpc_id
+    sdc_rpc_origin.batch_wait_time_in_secs = 5
+
+    trash = builder.add_stage(label='Trash')
+    sdc_rpc_origin >> trash
+
+    return builder.build(title='Kafka performance receiver pipeline')
+
+
+def create_kafka_topic(cluster, topic):
+    """Create the topic up front so that it has enough partitions for all the executors/threads we sweep over."""
+    bootstrap_server = (f'{cluster.kafka.brokers[0]}' if isinstance(cluster, KafkaCluster)
+                        else f'{cluster.server_host}:{cluster.kafka.broker_port}')
+    admin_client = KafkaAdminClient(bootstrap_servers=bootstrap_server)
+    try:
+        logger.info('Creating Kafka topic %s with %s partitions ...', topic, NUMBER_OF_PARTITIONS)
+        admin_client.create_topics([NewTopic(name=topic, num_partitions=NUMBER_OF_PARTITIONS, replication_factor=1)])
+    finally:
+        admin_client.close()
+
+
+def produce_kafka_messages(topic, cluster, number_of_records):
+    """Send number_of_records text messages to Kafka, spread across all partitions by key."""
+    producer = cluster.kafka.producer()
+    message = MESSAGE.encode()
+
+    logger.info('Adding %s messages into Kafka topic %s ...', number_of_records, topic)
+    for i in range(number_of_records):
+        producer.send(topic, message, key=str(i).encode())
+    producer.flush()
+
+
+def run_and_measure(executor, kafka_consumer_pipeline, receiver_pipeline, number_of_records, extra_info):
+    """Run one round of a Kafka to SDC RPC benchmark and record startup latency and throughput in extra_info."""
+    kafka_consumer_pipeline.id = str(uuid.uuid4())
+    receiver_pipeline.id = str(uuid.uuid4())
+    executor.add_pipeline(kafka_consumer_pipeline, receiver_pipeline)
+    try:
+        receiver_command = executor.start_pipeline(receiver_pipeline)
+
+        start_time = time.time()
+        executor.start_pipeline(kafka_consumer_pipeline)
+        running_time = time.time()
+
+        receiver_command.wait_for_pipeline_output_records_count(1, timeout_sec=600)
+        first_record_time = time.time()
+        receiver_command.wait_for_pipeline_output_records_count(number_of_records, timeout_sec=3600)
+        end_time = time.time()
+    finally:
+        executor.stop_pipeline(kafka_consumer_pipeline).wait_for_stopped()
+        executor.stop_pipeline(receiver_pipeline).wait_for_stopped()
+        executor.remove_pipeline(kafka_consumer_pipeline)
+        executor.remove_pipeline(receiver_pipeline)
+
+    startup_latency = first_record_time - start_time
+    throughput = number_of_records / max(end_time - first_record_time, 0.001)
+    logger.info('Pipeline reached RUNNING after %.2f s, first record after %.2f s, %.2f records/s afterwards',
+                running_time - start_time, startup_latency, throughput)
+    extra_info.setdefault('running_latency_sec', []).append(running_time - start_time)
+    extra_info.setdefault('first_record_latency_sec', []).append(startup_latency)
+    extra_info.setdefault('records_per_sec', []).append(throughput)
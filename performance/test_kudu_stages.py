@@ -0,0 +1,237 @@
+# Copyright 2019 StreamSets Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+The tests in this module are for writing millions of rows into Kudu and for looking them up again, for the purpose
+of performance testing.
+
+The Kudu destination applies a batch as one manually flushed session, so the number of records per batch is what sets
+its flush size; it has to fit in the mutation buffer. For Kudu Lookup we report lookups/s next to the latency of a
+lookup, taken from the stage's batch processing timer and divided by the number of records per batch.
+"""
+
+import logging
+import string
+import uuid
+
+import pytest
+import sqlalchemy
+from streamsets.testframework.markers import cluster, sdc_min_version
+from streamsets.testframework.utils import get_random_string
+
+from performance.utils import add_generated_key_source, add_generated_record_source, run_until_batch_count
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_KUDU_PORT = 7051
+NUMBER_OF_KEYS = 100_000
+RECORDS_PER_BATCH = 1000
+# Fields of the numbered rows, as expressions of the row number, which is the id.
+FIELDS = {'name': "name${record:value('/id')}", 'value': "${record:value('/id') * 2}"}
+
+
+@pytest.fixture(scope='module')
+def sdc_builder_hook():
+    def hook(data_collector):
+        data_collector.SDC_JAVA_OPTS = '-Xmx8192m -Xms8192m'
+        # Let batches grow past the default limit of 1000 records.
+        data_collector.sdc_properties['production.maxBatchSize'] = '10000'
+    return hook
+
+
+@cluster('cdh')
+@pytest.mark.parametrize('default_operation', ('INSERT', 'UPSERT'))
+@pytest.mark.parametrize('consistency_mode', ('CLIENT_PROPAGATED', 'COMMIT_WAIT'))
+@pytest.mark.parametrize('records_per_batch, mutation_buffer_space', ((1_000, 10_000),
+                                                                      (10_000, 10_000),
+                                                                      (10_000, 100_000)))
+@pytest.mark.parametrize('number_of_rows', (1_000_000, 10_000_000))
+def test_kudu_destination(sdc_builder, sdc_executor, cluster, benchmark, number_of_rows, records_per_batch,
+                          mutation_buffer_space, consistency_mode, default_operation):
+    """Performance benchmark a Kudu destination pipeline.
+
+    Kudu pipeline:
+        dev_data_generator >> expression_evaluator >> kudu
+    """
+    if not hasattr(cluster, 'kudu'):
+        pytest.skip('Kudu tests only run against clusters with the Kudu service present.')
+
+    kudu_table_name = get_random_string(string.ascii_letters, 10)
+    kudu_table = get_kudu_table(kudu_table_name, f'{cluster.server_host}:{DEFAULT_KUDU_PORT}')
+    pipeline = build_kudu_destination_pipeline(sdc_builder, cluster, kudu_table_name, number_of_rows,
+                                               records_per_batch, default_operation,
+                                               {'kuduConfigBean.mutationBufferSpace': mutation_buffer_space,
+                                                'kuduConfigBean.consistencyMode': consistency_mode})
+
+    engine = cluster.kudu.engine
+    try:
+        def create_table():
+            # Every round writes into an empty table, so that the rows of earlier rounds don't get counted.
+            kudu_table.drop(engine, checkfirst=True)
+            logger.info('Creating Kudu table %s ...', kudu_table_name)
+            kudu_table.create(engine)
+
+        def benchmark_pipeline(executor, pipeline):
+            pipeline.id = str(uuid.uuid4())
+            executor.add_pipeline(pipeline)
+
+            duration, _ = run_until_batch_count(executor, pipeline, number_of_rows // records_per_batch)
+            executor.remove_pipeline(pipeline)
+
+            throughput = number_of_rows / duration
+            logger.info('Wrote %s rows at %.2f rows/s', number_of_rows, throughput)
+            benchmark.extra_info.setdefault('rows_per_sec', []).append(throughput)
+
+        benchmark.pedantic(benchmark_pipeline, args=(sdc_executor, pipeline), setup=create_table, rounds=2)
+
+        with engine.connect() as connection:
+            row_count = connection.execute(sqlalchemy.sql.select([sqlalchemy.func.count()])
+                                           .select_from(kudu_table)).scalar()
+        assert row_count == number_of_rows
+    finally:
+        logger.info('Dropping Kudu table %s ...', kudu_table_name)
+        kudu_table.drop(engine, checkfirst=True)
+
+
+@cluster('cdh')
+@sdc_min_version('2.7.0.0')
+@pytest.mark.parametrize('maximum_entries_to_cache', (None, 1_000, NUMBER_OF_KEYS))
+@pytest.mark.parametrize('distribution', ('UNIFORM', 'HOT_KEY', 'ALL_MISS'))
+@pytest.mark.parametrize('number_of_lookups', (1_000_000,))
+def test_kudu_lookup_processor(sdc_builder, sdc_executor, cluster, benchmark, number_of_lookups, distribution,
+                               maximum_entries_to_cache):
+    """Performance benchmark a Kudu Lookup processor with keys from a given distribution.
+
+    Without maximum_entries_to_cache the local cache is disabled. The table is filled by running the Kudu destination
+    pipeline of test_kudu_destination once. Keys that miss send their record to error, so the run is measured in
+    batches rather than output records.
+
+    Kudu Lookup pipeline:
+        dev_data_generator >> expression_evaluator >> kudu_lookup >> trash
+    """
+    if not hasattr(cluster, 'kudu'):
+        pytest.skip('Kudu tests only run against clusters with the Kudu service present.')
+
+    kudu_table_name = get_random_string(string.ascii_letters, 10)
+    kudu_master_address = f'{cluster.server_host}:{DEFAULT_KUDU_PORT}'
+    kudu_table = get_kudu_table(kudu_table_name, kudu_master_address)
+
+    builder = sdc_builder.get_pipeline_builder()
+    builder.add_error_stage('Discard')
+
+    expression_evaluator = add_generated_key_source(builder, distribution, NUMBER_OF_KEYS, 'id',
+                                                    records_per_batch=RECORDS_PER_BATCH)
+
+    kudu_lookup = builder.add_stage('Kudu Lookup', type='processor')
+    kudu_lookup.set_attributes(kudu_masters=kudu_master_address,
+                               kudu_table_name=f'impala::default.{kudu_table_name}',
+                               key_columns_mapping=[dict(field='/id', columnName='id')],
+                               column_to_output_field_mapping=[dict(columnName='name', field='/name',
+                                                                    defaultValue=None),
+                                                               dict(columnName='value', field='/value',
+                                                                    defaultValue='0')],
+                               case_sensitive=True,
+                               ignore_missing_value=True,
+                               enable_local_caching=maximum_entries_to_cache is not None)
+    if maximum_entries_to_cache is not None:
+        kudu_lookup.set_attributes(maximum_entries_to_cache=maximum_entries_to_cache,
+                                   eviction_policy_type='EXPIRE_AFTER_WRITE',
+                                   expiration_time=60,
+                                   time_unit='SECONDS')
+
+    trash = builder.add_stage('Trash')
+
+    expression_evaluator >> kudu_lookup >> trash
+
+    pipeline = builder.build(title='Kudu Lookup performance pipeline').configure_for_environment(cluster)
+    pipeline.configuration['shouldRetry'] = False
+
+    engine = cluster.kudu.engine
+    try:
+        logger.info('Creating Kudu table %s with %s rows ...', kudu_table_name, NUMBER_OF_KEYS)
+        kudu_table.create(engine)
+        load_pipeline = build_kudu_destination_pipeline(sdc_builder, cluster, kudu_table_name, NUMBER_OF_KEYS,
+                                                        RECORDS_PER_BATCH, 'INSERT')
+        sdc_executor.add_pipeline(load_pipeline)
+        run_until_batch_count(sdc_executor, load_pipeline, NUMBER_OF_KEYS // RECORDS_PER_BATCH)
+        sdc_executor.remove_pipeline(load_pipeline)
+
+        def benchmark_pipeline(executor, pipeline):
+            pipeline.id = str(uuid.uuid4())
+            executor.add_pipeline(pipeline)
+
+            duration, history = run_until_batch_count(executor, pipeline, number_of_lookups // RECORDS_PER_BATCH)
+            metrics = history.latest.metrics
+            lookups = metrics.counter(f'stage.{kudu_lookup.instance_name}.inputRecords.counter').count
+            hits = metrics.counter(f'stage.{trash.instance_name}.inputRecords.counter').count
+            misses = metrics.counter(f'stage.{kudu_lookup.instance_name}.errorRecords.counter').count
+            batch_timer = metrics.timer(f'stage.{kudu_lookup.instance_name}.batchProcessing.timer')
+            executor.remove_pipeline(pipeline)
+
+            assert hits + misses == lookups
+            assert hits == (0 if distribution == 'ALL_MISS' else lookups)
+
+            throughput = number_of_lookups / duration
+            latencies = {percentile: batch_timer._data.get(percentile) / RECORDS_PER_BATCH
+                         for percentile in ('mean', 'p50', 'p99')}
+            logger.info('Looked up %s keys at %.2f lookups/s with %s hits, %.6f s per lookup at p99',
+                        lookups, throughput, hits, latencies['p99'])
+            benchmark.extra_info.setdefault('lookups_per_sec', []).append(throughput)
+            for percentile, latency in latencies.items():
+                benchmark.extra_info.setdefault(f'lookup_latency_{percentile}_sec', []).append(latency)
+
+        benchmark.pedantic(benchmark_pipeline, args=(sdc_executor, pipeline), rounds=2)
+    finally:
+        logger.info('Dropping Kudu table %s ...', kudu_table_name)
+        kudu_table.drop(engine, checkfirst=True)
+
+
+def get_kudu_table(kudu_table_name, kudu_master_address):
+    """Return the SQLAlchemy table the Impala-managed Kudu table of these tests is created and dropped through."""
+    return sqlalchemy.Table(kudu_table_name,
+                            sqlalchemy.MetaData(),
+                            sqlalchemy.Column('id', sqlalchemy.BigInteger, primary_key=True),
+                            sqlalchemy.Column('name', sqlalchemy.String),
+                            sqlalchemy.Column('value', sqlalchemy.BigInteger),
+                            impala_partition_by='HASH PARTITIONS 16',
+                            impala_stored_as='KUDU',
+                            impala_table_properties={
+                                'kudu.master_addresses': kudu_master_address,
+                                'kudu.num_tablet_replicas': '1'
+                            })
+
+
+def build_kudu_destination_pipeline(sdc_builder, cluster, kudu_table_name, number_of_rows, records_per_batch,
+                                    default_operation, kudu_configuration=None):
+    """Return a pipeline writing numbered rows into kudu_table_name, of which the first number_of_rows get through.
+
+    Run it for number_of_rows / records_per_batch batches.
+
+    kudu_configuration holds Kudu destination configurations, by name, that have no counterpart among its attributes.
+    """
+    builder = sdc_builder.get_pipeline_builder()
+    builder.add_error_stage('Discard')
+
+    expression_evaluator = add_generated_record_source(builder, number_of_rows, FIELDS, 'id', records_per_batch)
+
+    kudu = builder.add_stage('Kudu', type='destination')
+    kudu.set_attributes(table_name=f'impala::default.{kudu_table_name}', default_operation=default_operation)
+    kudu.configuration.update(kudu_configuration or {})
+
+    expression_evaluator >> kudu
+
+    pipeline = builder.build(title='Kudu destination performance pipeline').configure_for_environment(cluster)
+    pipeline.configuration['shouldRetry'] = False
+    pipeline.delivery_guarantee = 'AT_MOST_ONCE'
+    return pipeline
@@ -0,0 +1,159 @@
+# Copyright 2019 StreamSets Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+The tests in this module are for running the MongoDB Lookup processor against a collection of a million documents
+over different key distributions, for the purpose of performance testing.
+
+Next to lookups/s we read the server's query op counter before and after every run. Every lookup the local cache
+doesn't answer is a query on the server, so one minus the ratio of queries to lookups is the cache hit ratio. The
+numbers are only complete when nothing else queries the MongoDB server while the test runs.
+"""
+
+import logging
+import uuid
+from string import ascii_letters
+
+import pytest
+from streamsets.testframework.markers import mongodb
+from streamsets.testframework.utils import get_random_string
+
+from performance.utils import add_generated_key_source, get_number_of_hot_keys, run_until_batch_count
+
+logger = logging.getLogger(__name__)
+
+NUMBER_OF_DOCUMENTS = 1_000_000
+INSERT_BATCH_SIZE = 10_000
+RECORDS_PER_BATCH = 1000
+RESULT_SIZES = (100, 1000)
+
+
+@pytest.fixture(scope='module')
+def sdc_builder_hook():
+    def hook(data_collector):
+        data_collector.SDC_JAVA_OPTS = '-Xmx8192m -Xms8192m'
+    return hook
+
+
+@pytest.fixture(scope='module', params=RESULT_SIZES, ids=lambda result_size: f'{result_size}-bytes')
+def mongodb_data_set(request, mongodb):
+    """Insert NUMBER_OF_DOCUMENTS documents with a payload of a size of RESULT_SIZES into a collection of their own.
+
+    Being parametrized and module-scoped, the fixture makes pytest group the tests by result size, so that the
+    documents are inserted once for all tests looking them up.
+
+    Returns:
+        A dict with the data set's result_size and the pymongo collection holding it.
+    """
+    result_size = request.param
+    database_name = get_random_string(ascii_letters, 5)
+    mongodb_collection = mongodb.engine[database_name][get_random_string(ascii_letters, 10)]
+    try:
+        insert_documents(mongodb_collection, result_size)
+        yield dict(result_size=result_size, collection=mongodb_collection)
+    finally:
+        logger.info('Dropping %s database...', database_name)
+        mongodb.engine.drop_database(database_name)
+
+
+@mongodb
+@pytest.mark.parametrize('maximum_entries_to_cache', (None, get_number_of_hot_keys(NUMBER_OF_DOCUMENTS)))
+@pytest.mark.parametrize('distribution', ('UNIFORM', 'HOT_KEY', 'COLD_KEY', 'ALL_MISS'))
+@pytest.mark.parametrize('key_name', ('key', 'nested.key'))
+# Every lookup on an unindexed key is a collection scan, so those get far fewer lookups.
+@pytest.mark.parametrize('indexed, number_of_lookups', ((True, 1_000_000), (False, 10_000)))
+def test_mongodb_lookup_processor(sdc_builder, sdc_executor, mongodb, benchmark, mongodb_data_set, indexed,
+                                  number_of_lookups, key_name, distribution, maximum_entries_to_cache):
+    """Performance benchmark a MongoDB Lookup processor on a top-level or a nested key from a given distribution.
+
+    Documents carry a payload of the data set's result size, which is what every lookup returns. Without
+    maximum_entries_to_cache the local cache is disabled. Keys that miss send their record to error, so the run is
+    measured in batches rather than output records.
+
+    MongoDB Lookup pipeline:
+        dev_data_generator >> expression_evaluator >> mongodb_lookup >> trash
+    """
+    mongodb_collection = mongodb_data_set['collection']
+
+    builder = sdc_builder.get_pipeline_builder()
+    builder.add_error_stage('Discard')
+
+    expression_evaluator = add_generated_key_source(builder, distribution, NUMBER_OF_DOCUMENTS, 'key', 'key',
+                                                    RECORDS_PER_BATCH)
+
+    mongodb_lookup = builder.add_stage('MongoDB Lookup', type='processor')
+    mongodb_lookup.set_attributes(capped_collection=False,
+                                  database=mongodb_collection.database.name,
+                                  collection=mongodb_collection.name,
+                                  result_field='/result',
+                                  document_to_sdc_field_mappings=[dict(keyName=key_name, sdcField='/key')],
+                                  enable_local_caching=maximum_entries_to_cache is not None)
+    if maximum_entries_to_cache is not None:
+        mongodb_lookup.set_attributes(maximum_entries_to_cache=maximum_entries_to_cache,
+                                      eviction_policy_type='EXPIRE_AFTER_WRITE',
+                                      expiration_time=60,
+                                      time_unit='SECONDS')
+
+    trash = builder.add_stage('Trash')
+
+    expression_evaluator >> mongodb_lookup >> trash
+
+    pipeline = builder.build(title='MongoDB Lookup performance pipeline').configure_for_environment(mongodb)
+    pipeline.configuration['shouldRetry'] = False
+
+    index_name = None
+    try:
+        if indexed:
+            logger.info('Creating index on %s ...', key_name)
+            index_name = mongodb_collection.create_index(key_name)
+
+        def benchmark_pipeline(executor, pipeline):
+            pipeline.id = str(uuid.uuid4())
+            executor.add_pipeline(pipeline)
+
+            queries_before = get_query_count(mongodb_collection.database)
+            duration, history = run_until_batch_count(executor, pipeline, number_of_lookups // RECORDS_PER_BATCH)
+            queries = get_query_count(mongodb_collection.database) - queries_before
+
+            lookups = history.latest.metrics.counter(f'stage.{mongodb_lookup.instance_name}.inputRecords.counter').count
+            executor.remove_pipeline(pipeline)
+
+            throughput = number_of_lookups / duration
+            hit_ratio = max(1 - queries / lookups, 0)
+            logger.info('Looked up %s keys at %.2f lookups/s with %s queries (hit ratio %.4f)',
+                        lookups, throughput, queries, hit_ratio)
+            benchmark.extra_info.setdefault('lookups_per_sec', []).append(throughput)
+            benchmark.extra_info.setdefault('queries', []).append(queries)
+            benchmark.extra_info.setdefault('cache_hit_ratio', []).append(hit_ratio)
+
+        benchmark.pedantic(benchmark_pipeline, args=(sdc_executor, pipeline), rounds=2)
+    finally:
+        # The documents are shared with the other tests of the data set, which may not index them.
+        if index_name is not None:
+            logger.info('Dropping index on %s ...', key_name)
+            mongodb_collection.drop_index(index_name)
+
+
+def insert_documents(mongodb_collection, result_size):
+    """Insert NUMBER_OF_DOCUMENTS documents, each with its key both at the top level and nested."""
+    logger.info('Adding %s documents into %s collection using PyMongo...', NUMBER_OF_DOCUMENTS, mongodb_collection.name)
+    payload = get_random_string(ascii_letters, result_size)
+    for start in range(0, NUMBER_OF_DOCUMENTS, INSERT_BATCH_SIZE):
+        mongodb_collection.insert_many([{'key': 'key%d' % i, 'nested': {'key': 'key%d' % i}, 'payload': payload}
+                                        for i in range(start, start + INSERT_BATCH_SIZE)])
+
+
+def get_query_count(mongodb_database):
+    """Return the number of queries the MongoDB server has served since it started."""
+    return mongodb_database.command('serverStatus')['opcounters']['query']
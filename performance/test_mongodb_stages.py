@@ -0,0 +1,211 @@
+# Copyright 2019 StreamSets Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+The tests in this module are for writing to MongoDB and for tailing its oplog, for the purpose of performance testing.
+
+For the MongoDB Oplog origin the interesting number is not throughput but lag: documents are inserted at a fixed
+rate while the pipeline runs, and every insert is matched with the first time the count of oplog entries of the test
+collection the pipeline put out covers it. Entries of other namespaces are routed elsewhere, so they don't get counted,
+but lag is still only meaningful when nothing else writes much to the MongoDB server while the test runs.
+"""
+
+import logging
+import time
+import uuid
+from string import ascii_letters
+
+import pytest
+from streamsets.sdk.utils import Version
+from streamsets.testframework.markers import mongodb
+from streamsets.testframework.utils import get_random_string
+
+from performance.utils import add_generated_record_source, run_until_batch_count
+
+logger = logging.getLogger(__name__)
+
+INSERT_DURATION_SEC = 60
+# Inserts are issued as one insert_many per tick.
+INSERT_TICK_SEC = 0.1
+# CRUD operation codes the MongoDB destination reads from the sdc.operation.type record header attribute.
+OPERATION_CODES = {'INSERT': 1, 'UPSERT': 4}
+
+
+@pytest.fixture(scope='module')
+def sdc_builder_hook():
+    def hook(data_collector):
+        data_collector.SDC_JAVA_OPTS = '-Xmx8192m -Xms8192m'
+        # Let batches grow past the default limit of 1000 records.
+        data_collector.sdc_properties['production.maxBatchSize'] = '10000'
+    return hook
+
+
+@mongodb
+@pytest.mark.parametrize('records_per_batch', (100, 1000, 10_000))
+@pytest.mark.parametrize('operation, number_of_keys', (('INSERT', 1_000_000),
+                                                       ('UPSERT', 1_000_000),
+                                                       ('UPSERT', 100_000)))
+@pytest.mark.parametrize('write_concern', ('UNACKNOWLEDGED', 'ACKNOWLEDGED', 'JOURNALED', 'MAJORITY'))
+@pytest.mark.parametrize('number_of_records', (1_000_000,))
+def test_mongodb_destination(sdc_builder, sdc_executor, mongodb, benchmark, number_of_records, write_concern,
+                             operation, number_of_keys, records_per_batch):
+    """Performance benchmark a MongoDB destination pipeline.
+
+    Upserts are matched on a unique key field, which is backed by a unique index as it would be in production.
+    Upserting number_of_records records over fewer keys updates the same documents over and over again.
+
+    MongoDB pipeline:
+        dev_data_generator >> expression_evaluator >> mongodb_dest
+    """
+    database_name = get_random_string(ascii_letters, 5)
+    collection_name = get_random_string(ascii_letters, 10)
+
+    builder = sdc_builder.get_pipeline_builder()
+    builder.add_error_stage('Discard')
+
+    # Keys repeat every number_of_keys records, so upserts after the first number_of_keys update existing documents.
+    expression_evaluator = add_generated_record_source(builder, number_of_records,
+                                                       {'value': "value${record:value('/key')}",
+                                                        'key': f"${{record:value('/key') mod {number_of_keys}}}"},
+                                                       'key', records_per_batch)
+    expression_evaluator.header_attribute_expressions = [{'attributeToSet': 'sdc.operation.type',
+                                                          'headerAttributeExpression': str(OPERATION_CODES[operation])}]
+
+    mongodb_dest = builder.add_stage('MongoDB', type='destination')
+    mongodb_dest.set_attributes(database=database_name, collection=collection_name, write_concern=write_concern)
+    # From 3.6.0, unique key field is a list, otherwise single string for older version.
+    mongodb_dest.unique_key_field = ['/key'] if Version(sdc_builder.version) >= Version('3.6.0') else '/key'
+
+    expression_evaluator >> mongodb_dest
+
+    pipeline = builder.build(title='MongoDB destination performance pipeline').configure_for_environment(mongodb)
+    pipeline.configuration['shouldRetry'] = False
+
+    mongodb_collection = mongodb.engine[database_name][collection_name]
+    try:
+        def create_collection():
+            # Every round writes into an empty collection, so that upserts of earlier rounds don't turn into updates.
+            mongodb_collection.drop()
+            logger.info('Creating %s collection with a unique index on key ...', collection_name)
+            mongodb_collection.create_index('key', unique=True)
+
+        def benchmark_pipeline(executor, pipeline):
+            pipeline.id = str(uuid.uuid4())
+            executor.add_pipeline(pipeline)
+
+            duration, _ = run_until_batch_count(executor, pipeline, number_of_records // records_per_batch)
+            executor.remove_pipeline(pipeline)
+
+            throughput = number_of_records / duration
+            logger.info('Wrote %s records at %.2f records/s', number_of_records, throughput)
+            benchmark.extra_info.setdefault('records_per_sec', []).append(throughput)
+
+        benchmark.pedantic(benchmark_pipeline, args=(sdc_executor, pipeline), setup=create_collection, rounds=2)
+
+        # Unacknowledged writes may still be on their way when the pipeline finishes.
+        if write_concern != 'UNACKNOWLEDGED':
+            expected_count = number_of_keys if operation == 'UPSERT' else number_of_records
+            assert mongodb_collection.count_documents({}) == expected_count
+    finally:
+        logger.info('Dropping %s database...', database_name)
+        mongodb.engine.drop_database(database_name)
+
+
+@mongodb
+@pytest.mark.parametrize('batch_size', (100, 1000))
+@pytest.mark.parametrize('inserts_per_sec', (1_000, 10_000))
+def test_mongodb_oplog_origin(sdc_builder, sdc_executor, mongodb, benchmark, metric_monitor, inserts_per_sec,
+                              batch_size):
+    """Performance benchmark a MongoDB Oplog to trash pipeline under a sustained insert rate.
+
+    MongoDB Oplog pipeline:
+        mongodb_oplog >> stream_selector >> collection_trash
+                         stream_selector >> other_trash
+    """
+    database_name = get_random_string(ascii_letters, 10)
+    collection_name = get_random_string(ascii_letters, 10)
+
+    builder = sdc_builder.get_pipeline_builder()
+    builder.add_error_stage('Discard')
+
+    mongodb_oplog = builder.add_stage('MongoDB Oplog')
+    mongodb_oplog.set_attributes(collection='oplog.rs', batch_size=batch_size, initial_ordinal=1)
+
+    stream_selector = builder.add_stage('Stream Selector')
+    collection_trash = builder.add_stage('Trash')
+    other_trash = builder.add_stage('Trash')
+
+    mongodb_oplog >> stream_selector >> collection_trash
+    stream_selector >> other_trash
+
+    stream_selector.condition = [dict(outputLane=stream_selector.output_lanes[0],
+                                      predicate=f"${{record:value('/ns') == '{database_name}.{collection_name}'}}"),
+                                 dict(outputLane=stream_selector.output_lanes[1],
+                                      predicate='default')]
+    collection_entries_counter = f'stage.{collection_trash.instance_name}.inputRecords.counter'
+
+    def get_collection_entries(metrics):
+        return metrics.get('counters', {}).get(collection_entries_counter, {}).get('count', 0)
+
+    pipeline = builder.build(title='MongoDB Oplog performance pipeline').configure_for_environment(mongodb)
+
+    mongodb_collection = mongodb.engine[database_name][collection_name]
+    try:
+        def benchmark_pipeline(executor, pipeline):
+            # A new pipeline starts without an offset, so read only the changes made from now on.
+            pipeline[0].initial_timestamp_in_secs = int(time.time())
+            pipeline.id = str(uuid.uuid4())
+            executor.add_pipeline(pipeline)
+            executor.start_pipeline(pipeline)
+            try:
+                with metric_monitor(pipeline, get_collection_entries, interval_sec=0.1) as collection_entries:
+                    insert_times = insert_at_rate(mongodb_collection, inserts_per_sec, INSERT_DURATION_SEC)
+                    number_of_inserts = insert_times[-1][0]
+                    collection_entries.wait_for_at_least(number_of_inserts)
+            finally:
+                executor.stop_pipeline(pipeline).wait_for_stopped()
+            executor.remove_pipeline(pipeline)
+
+            lags = sorted(collection_entries.first_time_at_least(count) - insert_time
+                          for count, insert_time in insert_times)
+            logger.info('Inserted %s documents at %s inserts/s; oplog lag median %.3f s, p99 %.3f s, max %.3f s',
+                        number_of_inserts, inserts_per_sec, lags[len(lags) // 2], lags[int(len(lags) * 0.99)],
+                        lags[-1])
+            benchmark.extra_info.setdefault('lag_median_sec', []).append(lags[len(lags) // 2])
+            benchmark.extra_info.setdefault('lag_p99_sec', []).append(lags[int(len(lags) * 0.99)])
+            benchmark.extra_info.setdefault('lag_max_sec', []).append(lags[-1])
+
+        benchmark.pedantic(benchmark_pipeline, args=(sdc_executor, pipeline), rounds=2)
+    finally:
+        logger.info('Dropping %s database...', database_name)
+        mongodb.engine.drop_database(database_name)
+
+
+def insert_at_rate(mongodb_collection, inserts_per_sec, duration_sec):
+    """Insert documents at inserts_per_sec for duration_sec, one insert_many per INSERT_TICK_SEC.
+
+    Returns:
+        A list of (total number of documents inserted, time of the insert) tuples, one per tick.
+    """
+    documents_per_tick = int(inserts_per_sec * INSERT_TICK_SEC)
+    insert_times = []
+    start_time = time.time()
+    for tick in range(int(duration_sec / INSERT_TICK_SEC)):
+        lead = start_time + tick * INSERT_TICK_SEC - time.time()
+        if lead > 0:
+            time.sleep(lead)
+        insert_time = time.time()
+        mongodb_collection.insert_many([{'x': i} for i in range(documents_per_tick)], ordered=False)
+        insert_times.append(((tick + 1) * documents_per_tick, insert_time))
+    return insert_times
@@ -0,0 +1,136 @@
+# Copyright 2019 StreamSets Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+The tests in this module are for running sustained-rate MQTT pipelines, for the purpose of performance testing.
+Messages are published at a fixed rate while the MQTT Subscriber is listening, so next to throughput we also get the
+share of messages the subscriber never delivered (drop rate), which is what matters for QoS 0.
+"""
+
+import logging
+import time
+import uuid
+
+import pytest
+from streamsets.testframework.markers import mqtt
+
+from stage.test_mqtt_stages import wait_for_subscriber_ready
+
+logger = logging.getLogger(__name__)
+
+PUBLISH_DURATION_SEC = 60
+# How long the output record count has to stay the same before we consider all deliverable messages delivered.
+SETTLE_TIME_SEC = 10
+QOS_LEVELS = {'AT_MOST_ONCE': 0, 'AT_LEAST_ONCE': 1, 'EXACTLY_ONCE': 2}
+
+
+@pytest.fixture(scope='module')
+def sdc_builder_hook():
+    def hook(data_collector):
+        data_collector.SDC_JAVA_OPTS = '-Xmx8192m -Xms8192m'
+    return hook
+
+
+@mqtt
+@pytest.mark.parametrize('qos', ('AT_MOST_ONCE', 'AT_LEAST_ONCE', 'EXACTLY_ONCE'))
+@pytest.mark.parametrize('number_of_topics', (1, 10, 100))
+@pytest.mark.parametrize('messages_per_sec', (1_000, 10_000))
+def test_mqtt_subscriber(sdc_builder, sdc_executor, mqtt_broker, benchmark, messages_per_sec, number_of_topics, qos):
+    """Performance benchmark an MQTT Subscriber to trash pipeline under a sustained publish rate.
+
+    MQTT Subscriber pipeline:
+        mqtt_source >> trash
+    """
+    data_topics = ['mqtt_perf_topic_{}'.format(i) for i in range(number_of_topics)]
+    probe_topic = 'mqtt_perf_probe_topic'
+    number_of_messages = messages_per_sec * PUBLISH_DURATION_SEC
+
+    try:
+        mqtt_broker.initialize(initial_topics=[])
+
+        pipeline_builder = sdc_builder.get_pipeline_builder()
+
+        mqtt_source = pipeline_builder.add_stage('MQTT Subscriber')
+        mqtt_source.configuration.update({'subscriberConf.dataFormat': 'TEXT',
+                                          'subscriberConf.topicFilters': data_topics + [probe_topic],
+                                          'commonConf.qos': qos})
+
+        trash = pipeline_builder.add_stage('Trash')
+
+        mqtt_source >> trash
+
+        pipeline = pipeline_builder.build('MQTT Subscriber performance pipeline')
+        pipeline.configure_for_environment(mqtt_broker)
+
+        def benchmark_pipeline(executor, pipeline):
+            pipeline.id = str(uuid.uuid4())
+            executor.add_pipeline(pipeline)
+            executor.start_pipeline(pipeline)
+            try:
+                probe_count = wait_for_subscriber_ready(executor, pipeline, mqtt_broker, probe_topic)
+
+                start_time = time.time()
+                publish_duration = publish_at_rate(mqtt_broker, data_topics, number_of_messages, messages_per_sec,
+                                                   QOS_LEVELS[qos])
+                output_records_count, last_change_time = wait_for_output_to_settle(executor, pipeline)
+            finally:
+                # Received messages can fall short of those published, so there is no output records count to run
+                # the pipeline until; it's stopped here, even if waiting for it fails.
+                executor.stop_pipeline(pipeline).wait_for_stopped()
+            executor.remove_pipeline(pipeline)
+
+            received = output_records_count - probe_count
+            drop_rate = max(number_of_messages - received, 0) / number_of_messages
+            throughput = received / (last_change_time - start_time)
+            logger.info('Published %s messages at %.2f msgs/s; received %s at %.2f msgs/s (drop rate %.4f)',
+                        number_of_messages, number_of_messages / publish_duration, received, throughput, drop_rate)
+            benchmark.extra_info.setdefault('publish_msgs_per_sec', []).append(number_of_messages / publish_duration)
+            benchmark.extra_info.setdefault('msgs_per_sec', []).append(throughput)
+            benchmark.extra_info.setdefault('drop_rate', []).append(drop_rate)
+
+        benchmark.pedantic(benchmark_pipeline, args=(sdc_executor, pipeline), rounds=2)
+    finally:
+        mqtt_broker.destroy()
+
+
+def publish_at_rate(mqtt_broker, topics, number_of_messages, messages_per_sec, qos):
+    """Publish messages round-robin across topics, pacing to messages_per_sec. Returns the time it took."""
+    start_time = time.time()
+    for i in range(number_of_messages):
+        # Only sleep once we are a whole millisecond ahead of schedule; sleeping per message costs more than that.
+        lead = start_time + i / messages_per_sec - time.time()
+        if lead > 0.001:
+            time.sleep(lead)
+        mqtt_broker.publish_message(topic=topics[i % len(topics)], payload='Message {}'.format(i), qos=qos)
+    return time.time() - start_time
+
+
+def wait_for_output_to_settle(sdc_executor, pipeline, settle_time_sec=SETTLE_TIME_SEC):
+    """Poll the pipeline's output record count until it stops changing.
+
+    Returns:
+        A tuple of the final output record count and the time it was last seen changing.
+    """
+    output_records_count = -1
+    last_change_time = time.time()
+    while time.time() - last_change_time < settle_time_sec:
+        metrics = sdc_executor.api_client.get_pipeline_metrics(pipeline.id)
+        current_count = (metrics.get('counters', {})
+                                .get('pipeline.batchOutputRecords.counter', {})
+                                .get('count', 0))
+        if current_count != output_records_count:
+            output_records_count = current_count
+            last_change_time = time.time()
+        time.sleep(0.5)
+    return output_records_count, last_change_time
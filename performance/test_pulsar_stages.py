@@ -0,0 +1,227 @@
+# Copyright 2019 StreamSets Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+The tests in this module are for running high-volume Pulsar pipelines, for the purpose of performance testing.
+
+Consumer benchmarks read a backlog seeded with asynchronous batched sends, which gives throughput. Once the backlog
+is drained, single messages are published one at a time and the time until each one shows up in the pipeline's
+output record count is the publish-to-consume latency (its resolution is bounded by how often STF polls metrics).
+"""
+
+import json
+import logging
+import string
+import time
+import uuid
+
+import pulsar as pulsar_client
+import pytest
+from streamsets.testframework.markers import pulsar, sdc_min_version
+from streamsets.testframework.utils import get_random_string
+
+from performance.utils import run_until_output_records_count
+
+logger = logging.getLogger(__name__)
+
+NUMBER_OF_TOPICS = 4
+NUMBER_OF_LATENCY_PROBES = 20
+MESSAGE = {'Name': 'Xavi', 'Job': 'Developer', 'Description': 'Very Long Message In Order To Spend More Time On It'}
+
+
+@pytest.fixture(scope='module')
+def sdc_builder_hook():
+    def hook(data_collector):
+        data_collector.SDC_JAVA_OPTS = '-Xmx8192m -Xms8192m'
+    return hook
+
+
+@pulsar
+@sdc_min_version('3.5.0')
+@pytest.mark.parametrize('enable_tls', (False, True))
+@pytest.mark.parametrize('subscription_type', ('EXCLUSIVE', 'FAILOVER', 'SHARED'))
+@pytest.mark.parametrize('topics_selector', ('TOPICS_LIST', 'TOPICS_PATTERN'))
+@pytest.mark.parametrize('number_of_messages', (1_000_000, 5_000_000))
+def test_pulsar_consumer(sdc_builder, sdc_executor, pulsar, benchmark,
+                         number_of_messages, topics_selector, subscription_type, enable_tls):
+    """Performance benchmark a Pulsar Consumer reading several topics to trash.
+
+    Pulsar Consumer pipeline:
+        pulsar_consumer >> trash
+    """
+    prefix = 'SDC' + get_random_string(string.ascii_letters, 10)
+    topics = ['{}_{}'.format(prefix, i) for i in range(NUMBER_OF_TOPICS)]
+
+    builder = sdc_builder.get_pipeline_builder()
+    builder.add_error_stage('Discard')
+
+    pulsar_consumer = builder.add_stage('Pulsar Consumer', type='origin')
+    pulsar_consumer.set_attributes(data_format='JSON',
+                                   batch_wait_time_in_ms=1000,
+                                   max_batch_size_in_records=1000,
+                                   consumer_name='consumer',
+                                   initial_offset='EARLIEST',
+                                   subscription_type=subscription_type,
+                                   consumer_queue_size=10000,
+                                   read_compacted=False,
+                                   enable_tls=enable_tls,
+                                   topics_selector=topics_selector)
+    if topics_selector == 'TOPICS_LIST':
+        pulsar_consumer.topics_list = topics
+    else:
+        pulsar_consumer.topics_pattern = 'persistent://public/default/{}_.*'.format(prefix)
+
+    trash = builder.add_stage('Trash')
+    pulsar_consumer >> trash
+
+    pipeline = builder.build(title='Pulsar Consumer performance pipeline').configure_for_environment(pulsar)
+
+    client = pulsar.client
+    admin = pulsar.admin
+    try:
+        seed_topics(client, topics, number_of_messages)
+        # Latency probes stay on the topic, so later rounds have a slightly bigger backlog to read.
+        backlog = dict(size=number_of_messages)
+
+        def benchmark_pipeline(executor, pipeline):
+            # A new subscription per round, so that every round starts from the earliest message again.
+            pipeline[0].subscription_name = get_random_string(string.ascii_letters, 10)
+            pipeline.id = str(uuid.uuid4())
+            executor.add_pipeline(pipeline)
+
+            start_time = time.time()
+            pipeline_command = executor.start_pipeline(pipeline)
+            try:
+                pipeline_command.wait_for_pipeline_output_records_count(backlog['size'], timeout_sec=3600)
+                end_time = time.time()
+
+                latencies = measure_latency(client, topics[0], pipeline_command, backlog['size'])
+            finally:
+                # Latency probes need the pipeline to keep going after the backlog is read, so unlike
+                # run_until_output_records_count it's only stopped here, even if any of the waits fails.
+                executor.stop_pipeline(pipeline).wait_for_stopped()
+            executor.remove_pipeline(pipeline)
+
+            throughput = backlog['size'] / (end_time - start_time)
+            logger.info('Read %s messages at %.2f msgs/s, median publish-to-consume latency %.3f s',
+                        backlog['size'], throughput, latencies[len(latencies) // 2])
+            backlog['size'] += len(latencies)
+            benchmark.extra_info.setdefault('msgs_per_sec', []).append(throughput)
+            benchmark.extra_info.setdefault('latency_sec', []).append(latencies)
+
+        benchmark.pedantic(benchmark_pipeline, args=(sdc_executor, pipeline), rounds=2)
+    finally:
+        client.close()
+        for topic in topics:
+            admin.delete_topic(topic)
+
+
+@pulsar
+@sdc_min_version('3.5.0')
+@pytest.mark.parametrize('compression_type', ('NONE', 'LZ4', 'ZLIB'))
+@pytest.mark.parametrize('enable_batching', (False, True))
+@pytest.mark.parametrize('number_of_messages', (1_000_000, 5_000_000))
+def test_pulsar_producer(sdc_builder, sdc_executor, pulsar, benchmark, number_of_messages, enable_batching,
+                         compression_type):
+    """Performance benchmark a Dev Raw Data Source to Pulsar Producer pipeline.
+
+    Pulsar Producer pipeline:
+        dev_raw_data_source >> pulsar_producer
+    """
+    topic = get_random_string(string.ascii_letters, 10)
+
+    builder = sdc_builder.get_pipeline_builder()
+    builder.add_error_stage('Discard')
+
+    dev_raw_data_source = builder.add_stage('Dev Raw Data Source')
+    dev_raw_data_source.set_attributes(data_format='JSON', raw_data=json.dumps(MESSAGE))
+
+    pulsar_producer = builder.add_stage('Pulsar Producer', type='destination')
+    pulsar_producer.set_attributes(data_format='JSON',
+                                   topic=topic,
+                                   enable_batching=enable_batching,
+                                   async_send=True,
+                                   compresion_type=compression_type)
+
+    dev_raw_data_source >> pulsar_producer
+
+    pipeline = builder.build(title='Pulsar Producer performance pipeline').configure_for_environment(pulsar)
+
+    admin = pulsar.admin
+    try:
+        def benchmark_pipeline(executor, pipeline):
+            pipeline.id = str(uuid.uuid4())
+            executor.add_pipeline(pipeline)
+
+            duration, _ = run_until_output_records_count(executor, pipeline, number_of_messages)
+            executor.remove_pipeline(pipeline)
+
+            throughput = number_of_messages / duration
+            logger.info('Wrote %s messages at %.2f msgs/s', number_of_messages, throughput)
+            benchmark.extra_info.setdefault('msgs_per_sec', []).append(throughput)
+
+        benchmark.pedantic(benchmark_pipeline, args=(sdc_executor, pipeline), rounds=2)
+    finally:
+        admin.delete_topic(topic)
+
+
+def seed_topics(client, topics, number_of_messages, batching_max_messages=1000):
+    """Spread number_of_messages across topics using asynchronous batched sends.
+
+    Sends are only waited for once per topic (by flushing the producer), rather than once per message.
+    """
+    payload = json.dumps(MESSAGE).encode()
+    failures = []
+
+    def on_send(result, _message_id):
+        if result != pulsar_client.Result.Ok:
+            failures.append(result)
+
+    logger.info('Adding %s messages into Pulsar topics %s ...', number_of_messages, topics)
+    for i, topic in enumerate(topics):
+        producer = client.create_producer(topic,
+                                          batching_enabled=True,
+                                          batching_max_messages=batching_max_messages,
+                                          batching_max_publish_delay_ms=10,
+                                          block_if_queue_full=True)
+        try:
+            # The first topics pick up the remainder when the messages don't divide evenly.
+            for _ in range(number_of_messages // len(topics) + (i < number_of_messages % len(topics))):
+                producer.send_async(payload, on_send)
+            producer.flush()
+        finally:
+            producer.close()
+
+    assert not failures, 'Failed to send {} messages: {}'.format(len(failures), set(failures))
+
+
+def measure_latency(client, topic, pipeline_command, output_records_count,
+                    number_of_probes=NUMBER_OF_LATENCY_PROBES):
+    """Publish messages one at a time to a drained topic and time how long each takes to reach the pipeline output.
+
+    Returns:
+        A sorted list of latencies in seconds.
+    """
+    payload = json.dumps(MESSAGE).encode()
+    latencies = []
+    producer = client.create_producer(topic, batching_enabled=False)
+    try:
+        for i in range(1, number_of_probes + 1):
+            start_time = time.time()
+            producer.send(payload)
+            pipeline_command.wait_for_pipeline_output_records_count(output_records_count + i, timeout_sec=60)
+            latencies.append(time.time() - start_time)
+    finally:
+        producer.close()
+    return sorted(latencies)
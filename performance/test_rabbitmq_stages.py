@@ -0,0 +1,162 @@
+# Copyright 2019 StreamSets Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+The tests in this module are for running high-volume RabbitMQ pipelines, for the purpose of performance testing.
+Queues are seeded with asynchronous publisher confirms (see :py:func:`stage.test_rabbitmq_stages.publish_messages`)
+so that seeding does not dominate the run time. Output values will not be validated since the purpose of these tests
+is to test performance and not correctness.
+"""
+
+import json
+import logging
+import string
+import time
+import uuid
+
+import pytest
+from streamsets.testframework.markers import rabbitmq
+from streamsets.testframework.utils import get_random_string
+
+from stage.test_rabbitmq_stages import publish_messages
+
+logger = logging.getLogger(__name__)
+
+RAW_DATA = {'TEXT': 'Hello World from SDC & DPM!',
+            'JSON': json.dumps({'id': 1, 'name': 'Hello World from SDC & DPM!', 'tags': ['a', 'b', 'c']})}
+
+
+@pytest.fixture(scope='module')
+def sdc_builder_hook():
+    def hook(data_collector):
+        data_collector.SDC_JAVA_OPTS = '-Xmx8192m -Xms8192m'
+    return hook
+
+
+@rabbitmq
+@pytest.mark.parametrize('data_format', ('TEXT', 'JSON'))
+@pytest.mark.parametrize('durable', (True, False))
+@pytest.mark.parametrize('prefetch_count', (1, 100, 1000))
+@pytest.mark.parametrize('number_of_messages', (100_000, 1_000_000))
+def test_rabbitmq_consumer(sdc_builder, sdc_executor, rabbitmq, benchmark,
+                           number_of_messages, prefetch_count, durable, data_format):
+    """Performance benchmark a RabbitMQ Consumer to trash pipeline. The queue is re-seeded before every round.
+
+    RabbitMQ Consumer pipeline:
+        rabbitmq_consumer >> trash
+    """
+    name = get_random_string(string.ascii_letters, 10)
+
+    builder = sdc_builder.get_pipeline_builder()
+    builder.add_error_stage('Discard')
+
+    rabbitmq_consumer = builder.add_stage('RabbitMQ Consumer')
+    rabbitmq_consumer.set_attributes(name=name,
+                                     data_format=data_format,
+                                     durable=durable,
+                                     auto_delete=False,
+                                     bindings=[],
+                                     prefetch_count=prefetch_count,
+                                     max_batch_size_in_records=1000)
+    trash = builder.add_stage('Trash')
+    rabbitmq_consumer >> trash
+
+    pipeline = builder.build(title='RabbitMQ Consumer performance pipeline').configure_for_environment(rabbitmq)
+
+    queue_operation(rabbitmq, 'queue_declare', queue=name, durable=durable, exclusive=False, auto_delete=False)
+    try:
+        def seed_queue():
+            queue_operation(rabbitmq, 'queue_purge', queue=name)
+            logger.info('Publishing %s messages into RabbitMQ queue %s ...', number_of_messages, name)
+            assert publish_messages(rabbitmq, name, (RAW_DATA[data_format] for _ in range(number_of_messages)),
+                                    persistent=durable) == 0
+
+        def benchmark_pipeline(executor, pipeline):
+            run_and_measure(executor, pipeline, number_of_messages, benchmark.extra_info)
+
+        benchmark.pedantic(benchmark_pipeline, args=(sdc_executor, pipeline), setup=seed_queue, rounds=2)
+    finally:
+        queue_operation(rabbitmq, 'queue_delete', queue=name)
+
+
+@rabbitmq
+@pytest.mark.parametrize('data_format', ('TEXT', 'JSON'))
+@pytest.mark.parametrize('durable', (True, False))
+@pytest.mark.parametrize('number_of_messages', (100_000, 1_000_000))
+def test_rabbitmq_producer(sdc_builder, sdc_executor, rabbitmq, benchmark, number_of_messages, durable, data_format):
+    """Performance benchmark a Dev Raw Data Source to RabbitMQ Producer pipeline.
+
+    RabbitMQ Producer pipeline:
+        dev_raw_data_source >> rabbitmq_producer
+    """
+    name = get_random_string(string.ascii_letters, 10)
+
+    builder = sdc_builder.get_pipeline_builder()
+    builder.add_error_stage('Discard')
+
+    dev_raw_data_source = builder.add_stage('Dev Raw Data Source')
+    dev_raw_data_source.set_attributes(data_format=data_format, raw_data=RAW_DATA[data_format])
+
+    rabbitmq_producer = builder.add_stage('RabbitMQ Producer')
+    rabbitmq_producer.set_attributes(name=name,
+                                     data_format=data_format,
+                                     durable=durable,
+                                     auto_delete=False,
+                                     bindings=[])
+    dev_raw_data_source >> rabbitmq_producer
+
+    pipeline = builder.build(title='RabbitMQ Producer performance pipeline').configure_for_environment(rabbitmq)
+
+    queue_operation(rabbitmq, 'queue_declare', queue=name, durable=durable, exclusive=False, auto_delete=False)
+    try:
+        def benchmark_pipeline(executor, pipeline):
+            run_and_measure(executor, pipeline, number_of_messages, benchmark.extra_info)
+
+        benchmark.pedantic(benchmark_pipeline, args=(sdc_executor, pipeline),
+                           setup=lambda: queue_operation(rabbitmq, 'queue_purge', queue=name), rounds=2)
+    finally:
+        queue_operation(rabbitmq, 'queue_delete', queue=name)
+
+
+def queue_operation(rabbitmq, operation, **kwargs):
+    """Run a single queue operation (e.g. ``'queue_purge'``) on a short-lived channel. Blocking connections do not
+    service heartbeats while idle, so one is not kept open for the duration of a benchmark.
+    """
+    connection = rabbitmq.blocking_connection
+    channel = connection.channel()
+    try:
+        getattr(channel, operation)(**kwargs)
+    finally:
+        channel.close()
+        connection.close()
+
+
+def run_and_measure(executor, pipeline, number_of_messages, extra_info):
+    """Run pipeline until it has output number_of_messages records and record the msgs/s in extra_info."""
+    pipeline.id = str(uuid.uuid4())
+    executor.add_pipeline(pipeline)
+
+    start_time = time.time()
+    start_command = executor.start_pipeline(pipeline)
+    try:
+        start_command.wait_for_pipeline_output_records_count(number_of_messages, timeout_sec=3600)
+        end_time = time.time()
+    finally:
+        # Also stop the pipeline when the wait fails, so that it doesn't keep consuming during the next test.
+        executor.stop_pipeline(pipeline).wait_for_stopped()
+        executor.remove_pipeline(pipeline)
+
+    messages_per_sec = number_of_messages / (end_time - start_time)
+    logger.info('Pipeline processed %s messages at %.2f msgs/s', number_of_messages, messages_per_sec)
+    extra_info.setdefault('msgs_per_sec', []).append(messages_per_sec)
@@ -0,0 +1,217 @@
+# Copyright 2019 StreamSets Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+The tests in this module are for running the Redis destination and the Redis Lookup processor, for the purpose of
+performance testing.
+
+Next to ops/s we take the calls per command from Redis' INFO commandstats before and after every run. In batch mode
+the stages pipeline the commands of a batch, which doesn't change the number of calls but shows up in ops/s; for the
+lookup processor, the number of GET calls against the number of lookups gives the cache hit ratio. The numbers are
+only complete when nothing else sends commands to the Redis server while the test runs.
+"""
+
+import logging
+import string
+import uuid
+
+import pytest
+from streamsets.testframework.markers import redis
+from streamsets.testframework.utils import get_random_string
+
+from performance.utils import (add_generated_key_source, add_generated_record_source, run_until_batch_count,
+                               run_until_output_records_count)
+
+logger = logging.getLogger(__name__)
+
+NUMBER_OF_KEYS = 100_000
+RECORDS_PER_BATCH = 1000
+# Keys are deleted and seeded this many at a time.
+KEY_CHUNK_SIZE = 10_000
+# Where the Redis destination takes the value of each data type from; lists and sets are written element by element.
+VALUE_FIELDS = {'STRING': '/value', 'LIST': '/elements', 'HASH': '/hash', 'SET': '/elements'}
+# Expressions of the record number, in /key, giving the value of each data type. Expressions can't make lists or maps,
+# so those are given as JSON for a Data Parser to parse.
+VALUE_EXPRESSIONS = {'STRING': "value${record:value('/key')}",
+                     'LIST': """["value${record:value('/key')}"]""",
+                     'HASH': """{"count": ${record:value('/key')}, "value": "value${record:value('/key')}"}""",
+                     'SET': """["value${record:value('/key')}"]"""}
+
+
+@pytest.fixture(scope='module')
+def sdc_builder_hook():
+    def hook(data_collector):
+        data_collector.SDC_JAVA_OPTS = '-Xmx8192m -Xms8192m'
+        # Let batches grow past the default limit of 1000 records.
+        data_collector.sdc_properties['production.maxBatchSize'] = '10000'
+    return hook
+
+
+@redis
+@pytest.mark.parametrize('records_per_batch', (100, 1000, 10_000))
+@pytest.mark.parametrize('data_type', ('STRING', 'LIST', 'HASH', 'SET'))
+@pytest.mark.parametrize('number_of_records', (1_000_000,))
+def test_redis_destination(sdc_builder, sdc_executor, redis, benchmark, number_of_records, data_type,
+                           records_per_batch):
+    """Performance benchmark a Redis destination pipeline in batch mode.
+
+    Records are spread over NUMBER_OF_KEYS keys, so lists and sets grow by an element per record. Only the data types
+    other than STRING go through the data parser.
+
+    Redis pipeline:
+        dev_data_generator >> expression_evaluator >> data_parser >> redis_destination
+    """
+    key_prefix = get_random_string(string.ascii_letters, 10)
+
+    builder = sdc_builder.get_pipeline_builder()
+    builder.add_error_stage('Discard')
+
+    # Values other than strings are set as JSON for the data parser to parse into the value field.
+    value_field = 'value' if data_type == 'STRING' else 'json'
+    expression_evaluator = add_generated_record_source(builder, number_of_records,
+                                                       {value_field: VALUE_EXPRESSIONS[data_type],
+                                                        'key': (f"{key_prefix}:"
+                                                                f"${{record:value('/key') mod {NUMBER_OF_KEYS}}}")},
+                                                       'key', records_per_batch)
+
+    redis_destination = builder.add_stage('Redis', type='destination')
+    redis_destination.set_attributes(mode='BATCH', fields=[{'keyExpr': '/key',
+                                                            'valExpr': VALUE_FIELDS[data_type],
+                                                            'dataType': data_type}])
+
+    if data_type == 'STRING':
+        expression_evaluator >> redis_destination
+    else:
+        data_parser = builder.add_stage('Data Parser')
+        data_parser.set_attributes(data_format='JSON', field_to_parse='/json', target_field=VALUE_FIELDS[data_type])
+        expression_evaluator >> data_parser >> redis_destination
+
+    pipeline = builder.build(title='Redis destination performance pipeline').configure_for_environment(redis)
+    pipeline.configuration['shouldRetry'] = False
+
+    try:
+        def delete_destination_keys():
+            # Every round starts without the keys, so that lists and sets don't keep the elements of earlier rounds.
+            delete_keys(redis.client, key_prefix)
+
+        def benchmark_pipeline(executor, pipeline):
+            pipeline.id = str(uuid.uuid4())
+            executor.add_pipeline(pipeline)
+
+            command_calls_before = get_command_calls(redis.client)
+            duration, _ = run_until_batch_count(executor, pipeline, number_of_records // records_per_batch)
+            command_calls = get_command_calls(redis.client, since=command_calls_before)
+            executor.remove_pipeline(pipeline)
+
+            throughput = number_of_records / duration
+            logger.info('Wrote %s records at %.2f ops/s with Redis command calls %s',
+                        number_of_records, throughput, command_calls)
+            benchmark.extra_info.setdefault('ops_per_sec', []).append(throughput)
+            benchmark.extra_info.setdefault('redis_command_calls', []).append(command_calls)
+
+        benchmark.pedantic(benchmark_pipeline, args=(sdc_executor, pipeline), setup=delete_destination_keys, rounds=2)
+    finally:
+        delete_keys(redis.client, key_prefix)
+
+
+@redis
+@pytest.mark.parametrize('mode', ('BATCH', 'RECORD'))
+@pytest.mark.parametrize('maximum_entries_to_cache', (None, NUMBER_OF_KEYS // 10))
+@pytest.mark.parametrize('distribution', ('HOT_KEY', 'COLD_KEY'))
+@pytest.mark.parametrize('number_of_lookups', (1_000_000,))
+def test_redis_lookup_processor(sdc_builder, sdc_executor, redis, benchmark, number_of_lookups, distribution,
+                                maximum_entries_to_cache, mode):
+    """Performance benchmark a Redis Lookup processor with keys from a given distribution.
+
+    Without maximum_entries_to_cache the local cache is disabled.
+
+    Redis Lookup pipeline:
+        dev_data_generator >> expression_evaluator >> redis_lookup_processor >> trash
+    """
+    key_prefix = get_random_string(string.ascii_letters, 10)
+
+    builder = sdc_builder.get_pipeline_builder()
+    builder.add_error_stage('Discard')
+
+    expression_evaluator = add_generated_key_source(builder, distribution, NUMBER_OF_KEYS, 'key', f'{key_prefix}:',
+                                                    RECORDS_PER_BATCH)
+
+    redis_lookup_processor = builder.add_stage('Redis Lookup Processor')
+    redis_lookup_processor.set_attributes(mode=mode,
+                                          lookup_parameters=[{'dataType': 'STRING',
+                                                              'keyExpr': "${record:value('/key')}",
+                                                              'outputFieldPath': '/value'}],
+                                          enable_local_caching=maximum_entries_to_cache is not None)
+    if maximum_entries_to_cache is not None:
+        redis_lookup_processor.set_attributes(maximum_entries_to_cache=maximum_entries_to_cache,
+                                              eviction_policy_type='EXPIRE_AFTER_WRITE',
+                                              expiration_time=60,
+                                              time_unit='SECONDS')
+
+    trash = builder.add_stage('Trash')
+
+    expression_evaluator >> redis_lookup_processor >> trash
+
+    pipeline = builder.build(title='Redis Lookup performance pipeline').configure_for_environment(redis)
+    pipeline.configuration['shouldRetry'] = False
+
+    try:
+        logger.info('Seeding %s Redis keys with prefix %s ...', NUMBER_OF_KEYS, key_prefix)
+        for start in range(0, NUMBER_OF_KEYS, KEY_CHUNK_SIZE):
+            redis.client.mset({f'{key_prefix}:{i}': f'value{i}' for i in range(start, start + KEY_CHUNK_SIZE)})
+
+        def benchmark_pipeline(executor, pipeline):
+            pipeline.id = str(uuid.uuid4())
+            executor.add_pipeline(pipeline)
+
+            command_calls_before = get_command_calls(redis.client)
+            duration, history = run_until_output_records_count(executor, pipeline, number_of_lookups)
+            command_calls = get_command_calls(redis.client, since=command_calls_before)
+
+            lookups = history.latest.metrics.counter('pipeline.batchOutputRecords.counter').count
+            executor.remove_pipeline(pipeline)
+
+            throughput = number_of_lookups / duration
+            hit_ratio = max(1 - command_calls.get('get', 0) / lookups, 0)
+            logger.info('Looked up %s keys at %.2f ops/s with Redis command calls %s (hit ratio %.4f)',
+                        lookups, throughput, command_calls, hit_ratio)
+            benchmark.extra_info.setdefault('ops_per_sec', []).append(throughput)
+            benchmark.extra_info.setdefault('redis_command_calls', []).append(command_calls)
+            benchmark.extra_info.setdefault('cache_hit_ratio', []).append(hit_ratio)
+
+        benchmark.pedantic(benchmark_pipeline, args=(sdc_executor, pipeline), rounds=2)
+    finally:
+        delete_keys(redis.client, key_prefix)
+
+
+def get_command_calls(client, since=None):
+    """Return the number of calls per command from INFO commandstats, minus those in since.
+
+    Returns:
+        A dict of command name to number of calls, of the commands called at least once.
+    """
+    command_calls = {name[len('cmdstat_'):]: stats['calls'] for name, stats in client.info('commandstats').items()}
+    if since is not None:
+        command_calls = {command: calls - since.get(command, 0) for command, calls in command_calls.items()}
+        # Leave out the INFO call that got since.
+        command_calls['info'] -= 1
+    return {command: calls for command, calls in command_calls.items() if calls}
+
+
+def delete_keys(client, key_prefix):
+    """Delete all keys starting with key_prefix, KEY_CHUNK_SIZE at a time."""
+    keys = list(client.scan_iter(match=f'{key_prefix}:*', count=KEY_CHUNK_SIZE))
+    logger.info('Deleting %s Redis keys with prefix %s ...', len(keys), key_prefix)
+    for start in range(0, len(keys), KEY_CHUNK_SIZE):
+        client.delete(*keys[start:start + KEY_CHUNK_SIZE])
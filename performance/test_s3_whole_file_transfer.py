@@ -0,0 +1,171 @@
+# Copyright 2019 StreamSets Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+The tests in this module move files between S3 prefixes with the Whole File data format, for the purpose of
+performance testing the S3 destination with files of 1 KB up to 5 GB. Next to the transfer rate we track SDC's peak
+heap usage, which has to stay flat however big the files get, and verify the checksum of every transferred file.
+The data sets are big enough that these tests are meant to be run with the aws environment pointed at a local S3
+stand-in (e.g. MinIO) rather than at AWS itself.
+"""
+
+import hashlib
+import logging
+import os
+import time
+import uuid
+
+import pytest
+from boto3.s3.transfer import TransferConfig
+from streamsets.testframework.markers import aws, sdc_min_version
+from streamsets.testframework.utils import get_random_string
+
+from stage.test_aws_s3_origin import S3_SANDBOX_PREFIX, delete_s3_objects, list_s3_keys, put_s3_objects
+
+logger = logging.getLogger(__name__)
+
+MB = 1024 * 1024
+# Files up to this size are generated in memory and uploaded through put_s3_objects, bigger ones are streamed.
+MAX_IN_MEMORY_FILE_SIZE = 16 * MB
+# Block that every generated file repeats, so that its content does not compress away.
+BLOCK = os.urandom(MB)
+
+
+@pytest.fixture(scope='module')
+def sdc_builder_hook():
+    def hook(data_collector):
+        data_collector.SDC_JAVA_OPTS = '-Xmx8192m -Xms8192m'
+    return hook
+
+
+@aws('s3')
+@sdc_min_version('3.7.0')
+@pytest.mark.parametrize('rate_per_second', ('-1', '${50 * MB}'))
+@pytest.mark.parametrize('number_of_threads', (1, 4, 8))
+@pytest.mark.parametrize('file_size, number_of_files', ((1024, 10_000),
+                                                        (MB, 1_000),
+                                                        (100 * MB, 20),
+                                                        (1024 * MB, 4),
+                                                        (5 * 1024 * MB, 2)))
+def test_s3_whole_file_transfer(sdc_builder, sdc_executor, aws, benchmark, heap_monitor,
+                                file_size, number_of_files, number_of_threads, rate_per_second):
+    """Performance benchmark an Amazon S3 origin to Amazon S3 destination pipeline with Whole File data format.
+
+    S3 Whole File pipeline:
+        s3_origin >> s3_destination
+        s3_origin >= pipeline_finished_executor
+    """
+    s3_bucket = aws.s3_bucket_name
+    source_key = f'{S3_SANDBOX_PREFIX}/{get_random_string()}/source'
+    destination_key = f'{S3_SANDBOX_PREFIX}/{get_random_string()}/destination'
+
+    builder = sdc_builder.get_pipeline_builder()
+    builder.add_error_stage('Discard')
+
+    s3_origin = builder.add_stage('Amazon S3', type='origin')
+    s3_origin.set_attributes(bucket=s3_bucket, data_format='WHOLE_FILE', prefix_pattern=f'{source_key}/*',
+                             number_of_threads=number_of_threads, read_order='LEXICOGRAPHICAL',
+                             rate_per_second=rate_per_second)
+
+    s3_destination = builder.add_stage('Amazon S3', type='destination')
+    s3_destination.set_attributes(bucket=s3_bucket, data_format='WHOLE_FILE', partition_prefix=destination_key,
+                                  file_name_expression="${record:value('/fileInfo/filename')}",
+                                  file_exists='OVERWRITE')
+
+    pipeline_finished_executor = builder.add_stage('Pipeline Finisher Executor')
+    pipeline_finished_executor.set_attributes(stage_record_preconditions=["${record:eventType() == 'no-more-data'}"])
+
+    s3_origin >> s3_destination
+    s3_origin >= pipeline_finished_executor
+
+    pipeline = builder.build(title='Amazon S3 Whole File performance pipeline').configure_for_environment(aws)
+    pipeline.configuration['shouldRetry'] = False
+
+    client = aws.s3
+    try:
+        expected_checksum = seed_files(client, s3_bucket, source_key, file_size, number_of_files)
+        total_mb = file_size * number_of_files / MB
+
+        def benchmark_pipeline(executor, pipeline):
+            pipeline.id = str(uuid.uuid4())
+            executor.add_pipeline(pipeline)
+
+            with heap_monitor(pipeline) as heap:
+                start_time = time.time()
+                executor.start_pipeline(pipeline).wait_for_finished(timeout_sec=3 * 3600)
+                end_time = time.time()
+
+            executor.remove_pipeline(pipeline)
+
+            logger.info('Transferred %.2f MB at %.2f MB/s, peak heap %.2f MB',
+                        total_mb, total_mb / (end_time - start_time), heap.peak / MB)
+            benchmark.extra_info.setdefault('mb_per_sec', []).append(total_mb / (end_time - start_time))
+            benchmark.extra_info.setdefault('peak_heap_mb', []).append(heap.peak / MB)
+
+        benchmark.pedantic(benchmark_pipeline, args=(sdc_executor, pipeline), rounds=2)
+
+        transferred_keys = list(list_s3_keys(client, s3_bucket, destination_key))
+        assert len(transferred_keys) == number_of_files
+        for key in transferred_keys:
+            assert get_s3_object_checksum(client, s3_bucket, key) == expected_checksum, key
+    finally:
+        delete_s3_objects(client, s3_bucket, source_key)
+        delete_s3_objects(client, s3_bucket, destination_key)
+
+
+class GeneratedFile:
+    """Read-only file-like object of size bytes, made of BLOCK repeated, so that big files never sit in memory."""
+    def __init__(self, size):
+        self.size = size
+        self.position = 0
+
+    def read(self, size=-1):
+        remaining = self.size - self.position
+        size = remaining if size is None or size < 0 else min(size, remaining)
+        chunks = []
+        while size > 0:
+            offset = self.position % len(BLOCK)
+            chunk = BLOCK[offset:offset + size]
+            chunks.append(chunk)
+            self.position += len(chunk)
+            size -= len(chunk)
+        return b''.join(chunks)
+
+
+def seed_files(client, bucket, prefix, file_size, number_of_files):
+    """Upload number_of_files generated files of file_size bytes under prefix and return their MD5 checksum."""
+    checksum = hashlib.md5()
+    generated_file = GeneratedFile(file_size)
+    for chunk in iter(lambda: generated_file.read(MB), b''):
+        checksum.update(chunk)
+
+    logger.info('Adding %s files of %s bytes under %s ...', number_of_files, file_size, prefix)
+    if file_size <= MAX_IN_MEMORY_FILE_SIZE:
+        body = GeneratedFile(file_size).read()
+        put_s3_objects(client, bucket, ((f'{prefix}/file{i}', body) for i in range(number_of_files)))
+    else:
+        # boto3 already runs the parts of a multipart upload concurrently, so big files go one by one.
+        transfer_config = TransferConfig(multipart_threshold=MAX_IN_MEMORY_FILE_SIZE,
+                                         multipart_chunksize=MAX_IN_MEMORY_FILE_SIZE)
+        for i in range(number_of_files):
+            client.upload_fileobj(GeneratedFile(file_size), bucket, f'{prefix}/file{i}', Config=transfer_config)
+    return checksum.hexdigest()
+
+
+def get_s3_object_checksum(client, bucket, key):
+    """Return the MD5 checksum of an S3 object, reading it in chunks rather than all at once."""
+    checksum = hashlib.md5()
+    for chunk in client.get_object(Bucket=bucket, Key=key)['Body'].iter_chunks(chunk_size=MB):
+        checksum.update(chunk)
+    return checksum.hexdigest()
@@ -0,0 +1,320 @@
+# Copyright 2019 StreamSets Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+The tests in this module are for running the Salesforce origin, destination and Salesforce Lookup processor over tens
+of thousands of records, for the purpose of performance testing.
+
+They run against a local stand-in for the Salesforce APIs, see :py:mod:`performance.salesforce_stand_in`, rather than
+an org, whose data storage and API requests would run out long before the tests are done. The numbers are hence for
+SDC and its Salesforce client on their own, without the latency and processing time of an org. Next to records/s we
+take the API requests the stand-in answered during every run, by API call.
+
+The stand-in's certificate comes from a CA made up for the test session, which SDC trusts through a truststore written
+into the SDC resources directory, the directory given to the test framework as --sdc-resources-directory.
+"""
+
+import logging
+import os
+import string
+import tempfile
+import uuid
+
+import pytest
+from streamsets.testframework.markers import sdc_min_version
+from streamsets.testframework.utils import get_random_string
+
+from performance.salesforce_stand_in import API_VERSION, CertificateAuthority, SalesforceStandIn
+from performance.utils import (add_generated_key_source, add_generated_record_source, run_until_batch_count,
+                               run_until_output_records_count)
+
+logger = logging.getLogger(__name__)
+
+CONTACTS_PER_ACCOUNT = 10
+LEAD_SOURCES = ['Advertisement', 'Partner', 'Web']
+# Expression picking the lead source of a record numbered in /FirstName, going through LEAD_SOURCES in turn.
+LEAD_SOURCE_EXPRESSION = '${{{}}}'.format(
+    ' : '.join(f"record:value('/FirstName') mod {len(LEAD_SOURCES)} == {i} ? '{lead_source}'"
+               for i, lead_source in enumerate(LEAD_SOURCES[:-1])) + f" : '{LEAD_SOURCES[-1]}'"
+)
+NUMBER_OF_LOOKUP_CONTACTS = 1000
+FIELD_MAPPING = [{'sdcField': '/FirstName', 'salesforceField': 'FirstName'},
+                 {'sdcField': '/LastName', 'salesforceField': 'LastName'},
+                 {'sdcField': '/Email', 'salesforceField': 'Email'},
+                 {'sdcField': '/LeadSource', 'salesforceField': 'LeadSource'}]
+EMAIL_DOMAIN = 'example.com'
+# Where the SDC Docker image has the SDC resources directory, $SDC_RESOURCES.
+SDC_RESOURCES = '/resources'
+TRUSTSTORE_PASSWORD = 'password'
+
+
+@pytest.fixture(scope='session')
+def certificate_authority():
+    """Make up a CA for the test session and write a truststore with it into the SDC resources directory.
+
+    Returns:
+        A tuple of the :py:class:`performance.salesforce_stand_in.CertificateAuthority` and the truststore's path in
+        SDC.
+    """
+    sdc_resources_directory = os.environ.get('SDC_RESOURCES_DIRECTORY')
+    if not sdc_resources_directory:
+        pytest.skip('Salesforce tests need an SDC resources directory for SDC to read the test truststore from.')
+
+    certificate_authority = CertificateAuthority()
+    with tempfile.TemporaryDirectory(dir=sdc_resources_directory) as truststore_directory:
+        truststore_file = os.path.join(truststore_directory, 'truststore.jks')
+        certificate_authority.write_truststore(truststore_file, TRUSTSTORE_PASSWORD)
+        yield certificate_authority, os.path.join(SDC_RESOURCES,
+                                                  os.path.relpath(truststore_file, sdc_resources_directory))
+
+
+@pytest.fixture(scope='module')
+def sdc_builder_hook(certificate_authority):
+    _, truststore_path = certificate_authority
+
+    def hook(data_collector):
+        # The truststore takes the place of the JVM's own, so this module's SDC trusts the test CA and no other.
+        data_collector.SDC_JAVA_OPTS = ('-Xmx8192m -Xms8192m '
+                                        f'-Djavax.net.ssl.trustStore={truststore_path} '
+                                        f'-Djavax.net.ssl.trustStorePassword={TRUSTSTORE_PASSWORD} '
+                                        '-Djavax.net.ssl.trustStoreType=JKS')
+        # Let batches grow past the default limit of 1000 records.
+        data_collector.sdc_properties['production.maxBatchSize'] = '10000'
+    return hook
+
+
+@pytest.fixture(scope='module')
+def salesforce_api(certificate_authority):
+    with SalesforceStandIn(certificate_authority[0]) as salesforce_api:
+        yield salesforce_api
+
+
+@sdc_min_version('3.8.0')
+@pytest.mark.parametrize('max_batch_size_in_records', (200, 1000, 10_000))
+@pytest.mark.parametrize('api, query_type', (('soap', 'SIMPLE'), ('bulk', 'SIMPLE'),
+                                             ('soap', 'SUBQUERY'), ('bulk', 'SUBQUERY'),
+                                             ('soap', 'AGGREGATE')))
+@pytest.mark.parametrize('number_of_records', (100_000,))
+def test_salesforce_origin(sdc_builder, sdc_executor, salesforce_api, benchmark, number_of_records, api, query_type,
+                           max_batch_size_in_records):
+    """Performance benchmark a Salesforce origin pipeline reading number_of_records contacts.
+
+    SIMPLE reads the contacts, SUBQUERY reads their accounts with the contacts of each account nested in it and
+    AGGREGATE counts the contacts per lead source, which the Bulk API doesn't support.
+
+    Salesforce pipeline:
+        salesforce_origin >> trash
+    """
+    name_prefix = get_random_string(string.ascii_letters, 10)
+    number_of_accounts = number_of_records // CONTACTS_PER_ACCOUNT
+
+    if query_type == 'SIMPLE':
+        query = ("SELECT Id, FirstName, LastName, Email, LeadSource FROM Contact "
+                 f"WHERE Id > '000000000000000' AND LastName LIKE '{name_prefix}%' ORDER BY Id")
+        expected_records = number_of_records
+    elif query_type == 'SUBQUERY':
+        query = ("SELECT Id, Name, (SELECT Id, LastName FROM Contacts ORDER BY Id) FROM Account "
+                 f"WHERE Id > '000000000000000' AND Name LIKE '{name_prefix}%' ORDER BY Id")
+        expected_records = number_of_accounts
+    else:
+        query = f"SELECT LeadSource, COUNT(Id) FROM Contact WHERE LastName LIKE '{name_prefix}%' GROUP BY LeadSource"
+        expected_records = len(LEAD_SOURCES)
+
+    builder = sdc_builder.get_pipeline_builder()
+    builder.add_error_stage('Discard')
+
+    salesforce_origin = builder.add_stage('Salesforce', type='origin')
+    salesforce_origin.set_attributes(soql_query=query,
+                                     use_bulk_api=(api == 'bulk'),
+                                     subscribe_for_notifications=False,
+                                     disable_query_validation=(query_type == 'AGGREGATE'),
+                                     max_batch_size_in_records=max_batch_size_in_records)
+    connect_to_stand_in(salesforce_origin, salesforce_api)
+
+    trash = builder.add_stage('Trash')
+
+    salesforce_origin >> trash
+
+    pipeline = builder.build(title='Salesforce origin performance pipeline')
+    pipeline.configuration['shouldRetry'] = False
+
+    try:
+        logger.info('Seeding %s accounts with %s contacts each, named with prefix %s ...',
+                    number_of_accounts, CONTACTS_PER_ACCOUNT, name_prefix)
+        account_ids = salesforce_api.insert_records('Account', [{'Name': f'{name_prefix}{i}'}
+                                                                for i in range(number_of_accounts)])
+        salesforce_api.insert_records('Contact', [{'AccountId': account_ids[i // CONTACTS_PER_ACCOUNT],
+                                                   'FirstName': f'Test{i}',
+                                                   'LastName': f'{name_prefix}{i}',
+                                                   'Email': f'{name_prefix}{i}@{EMAIL_DOMAIN}',
+                                                   'LeadSource': LEAD_SOURCES[i % len(LEAD_SOURCES)]}
+                                                  for i in range(number_of_records)])
+
+        def benchmark_pipeline(executor, pipeline):
+            pipeline.id = str(uuid.uuid4())
+            executor.add_pipeline(pipeline)
+
+            api_requests_before = salesforce_api.request_counts.copy()
+            duration, _ = run_until_output_records_count(executor, pipeline, expected_records)
+            api_requests = dict(salesforce_api.request_counts - api_requests_before)
+
+            executor.remove_pipeline(pipeline)
+
+            throughput = expected_records / duration
+            logger.info('Read %s records at %.2f records/s with API requests %s',
+                        expected_records, throughput, api_requests)
+            benchmark.extra_info.setdefault('records_per_sec', []).append(throughput)
+            benchmark.extra_info.setdefault('api_requests', []).append(api_requests)
+
+        benchmark.pedantic(benchmark_pipeline, args=(sdc_executor, pipeline), rounds=2)
+    finally:
+        salesforce_api.delete_records('Contact', 'LastName', name_prefix)
+        salesforce_api.delete_records('Account', 'Name', name_prefix)
+
+
+@sdc_min_version('3.8.0')
+@pytest.mark.parametrize('records_per_batch', (200, 1000, 10_000))
+@pytest.mark.parametrize('api', ('soap', 'bulk'))
+@pytest.mark.parametrize('number_of_records', (100_000,))
+def test_salesforce_destination(sdc_builder, sdc_executor, salesforce_api, benchmark, number_of_records, api,
+                                records_per_batch):
+    """Performance benchmark a Salesforce destination pipeline inserting number_of_records contacts.
+
+    Salesforce pipeline:
+        dev_data_generator >> expression_evaluator >> salesforce_destination
+    """
+    name_prefix = get_random_string(string.ascii_letters, 10)
+
+    builder = sdc_builder.get_pipeline_builder()
+    builder.add_error_stage('Discard')
+
+    number = "${record:value('/FirstName')}"
+    expression_evaluator = add_generated_record_source(builder, number_of_records,
+                                                       {'LastName': f'{name_prefix}{number}',
+                                                        'Email': f'{name_prefix}{number}@{EMAIL_DOMAIN}',
+                                                        'LeadSource': LEAD_SOURCE_EXPRESSION,
+                                                        'FirstName': f'Test{number}'},
+                                                       'FirstName', records_per_batch)
+
+    salesforce_destination = builder.add_stage('Salesforce', type='destination')
+    salesforce_destination.set_attributes(default_operation='INSERT',
+                                          field_mapping=FIELD_MAPPING,
+                                          sobject_type='Contact',
+                                          use_bulk_api=(api == 'bulk'))
+    connect_to_stand_in(salesforce_destination, salesforce_api)
+
+    expression_evaluator >> salesforce_destination
+
+    pipeline = builder.build(title='Salesforce destination performance pipeline')
+    pipeline.configuration['shouldRetry'] = False
+
+    try:
+        def delete_contacts():
+            # Every round starts without the contacts of earlier rounds, so that they don't get counted.
+            salesforce_api.delete_records('Contact', 'LastName', name_prefix)
+
+        def benchmark_pipeline(executor, pipeline):
+            pipeline.id = str(uuid.uuid4())
+            executor.add_pipeline(pipeline)
+
+            api_requests_before = salesforce_api.request_counts.copy()
+            duration, _ = run_until_batch_count(executor, pipeline, number_of_records // records_per_batch)
+            api_requests = dict(salesforce_api.request_counts - api_requests_before)
+
+            executor.remove_pipeline(pipeline)
+
+            assert salesforce_api.count_records('Contact', 'LastName', name_prefix) == number_of_records
+
+            throughput = number_of_records / duration
+            logger.info('Wrote %s records at %.2f records/s with API requests %s',
+                        number_of_records, throughput, api_requests)
+            benchmark.extra_info.setdefault('records_per_sec', []).append(throughput)
+            benchmark.extra_info.setdefault('api_requests', []).append(api_requests)
+
+        benchmark.pedantic(benchmark_pipeline, args=(sdc_executor, pipeline), setup=delete_contacts, rounds=2)
+    finally:
+        salesforce_api.delete_records('Contact', 'LastName', name_prefix)
+
+
+@sdc_min_version('3.8.0')
+@pytest.mark.parametrize('records_per_batch', (100, 1000))
+@pytest.mark.parametrize('number_of_lookups', (10_000,))
+def test_salesforce_lookup_processor(sdc_builder, sdc_executor, salesforce_api, benchmark, number_of_lookups,
+                                     records_per_batch):
+    """Performance benchmark a Salesforce Lookup processor looking up contacts by email.
+
+    The processor runs its query once per record, so every lookup is an API request of its own.
+
+    Records go through the emails of the seeded contacts in turn, with the name before the @ in /name.
+
+    Salesforce Lookup pipeline:
+        dev_data_generator >> expression_evaluator >> salesforce_lookup >> trash
+    """
+    name_prefix = get_random_string(string.ascii_letters, 10)
+
+    builder = sdc_builder.get_pipeline_builder()
+    builder.add_error_stage('Discard')
+
+    expression_evaluator = add_generated_key_source(builder, 'COLD_KEY', NUMBER_OF_LOOKUP_CONTACTS, 'name',
+                                                    name_prefix, records_per_batch)
+
+    salesforce_lookup = builder.add_stage('Salesforce Lookup')
+    # Changing " with ' and vice versa in following string makes the query execution fail.
+    salesforce_lookup.set_attributes(soql_query=("SELECT Id, FirstName, LastName, LeadSource FROM Contact "
+                                                 f"WHERE Email = '${{record:value(\"/name\")}}@{EMAIL_DOMAIN}'"))
+    connect_to_stand_in(salesforce_lookup, salesforce_api)
+
+    trash = builder.add_stage('Trash')
+
+    expression_evaluator >> salesforce_lookup >> trash
+
+    pipeline = builder.build(title='Salesforce Lookup performance pipeline')
+    pipeline.configuration['shouldRetry'] = False
+
+    try:
+        logger.info('Seeding %s contacts named with prefix %s ...', NUMBER_OF_LOOKUP_CONTACTS, name_prefix)
+        salesforce_api.insert_records('Contact', [{'FirstName': f'Test{i}',
+                                                   'LastName': f'{name_prefix}{i}',
+                                                   'Email': f'{name_prefix}{i}@{EMAIL_DOMAIN}',
+                                                   'LeadSource': LEAD_SOURCES[i % len(LEAD_SOURCES)]}
+                                                  for i in range(NUMBER_OF_LOOKUP_CONTACTS)])
+
+        def benchmark_pipeline(executor, pipeline):
+            pipeline.id = str(uuid.uuid4())
+            executor.add_pipeline(pipeline)
+
+            api_requests_before = salesforce_api.request_counts.copy()
+            duration, history = run_until_output_records_count(executor, pipeline, number_of_lookups)
+            api_requests = dict(salesforce_api.request_counts - api_requests_before)
+
+            lookups = history.latest.metrics.counter('pipeline.batchOutputRecords.counter').count
+            executor.remove_pipeline(pipeline)
+
+            throughput = lookups / duration
+            logger.info('Looked up %s records at %.2f records/s with API requests %s',
+                        lookups, throughput, api_requests)
+            benchmark.extra_info.setdefault('records_per_sec', []).append(throughput)
+            benchmark.extra_info.setdefault('api_requests', []).append(api_requests)
+
+        benchmark.pedantic(benchmark_pipeline, args=(sdc_executor, pipeline), rounds=2)
+    finally:
+        salesforce_api.delete_records('Contact', 'LastName', name_prefix)
+
+
+def connect_to_stand_in(stage, salesforce_api):
+    """Set stage up to log in to the Salesforce stand-in, which takes any username and password."""
+    stage.set_attributes(auth_endpoint=salesforce_api.auth_endpoint,
+                         username='stand-in',
+                         password='stand-in',
+                         api_version=API_VERSION)
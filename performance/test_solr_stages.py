@@ -0,0 +1,151 @@
+# Copyright 2019 StreamSets Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+The tests in this module are for indexing millions of records through the Solr destination, against Apache Solr and
+against the Solr service of a CDH cluster, for the purpose of performance testing.
+
+The Solr destination adds the documents of a batch and then commits them, so the latency of a batch in the
+destination's batch processing timer is its commit latency. After every run the test commits once more, waiting for
+a new searcher, and checks the number of documents Solr finds against the number of records written.
+"""
+
+import logging
+import string
+import uuid
+
+import pytest
+from streamsets.testframework.markers import cluster, sdc_min_version, solr
+from streamsets.testframework.utils import get_random_string
+
+from performance.utils import add_generated_record_source, run_until_batch_count
+
+logger = logging.getLogger(__name__)
+
+TITLE = 'Hello World from SDC & DPM! Very Long Message In Order To Spend More Time'
+
+
+@pytest.fixture(scope='module')
+def sdc_builder_hook():
+    def hook(data_collector):
+        data_collector.SDC_JAVA_OPTS = '-Xmx8192m -Xms8192m'
+        # Let batches grow past the default limit of 1000 records.
+        data_collector.sdc_properties['production.maxBatchSize'] = '10000'
+    return hook
+
+
+@solr
+@sdc_min_version('3.8.0')
+@pytest.mark.parametrize('wait_searcher, soft_commit', ((True, False), (False, False), (False, True)))
+@pytest.mark.parametrize('map_fields_automatically', (False, True))
+@pytest.mark.parametrize('records_per_batch', (100, 1000, 10_000))
+@pytest.mark.parametrize('number_of_records', (1_000_000,))
+def test_solr_destination_apache(sdc_builder, sdc_executor, solr, benchmark, number_of_records, records_per_batch,
+                                 map_fields_automatically, wait_searcher, soft_commit):
+    """Performance benchmark a Solr destination pipeline against Apache Solr.
+
+    Solr pipeline:
+        dev_data_generator >> expression_evaluator >> solr_target
+    """
+    benchmark_solr_destination(sdc_builder, sdc_executor, benchmark, solr, solr.client,
+                               dict(instance_type='SINGLE_NODE'), 'id', number_of_records, records_per_batch,
+                               map_fields_automatically, wait_searcher, soft_commit)
+
+
+@cluster('cdh')
+@sdc_min_version('3.8.0')
+@pytest.mark.parametrize('wait_searcher, soft_commit', ((True, False), (False, False), (False, True)))
+@pytest.mark.parametrize('map_fields_automatically', (False, True))
+@pytest.mark.parametrize('records_per_batch', (100, 1000, 10_000))
+@pytest.mark.parametrize('number_of_records', (1_000_000,))
+def test_solr_destination_cdh(sdc_builder, sdc_executor, cluster, benchmark, number_of_records, records_per_batch,
+                              map_fields_automatically, wait_searcher, soft_commit):
+    """Performance benchmark a Solr destination pipeline against the Solr service of a CDH cluster.
+
+    Solr pipeline:
+        dev_data_generator >> expression_evaluator >> solr_target
+    """
+    benchmark_solr_destination(sdc_builder, sdc_executor, benchmark, cluster, cluster.solr.client, {},
+                               cluster.solr.default_field_name, number_of_records, records_per_batch,
+                               map_fields_automatically, wait_searcher, soft_commit)
+
+
+def benchmark_solr_destination(sdc_builder, sdc_executor, benchmark, environment, solr_client, solr_attributes,
+                               id_field_name, number_of_records, records_per_batch, map_fields_automatically,
+                               wait_searcher, soft_commit):
+    """Benchmark a pipeline indexing number_of_records numbered documents into Solr in batch indexing mode.
+
+    Args:
+        environment: Environment the pipeline gets configured for.
+        solr_client (:py:class:`pysolr.Solr`): Client of the Solr collection the pipeline indexes into.
+        solr_attributes (:obj:`dict`): Solr destination attributes particular to the environment.
+        id_field_name (:obj:`str`): Name of the unique key field of the Solr schema.
+    """
+    # Documents get an id prefix of their own, which is how they are counted and deleted again.
+    id_prefix = get_random_string(string.ascii_letters, 10)
+
+    builder = sdc_builder.get_pipeline_builder()
+    builder.add_error_stage('Discard')
+
+    expression_evaluator = add_generated_record_source(builder, number_of_records,
+                                                       {'title': TITLE, 'id': f"{id_prefix}-${{record:value('/id')}}"},
+                                                       'id', records_per_batch)
+
+    solr_target = builder.add_stage('Solr', type='destination')
+    solr_target.set_attributes(record_indexing_mode='BATCH',
+                               map_fields_automatically=map_fields_automatically,
+                               ignore_optional_fields=True,
+                               wait_searcher=wait_searcher,
+                               soft_commit=soft_commit,
+                               **solr_attributes)
+    if map_fields_automatically:
+        solr_target.set_attributes(field_path_for_data='/')
+    else:
+        solr_target.set_attributes(fields=[{'field': '/id', 'solrFieldName': id_field_name},
+                                           {'field': '/title', 'solrFieldName': 'title'}])
+
+    expression_evaluator >> solr_target
+
+    pipeline = builder.build(title='Solr destination performance pipeline').configure_for_environment(environment)
+    pipeline.configuration['shouldRetry'] = False
+
+    query = f'{id_field_name}:{id_prefix}-*'
+    try:
+        def delete_documents():
+            # Every round starts without the documents of earlier rounds, so that they don't get counted.
+            solr_client.delete(q=query, commit=True)
+
+        def benchmark_pipeline(executor, pipeline):
+            pipeline.id = str(uuid.uuid4())
+            executor.add_pipeline(pipeline)
+
+            duration, history = run_until_batch_count(executor, pipeline, number_of_records // records_per_batch)
+            batch_timer = history.latest.metrics.timer(f'stage.{solr_target.instance_name}.batchProcessing.timer')
+            executor.remove_pipeline(pipeline)
+
+            # Without wait_searcher the last commit may not be searchable yet, so commit once more and wait for it.
+            solr_client.commit(waitSearcher=True)
+            num_found = solr_client.search(q=query, rows=0).hits
+            assert num_found == number_of_records
+
+            throughput = number_of_records / duration
+            logger.info('Indexed %s docs at %.2f docs/s with a mean commit latency of %.3f s',
+                        num_found, throughput, batch_timer._data.get('mean'))
+            benchmark.extra_info.setdefault('docs_per_sec', []).append(throughput)
+            benchmark.extra_info.setdefault('commit_latency_mean_sec', []).append(batch_timer._data.get('mean'))
+            benchmark.extra_info.setdefault('commit_latency_p99_sec', []).append(batch_timer._data.get('p99'))
+
+        benchmark.pedantic(benchmark_pipeline, args=(sdc_executor, pipeline), setup=delete_documents, rounds=2)
+    finally:
+        solr_client.delete(q=query, commit=True)
@@ -0,0 +1,148 @@
+# Copyright 2019 StreamSets Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Pipeline building blocks shared by the performance tests."""
+
+import time
+
+# Hot keys are the first 1% of the keys and get 90% of the lookups.
+HOT_KEY_SHARE = 0.9
+# Expressions giving the index of the key to look up, per key distribution, of the record's random LONGs and its
+# sequence number from 0 up. Cold keys go through all keys in turn, so that no key is looked up again before all others
+# have been, and misses go past the last key.
+KEY_INDEX_EXPRESSIONS = {
+    'UNIFORM': "math:abs(record:value('/random')) mod {number_of_keys}",
+    'HOT_KEY': ("math:abs(record:value('/draw')) mod 100 < {hot_key_percentage} ? "
+                "math:abs(record:value('/random')) mod {number_of_hot_keys} : "
+                "math:abs(record:value('/random')) mod {number_of_keys}"),
+    'COLD_KEY': "record:value('/sequence') mod {number_of_keys}",
+    'ALL_MISS': "{number_of_keys} + record:value('/sequence')",
+}
+# Fields the Dev Data Generator of add_generated_key_source() puts out for the expressions above.
+KEY_FIELDS_TO_GENERATE = [{'field': 'random', 'type': 'LONG'},
+                          {'field': 'draw', 'type': 'LONG'},
+                          {'field': 'sequence', 'type': 'LONG_SEQUENCE'}]
+
+
+def add_generated_record_source(builder, number_of_records, fields, number_field='number', records_per_batch=1000):
+    """Add stages generating records numbered from 0 up, of which the first number_of_records get through.
+
+    Records are numbered by a Dev Data Generator sequence and given their fields by an Expression Evaluator, so that
+    no script runs per record. Run the pipeline for number_of_records / records_per_batch batches, for instance with
+    :py:func:`run_until_batch_count`; records the generator puts out while the pipeline is being stopped are past
+    number_of_records and get discarded.
+
+    The added stages are wired up as:
+        dev_data_generator >> expression_evaluator
+
+    Args:
+        builder (:py:class:`streamsets.sdk.sdc_models.PipelineBuilder`): Pipeline builder to add the stages to.
+        number_of_records (:obj:`int`): Number of records to let through, a multiple of records_per_batch.
+        fields (:obj:`dict`): Field name to an expression giving its value. Expressions are evaluated in order on the
+            record, in which ``record:value('/<number_field>')`` is the record's number, so number_field itself may
+            be set by the last of them.
+        number_field (:obj:`str`, optional): Name of the field to number the records in. Default: ``'number'``
+        records_per_batch (:obj:`int`, optional): Number of records per batch. Default: ``1000``
+
+    Returns:
+        The Expression Evaluator putting out the records, to connect the rest of the pipeline to.
+    """
+    dev_data_generator = builder.add_stage('Dev Data Generator')
+    dev_data_generator.set_attributes(batch_size=records_per_batch, delay_between_batches=0)
+    dev_data_generator.fields_to_generate = [{'field': number_field, 'type': 'LONG_SEQUENCE'}]
+
+    expression_evaluator = builder.add_stage('Expression Evaluator')
+    expression_evaluator.set_attributes(on_record_error='DISCARD',
+                                        stage_record_preconditions=[f"${{record:value('/{number_field}') < "
+                                                                    f"{number_of_records}}}"])
+    expression_evaluator.field_expressions = [{'fieldToSet': f'/{name}', 'expression': expression}
+                                              for name, expression in fields.items()]
+
+    dev_data_generator >> expression_evaluator
+    return expression_evaluator
+
+
+def get_number_of_hot_keys(number_of_keys):
+    """Return how many of number_of_keys keys are hot in the HOT_KEY distribution."""
+    return number_of_keys // 100
+
+
+def add_generated_key_source(builder, distribution, number_of_keys, key_field, key_prefix='', records_per_batch=1000):
+    """Add stages generating records without end, each with a key to look up drawn from distribution.
+
+    Keys are drawn by an Expression Evaluator from the random LONGs and sequence number a Dev Data Generator puts in
+    the record, so that no script runs per record. The random LONGs aren't seeded, so runs look up different keys, but
+    drawn from the same distribution.
+
+    The added stages are wired up as:
+        dev_data_generator >> expression_evaluator
+
+    Args:
+        builder (:py:class:`streamsets.sdk.sdc_models.PipelineBuilder`): Pipeline builder to add the stages to.
+        distribution (:obj:`str`): One of ``'UNIFORM'``, ``'HOT_KEY'``, ``'COLD_KEY'`` and ``'ALL_MISS'``.
+        number_of_keys (:obj:`int`): Number of keys to look up, with indexes from 0 up.
+        key_field (:obj:`str`): Name of the field to put the key in.
+        key_prefix (:obj:`str`, optional): String to put before the key's index. Without it, the key is the index
+            as a LONG. Default: ``''``
+        records_per_batch (:obj:`int`, optional): Number of records per batch. Default: ``1000``
+
+    Returns:
+        The Expression Evaluator putting out the records, to connect the rest of the pipeline to.
+    """
+    dev_data_generator = builder.add_stage('Dev Data Generator')
+    dev_data_generator.set_attributes(batch_size=records_per_batch, delay_between_batches=0)
+    dev_data_generator.fields_to_generate = KEY_FIELDS_TO_GENERATE
+
+    key_index = KEY_INDEX_EXPRESSIONS[distribution].format(number_of_keys=number_of_keys,
+                                                           number_of_hot_keys=get_number_of_hot_keys(number_of_keys),
+                                                           hot_key_percentage=round(HOT_KEY_SHARE * 100))
+    expression_evaluator = builder.add_stage('Expression Evaluator')
+    expression_evaluator.field_expressions = [{'fieldToSet': f'/{key_field}',
+                                               'expression': f'{key_prefix}${{{key_index}}}'}]
+
+    dev_data_generator >> expression_evaluator
+    return expression_evaluator
+
+
+def run_until_output_records_count(executor, pipeline, count, timeout_sec=3600):
+    """Start pipeline, wait for it to put out count records and stop it, even if the wait fails.
+
+    The pipeline keeps going while it's being stopped, so what it really put out is to be taken from its history.
+
+    Returns:
+        A tuple of the seconds from start until count records were out and the pipeline's history.
+    """
+    return _run_until(executor, pipeline, 'wait_for_pipeline_output_records_count', count, timeout_sec)
+
+
+def run_until_batch_count(executor, pipeline, count, timeout_sec=3600):
+    """Start pipeline, wait for it to run count batches and stop it, even if the wait fails.
+
+    Unlike output records, batches also count the records that end up as error records.
+
+    Returns:
+        A tuple of the seconds from start until count batches were run and the pipeline's history.
+    """
+    return _run_until(executor, pipeline, 'wait_for_pipeline_batch_count', count, timeout_sec)
+
+
+def _run_until(executor, pipeline, wait_method_name, count, timeout_sec):
+    start_time = time.time()
+    start_command = executor.start_pipeline(pipeline)
+    try:
+        getattr(start_command, wait_method_name)(count, timeout_sec=timeout_sec)
+        duration = time.time() - start_time
+    finally:
+        executor.stop_pipeline(pipeline).wait_for_stopped()
+    return duration, executor.get_pipeline_history(pipeline)
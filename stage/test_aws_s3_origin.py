@@ -17,8 +17,10 @@ import logging
 import pytest
 import string
 import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 
-from streamsets.testframework.markers import aws, sdc_min_version
+from boto3.s3.transfer import TransferConfig
+from streamsets.testframework.markers import aws, large, sdc_min_version
 from streamsets.testframework.utils import get_random_string
 from xlwt import Workbook
 
@@ -31,6 +33,10 @@ DEFAULT_DATA_FORMAT = 'JSON'
 SINGLETHREADED = 1
 MULTITHREADED = 5
 DEFAULT_NUMBER_OF_RECORDS = 5
+# Settings used when seeding and cleaning up S3 in bulk.
+S3_UPLOAD_THREADS = 16
+S3_MULTIPART_THRESHOLD = 16 * 1024 * 1024
+S3_MAX_KEYS_PER_DELETE = 1000
 
 
 @pytest.fixture(scope='module')
@@ -89,8 +95,8 @@ def test_s3_origin_multithread_start_stop(sdc_builder, sdc_executor, aws):
 
         for iteration in range(1, 4):
             # Insert objects into S3.
-            for i in range(s3_obj_count):
-                client.put_object(Bucket=aws.s3_bucket_name, Key=f'{s3_key}/{iteration}-{i}', Body=json.dumps(data))
+            put_s3_objects(client, aws.s3_bucket_name,
+                           ((f'{s3_key}/{iteration}-{i}', json.dumps(data)) for i in range(s3_obj_count)))
 
             # In case of multithreaded pipeline we want to verify the amount of records.
             snapshot = sdc_executor.capture_snapshot(s3_origin_pipeline, start_pipeline=True).snapshot
@@ -121,10 +127,7 @@ def test_s3_origin_multithread_start_stop(sdc_builder, sdc_executor, aws):
 
     finally:
         # Clean up S3.
-        delete_keys = {'Objects': [{'Key': k['Key']}
-                                   for k in
-                                   client.list_objects_v2(Bucket=aws.s3_bucket_name, Prefix=s3_key)['Contents']]}
-        client.delete_objects(Bucket=aws.s3_bucket_name, Delete=delete_keys)
+        delete_s3_objects(client, aws.s3_bucket_name, s3_key)
 
 
 @aws('s3')
@@ -157,6 +160,15 @@ def test_s3_origin_multithreaded(sdc_builder, sdc_executor, aws):
     base_s3_origin(sdc_builder, sdc_executor, aws, DEFAULT_READ_ORDER, DEFAULT_DATA_FORMAT, 10, 50)
 
 
+@aws('s3')
+@large
+@sdc_min_version('3.7.0')
+@pytest.mark.parametrize('read_order', ['TIMESTAMP', 'LEXICOGRAPHICAL'])
+def test_s3_origin_multithreaded_many_objects(sdc_builder, sdc_executor, aws, read_order):
+    """Tests a multithreaded scenario with more objects than fit in a single S3 listing page."""
+    base_s3_origin(sdc_builder, sdc_executor, aws, read_order, DEFAULT_DATA_FORMAT, 10, 5000)
+
+
 def base_s3_origin(sdc_builder, sdc_executor, aws, read_order, data_format, number_of_threads, number_of_records):
     """Basic setup for amazon S3Origin tests. It receives different variables indicating the read order, data format...
     In order to parametrize all this configuration properties and make tests simpler.
@@ -202,8 +214,7 @@ def base_s3_origin(sdc_builder, sdc_executor, aws, read_order, data_format, numb
     client = aws.s3
     try:
         # Insert objects into S3.
-        for i in range(s3_obj_count):
-            client.put_object(Bucket=s3_bucket, Key=f'{s3_key}/{i}', Body=json.dumps(json_data))
+        put_s3_objects(client, s3_bucket, ((f'{s3_key}/{i}', json.dumps(json_data)) for i in range(s3_obj_count)))
 
         if number_of_threads == SINGLETHREADED:
             # Snapshot the pipeline and compare the records.
@@ -225,12 +236,78 @@ def base_s3_origin(sdc_builder, sdc_executor, aws, read_order, data_format, numb
             assert history.latest.metrics.counter('pipeline.batchOutputRecords.counter').count == s3_obj_count + 1
 
     finally:
-        if number_of_records > 0:
-            # Clean up S3.
-            delete_keys = {'Objects': [{'Key': k['Key']}
-                                       for k in
-                                       client.list_objects_v2(Bucket=s3_bucket, Prefix=s3_key)['Contents']]}
-            client.delete_objects(Bucket=s3_bucket, Delete=delete_keys)
+        # Clean up S3.
+        delete_s3_objects(client, s3_bucket, s3_key)
+
+
+def put_s3_objects(client, bucket, objects, max_workers=S3_UPLOAD_THREADS):
+    """Upload objects to S3 from a bounded pool of threads.
+
+    At most a few uploads per thread are queued at any time, so ``objects`` can be a generator for data sets that
+    should not be held in memory at once. Objects of ``S3_MULTIPART_THRESHOLD`` bytes or more are sent as multipart
+    uploads.
+
+    Args:
+        client (:py:class:`botocore.client.S3`): S3 client, e.g. ``aws.s3``.
+        bucket (:obj:`str`): Bucket name.
+        objects (:obj:`iterable` of :obj:`tuple`): (key, body) pairs, body being :obj:`str` or :obj:`bytes`.
+        max_workers (:obj:`int`, optional): Number of upload threads. Default: ``S3_UPLOAD_THREADS``
+
+    Returns:
+        The number of objects uploaded.
+    """
+    transfer_config = TransferConfig(multipart_threshold=S3_MULTIPART_THRESHOLD)
+
+    def upload(key, body):
+        if len(body) >= S3_MULTIPART_THRESHOLD:
+            body = body.encode() if isinstance(body, str) else body
+            client.upload_fileobj(io.BytesIO(body), bucket, key, Config=transfer_config)
+        else:
+            client.put_object(Bucket=bucket, Key=key, Body=body)
+
+    count = 0
+    pending = set()
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for key, body in objects:
+            if len(pending) >= 4 * max_workers:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    future.result()
+            pending.add(executor.submit(upload, key, body))
+            count += 1
+        for future in pending:
+            future.result()
+    logger.debug('Uploaded %s objects into bucket %s', count, bucket)
+    return count
+
+
+def list_s3_keys(client, bucket, prefix):
+    """Yield the keys of all objects under prefix, following list_objects_v2 pagination past 1,000 keys."""
+    for page in client.get_paginator('list_objects_v2').paginate(Bucket=bucket, Prefix=prefix):
+        for s3_object in page.get('Contents', []):
+            yield s3_object['Key']
+
+
+def delete_s3_objects(client, bucket, prefix):
+    """Delete all objects under prefix, in batches of as many keys as a single delete_objects call accepts."""
+    keys = []
+    deleted = 0
+    for key in list_s3_keys(client, bucket, prefix):
+        keys.append({'Key': key})
+        if len(keys) == S3_MAX_KEYS_PER_DELETE:
+            deleted += _delete_s3_keys(client, bucket, keys)
+            keys = []
+    if keys:
+        deleted += _delete_s3_keys(client, bucket, keys)
+    logger.debug('Deleted %s objects under %s/%s', deleted, bucket, prefix)
+    return deleted
+
+
+def _delete_s3_keys(client, bucket, keys):
+    response = client.delete_objects(Bucket=bucket, Delete={'Objects': keys, 'Quiet': True})
+    errors = response.get('Errors', [])
+    assert not errors, f'Failed to delete {len(errors)} objects from {bucket}, e.g. {errors[0]}'
+    return len(keys)
 
 
 def verify_data_formats(output_records, raw_str, data_format):
@@ -435,9 +512,7 @@ def test_s3_event_finisher(sdc_builder, sdc_executor, aws):
             logger.info('Stopping pipeline')
             sdc_executor.stop_pipeline(s3_origin_pipeline)
         # Clean up S3.
-        delete_keys = {'Objects': [{'Key': k['Key']}
-                                   for k in client.list_objects_v2(Bucket=s3_bucket, Prefix=s3_key)['Contents']]}
-        client.delete_objects(Bucket=s3_bucket, Delete=delete_keys)
+        delete_s3_objects(client, s3_bucket, s3_key)
 
 
 # SDC-11176 S3 Origin is only sending one no-more-data event, it should send one if there is some refill of data
@@ -528,9 +603,7 @@ if (state['record-count'] >= 2):
             sdc_executor.stop_pipeline(s3_origin_pipeline)
 
         # Clean up S3.
-        delete_keys = {'Objects': [{'Key': k['Key']}
-                                   for k in client.list_objects_v2(Bucket=s3_bucket, Prefix=s3_key)['Contents']]}
-        client.delete_objects(Bucket=s3_bucket, Delete=delete_keys)
+        delete_s3_objects(client, s3_bucket, s3_key)
 
 
 @aws('s3')
@@ -582,8 +655,7 @@ def test_s3_multiple_records_in_object(sdc_builder, sdc_executor, aws):
     client = aws.s3
     try:
         # Insert objects into S3.
-        for i in range(S3_OBJ_COUNT):
-            client.put_object(Bucket=s3_bucket, Key=f'{s3_key}{i}', Body=json.dumps(data))
+        put_s3_objects(client, s3_bucket, ((f'{s3_key}{i}', json.dumps(data)) for i in range(S3_OBJ_COUNT)))
 
         # Snapshot the pipeline and compare the records.
         snapshot = sdc_executor.capture_snapshot(s3_origin_pipeline, start_pipeline=True).snapshot
@@ -602,10 +674,7 @@ def test_s3_multiple_records_in_object(sdc_builder, sdc_executor, aws):
 
     finally:
         # Clean up S3.
-        delete_keys = {'Objects': [{'Key': k['Key']}
-                                   for k in
-                                   client.list_objects_v2(Bucket=s3_bucket, Prefix=s3_key)['Contents']]}
-        client.delete_objects(Bucket=s3_bucket, Delete=delete_keys)
+        delete_s3_objects(client, s3_bucket, s3_key)
 
 
 # SDC-11163: Amazon S3 origin never removes POLL_OFFSET key on upgrade
@@ -674,10 +743,7 @@ def test_offset_upgrade(sdc_builder, sdc_executor, aws):
         assert history.latest.metrics.counter('pipeline.batchOutputRecords.counter').count == 2
     finally:
         # Clean up S3.
-        delete_keys = {'Objects': [{'Key': k['Key']}
-                                   for k in
-                                   client.list_objects_v2(Bucket=s3_bucket, Prefix=s3_key)['Contents']]}
-        client.delete_objects(Bucket=s3_bucket, Delete=delete_keys)
+        delete_s3_objects(client, s3_bucket, s3_key)
 
 
 # SDC-11410: S3 Origin reads excel files
@@ -763,6 +829,4 @@ def test_s3_excel_offset(sdc_builder, sdc_executor, aws):
             logger.info('Stopping pipeline')
             sdc_executor.stop_pipeline(s3_origin_pipeline)
         # Clean up S3.
-        delete_keys = {'Objects': [{'Key': k['Key']}
-                                   for k in client.list_objects_v2(Bucket=s3_bucket, Prefix=s3_key)['Contents']]}
-        client.delete_objects(Bucket=s3_bucket, Delete=delete_keys)
+        delete_s3_objects(client, s3_bucket, s3_key)
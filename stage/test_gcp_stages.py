@@ -15,11 +15,10 @@
 import base64
 import logging
 import math
-import time
+import threading
 import uuid
 from datetime import datetime
 from string import ascii_letters, ascii_lowercase
-from time import sleep
 
 from google.cloud.bigquery import Dataset, SchemaField, Table
 from streamsets.testframework.markers import gcp, sdc_min_version
@@ -31,6 +30,7 @@ DEFAULT_COLUMN_FAMILY_NAME = 'cf'  # for Google Bigtable
 # For Google pub/sub
 MSG_DATA = 'Hello World from SDC and DPM!'
 SNAPSHOT_TIMEOUT_SEC = 120
+RECEIVE_TIMEOUT_SEC = 60
 # For Google BigQuery, data to insert- needs to be in the sorted order by name.
 
 bytes_column = base64.b64encode("dataAsBytes".encode('utf-8'))
@@ -380,25 +380,13 @@ def test_google_pubsub_publisher(sdc_builder, sdc_executor, gcp):
         msgs_sent_count = history.latest.metrics.counter('pipeline.batchOutputRecords.counter').count
         logger.info('No. of messages sent in the pipeline = %s ...', msgs_sent_count)
 
-        msgs_to_be_received = msgs_sent_count
-        results = []
-
-        def callback(message):
-            nonlocal msgs_to_be_received
-            msgs_to_be_received = msgs_to_be_received - 1
-            results.append(message)
-            message.ack()
-
-        # Open the subscription, passing the callback.
-        future = pubsub_subscriber_client.subscribe(subscription_path, callback)
-
-        timeout = 5  # in seconds
-        start_time = time.time()
-        while time.time() < start_time + timeout and msgs_to_be_received > 0:
-            sleep(0.5)
-            logger.info('To be received messages %d...', msgs_to_be_received)
-
-        future.cancel()  # cancel the feature there by stopping subscribers
+        # Open the subscription, passing a collector that wakes us up as soon as all messages arrived.
+        collector = PubSubMessageCollector()
+        future = pubsub_subscriber_client.subscribe(subscription_path, collector)
+        try:
+            results = collector.wait_for_messages(msgs_sent_count)
+        finally:
+            future.cancel()  # cancel the feature there by stopping subscribers
 
         # Verify
         msgs_received = [message.data.decode().rstrip('\n') for message in results]
@@ -409,6 +397,42 @@ def test_google_pubsub_publisher(sdc_builder, sdc_executor, gcp):
         pubsub_publisher_client.delete_topic(topic_path)
 
 
+class PubSubMessageCollector:
+    """Google pub/sub subscriber callback that acks and collects the messages it receives.
+
+    Threads waiting for messages are notified on every arrival, rather than having to poll for them.
+
+    Args:
+        keep_messages (:obj:`bool`, optional): Keep the received messages, rather than only counting them.
+            Default: ``True``
+    """
+    def __init__(self, keep_messages=True):
+        self.keep_messages = keep_messages
+        self.count = 0
+        self.messages = []
+        self._condition = threading.Condition()
+
+    def __call__(self, message):
+        message.ack()
+        with self._condition:
+            self.count += 1
+            if self.keep_messages:
+                self.messages.append(message)
+            self._condition.notify_all()
+
+    def wait_for_messages(self, count, timeout_sec=RECEIVE_TIMEOUT_SEC):
+        """Block until at least count messages were received and return the collected messages.
+
+        Raises:
+            :py:obj:`TimeoutError`: If fewer than count messages were received within timeout_sec.
+        """
+        with self._condition:
+            if not self._condition.wait_for(lambda: self.count >= count, timeout=timeout_sec):
+                raise TimeoutError('Received {} of {} pub/sub messages within {} s.'.format(self.count, count,
+                                                                                          timeout_sec))
+            return list(self.messages)
+
+
 @gcp
 @sdc_min_version('2.7.0.0')
 def test_google_bigtable_destination(sdc_builder, sdc_executor, gcp):
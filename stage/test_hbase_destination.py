@@ -869,9 +869,9 @@ def test_hbase_multiple_records(sdc_builder, sdc_executor, cluster):
         sdc_executor.start_pipeline(pipeline)
         sdc_executor.stop_pipeline(pipeline)
 
-        scan = cluster.hbase.client.table(random_table_name).scan()
+        scan = list(cluster.hbase.client.table(random_table_name).scan())
 
-        assert 0 != len(list(scan))
+        assert 0 != len(scan)
 
         for element in scan:
             assert element[0] == expected_key
@@ -1258,9 +1258,9 @@ def test_hbase_custom_time_basis(sdc_builder, sdc_executor, cluster):
         sdc_executor.start_pipeline(pipeline)
         sdc_executor.stop_pipeline(pipeline)
 
-        scan = cluster.hbase.client.table(random_table_name).scan()
+        scan = list(cluster.hbase.client.table(random_table_name).scan())
 
-        assert 0 != len(list(scan))
+        assert 0 != len(scan)
 
         for element in scan:
             assert element[0] == expected_key
@@ -1335,9 +1335,9 @@ def test_hbase_empty_time_basis(sdc_builder, sdc_executor, cluster):
         sdc_executor.start_pipeline(pipeline)
         sdc_executor.stop_pipeline(pipeline)
 
-        scan = cluster.hbase.client.table(random_table_name).scan()
+        scan = list(cluster.hbase.client.table(random_table_name).scan())
 
-        assert 0 != len(list(scan))
+        assert 0 != len(scan)
 
         for element in scan:
             assert element[0] == expected_key
@@ -1412,9 +1412,9 @@ def test_hbase_now_time_basis(sdc_builder, sdc_executor, cluster):
         sdc_executor.start_pipeline(pipeline)
         sdc_executor.stop_pipeline(pipeline)
 
-        scan = cluster.hbase.client.table(random_table_name).scan()
+        scan = list(cluster.hbase.client.table(random_table_name).scan())
 
-        assert 0 != len(list(scan))
+        assert 0 != len(scan)
 
         for element in scan:
             assert element[0] == expected_key
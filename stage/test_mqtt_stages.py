@@ -19,6 +19,9 @@ from streamsets.testframework.markers import mqtt
 
 logger = logging.getLogger(__name__)
 
+# Payload of the retained messages published to find out whether an MQTT Subscriber is listening.
+READINESS_PROBE_PAYLOAD = 'sdc-mqtt-readiness-probe'
+
 
 @mqtt
 def test_raw_to_mqtt(sdc_builder, sdc_executor, mqtt_broker):
@@ -87,6 +90,7 @@ def test_mqtt_to_trash(sdc_builder, sdc_executor, mqtt_broker):
     # pylint: disable=too-many-locals
 
     data_topic = 'mqtt_subscriber_topic'
+    probe_topic = 'mqtt_subscriber_probe_topic'
     try:
         mqtt_broker.initialize(initial_topics=[data_topic])
 
@@ -94,7 +98,7 @@ def test_mqtt_to_trash(sdc_builder, sdc_executor, mqtt_broker):
 
         mqtt_source = pipeline_builder.add_stage('MQTT Subscriber')
         mqtt_source.configuration.update({'subscriberConf.dataFormat': 'TEXT',
-                                          'subscriberConf.topicFilters': [data_topic]})
+                                          'subscriberConf.topicFilters': [data_topic, probe_topic]})
 
         trash = pipeline_builder.add_stage('Trash')
 
@@ -103,15 +107,16 @@ def test_mqtt_to_trash(sdc_builder, sdc_executor, mqtt_broker):
         pipeline = pipeline_builder.build().configure_for_environment(mqtt_broker)
         sdc_executor.add_pipeline(pipeline)
 
+        # it takes a bit of time for the pipeline to ACTUALLY start listening on the MQTT port, so
+        # the messages won't be delivered (without setting persist) until a probe makes it through
+        sdc_executor.start_pipeline(pipeline)
+        wait_for_subscriber_ready(sdc_executor, pipeline, mqtt_broker, probe_topic)
+
         # the MQTT origin produces a single batch for each message it receieves, so we need
         # to run a separate snapshot for each message to be received
-        running_snapshot = sdc_executor.capture_snapshot(pipeline, start_pipeline=True,
+        running_snapshot = sdc_executor.capture_snapshot(pipeline, start_pipeline=False,
                                                          batches=10, wait=False)
 
-        # can't figure out a cleaner way to do this; it takes a bit of time for the pipeline
-        # to ACTUALLY start listening on the MQTT port, so if we don't sleep here, the
-        # messages won't be delivered (without setting persist)
-        time.sleep(1)
         expected_messages = set()
         for i in range(10):
             expected_message = 'Message {0}'.format(i)
@@ -133,3 +138,36 @@ def test_mqtt_to_trash(sdc_builder, sdc_executor, mqtt_broker):
         assert len(expected_messages) == 0
     finally:
         mqtt_broker.destroy()
+
+
+def wait_for_subscriber_ready(sdc_executor, pipeline, mqtt_broker, probe_topic, timeout_sec=60):
+    """Wait until the MQTT Subscriber of a running pipeline receives messages.
+
+    A single retained probe message is published to ``probe_topic``, which the subscriber must have among its topic
+    filters. The broker hands a retained message to a client as soon as it subscribes, so the probe is delivered
+    whether it was published before or after the subscription, and it is only published once so that no later probe
+    can end up among the messages a caller goes on to check.
+
+    Args:
+        sdc_executor (:py:class:`streamsets.testframework.sdc.DataCollector`): Data Collector running the pipeline.
+        pipeline (:py:class:`streamsets.sdk.sdc_models.Pipeline`): Started pipeline with an MQTT Subscriber origin.
+        mqtt_broker (:py:class:`streamsets.testframework.environments.mqtt.MQTTBroker`): MQTT broker.
+        probe_topic (:obj:`str`): Topic to publish the probe to.
+        timeout_sec (:obj:`int`, optional): Time to wait before giving up. Default: ``60``
+
+    Returns:
+        The pipeline's output record count once it has seen the probe, so that callers can offset later counts.
+    """
+    start_time = time.time()
+    mqtt_broker.publish_message(topic=probe_topic, payload=READINESS_PROBE_PAYLOAD, qos=2, retain=True)
+    while time.time() - start_time < timeout_sec:
+        metrics = sdc_executor.api_client.get_pipeline_metrics(pipeline.id)
+        output_records_count = (metrics.get('counters', {})
+                                       .get('pipeline.batchOutputRecords.counter', {})
+                                       .get('count', 0))
+        if output_records_count:
+            logger.debug('MQTT Subscriber became ready after %.2f s.', time.time() - start_time)
+            return output_records_count
+        time.sleep(0.2)
+
+    raise TimeoutError('MQTT Subscriber did not receive a readiness probe within {} s.'.format(timeout_sec))
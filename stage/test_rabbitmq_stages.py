@@ -22,6 +22,9 @@ from streamsets.testframework.utils import get_random_string
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
 
+# Maximum number of published messages awaiting a broker confirm when seeding queues.
+PUBLISH_CONFIRM_WINDOW = 1000
+
 
 @rabbitmq
 def test_rabbitmq_rabbitmq_consumer(sdc_builder, sdc_executor, rabbitmq):
@@ -52,27 +55,18 @@ def test_rabbitmq_rabbitmq_consumer(sdc_builder, sdc_executor, rabbitmq):
     sdc_executor.add_pipeline(consumer_origin_pipeline)
 
     # run pipeline and capture snapshot
-    expected_messages = set()
     connection = rabbitmq.blocking_connection
     channel = connection.channel()
     try:
         # https://www.rabbitmq.com/tutorials/amqp-concepts.html about default exchange routing
         channel.queue_declare(queue=name, durable=True, exclusive=False, auto_delete=False)
-        channel.confirm_delivery()
-        for i in range(10):
-            expected_message = 'Message {0}'.format(i)
-            if channel.basic_publish(exchange="",
-                                     routing_key=name,  # routing key has to be same as queue name
-                                     body=expected_message,
-                                     properties=pika.BasicProperties(content_type='text/plain',
-                                                                     delivery_mode=1),
-                                     mandatory=True):
-                expected_messages.add(expected_message)
-            else:
-                logger.warning('Message %s could not be confirmed.', expected_message)
     finally:
         channel.close()
         connection.close()
+
+    expected_messages = {'Message {0}'.format(i) for i in range(10)}
+    assert publish_messages(rabbitmq, name, expected_messages, persistent=False) == 0
+
     # messages are published, read through the pipeline and assert
     snapshot = sdc_executor.capture_snapshot(consumer_origin_pipeline, start_pipeline=True).snapshot
     sdc_executor.stop_pipeline(consumer_origin_pipeline)
@@ -138,3 +132,85 @@ def test_rabbitmq_producer_target(sdc_builder, sdc_executor, rabbitmq):
     logger.debug('Number of messages received from RabbitMQ = %d', (len(msgs_received)))
 
     assert msgs_received == [raw_str] * msgs_sent_count
+
+
+def publish_messages(rabbitmq, queue, messages, persistent=True, window=PUBLISH_CONFIRM_WINDOW):
+    """Publish messages to a queue through the default exchange using asynchronous publisher confirms.
+
+    Instead of waiting for a broker round-trip after every message, up to ``window`` messages are kept unconfirmed
+    at any time and confirms (which can acknowledge several delivery tags at once) are handled as they arrive.
+    Messages are published as mandatory, so that the broker returns the ones no queue takes instead of confirming
+    them.
+
+    Args:
+        rabbitmq (:py:class:`streamsets.testframework.environments.rabbitmq.RabbitMQInstance`): RabbitMQ environment.
+        queue (:obj:`str`): Name of an existing queue, used as the routing key.
+        messages (:obj:`iterable` of :obj:`str`): Message bodies to publish.
+        persistent (:obj:`bool`, optional): Publish with delivery mode 2 (persistent) instead of 1. Default: ``True``
+        window (:obj:`int`, optional): Maximum number of unconfirmed messages. Default: ``PUBLISH_CONFIRM_WINDOW``
+
+    Returns:
+        The number of messages the broker rejected (nacked) or returned as unroutable.
+    """
+    # Asynchronous confirms need SelectConnection, which STF has no counterpart of the blocking connection for. Like
+    # the blocking connection, it connects through the environment's URI, which holds the virtual host and whether
+    # to use SSL (amqps), with the environment's credentials.
+    parameters = pika.URLParameters(rabbitmq.uri)
+    parameters.credentials = pika.PlainCredentials(rabbitmq.username, rabbitmq.password)
+
+    messages = iter(messages)
+    properties = pika.BasicProperties(content_type='text/plain', delivery_mode=2 if persistent else 1)
+    outstanding = set()
+    state = dict(delivery_tag=0, nacked=0, returned=0, closing=False, error=None)
+
+    def publish(channel):
+        while len(outstanding) < window:
+            body = next(messages, None)
+            if body is None:
+                if not outstanding and not state['closing']:
+                    state['closing'] = True
+                    connection.close()
+                return
+            channel.basic_publish(exchange='', routing_key=queue, body=body, properties=properties, mandatory=True)
+            state['delivery_tag'] += 1
+            outstanding.add(state['delivery_tag'])
+
+    def on_channel_open(channel):
+        def on_confirm(frame):
+            method = frame.method
+            if method.multiple:
+                confirmed = {tag for tag in outstanding if tag <= method.delivery_tag}
+            else:
+                confirmed = {method.delivery_tag}
+            outstanding.difference_update(confirmed)
+            if isinstance(method, pika.spec.Basic.Nack):
+                state['nacked'] += len(confirmed)
+            publish(channel)
+
+        def on_return(_channel, method, properties, body):
+            # The broker returns an unroutable message ahead of confirming it.
+            state['returned'] += 1
+
+        channel.add_on_return_callback(on_return)
+        channel.confirm_delivery(on_confirm)
+        publish(channel)
+
+    def on_open_error(_connection, error):
+        state['error'] = error
+        connection.ioloop.stop()
+
+    connection = pika.SelectConnection(parameters,
+                                       on_open_callback=lambda conn: conn.channel(on_open_callback=on_channel_open),
+                                       on_open_error_callback=on_open_error,
+                                       on_close_callback=lambda *args: connection.ioloop.stop())
+    connection.ioloop.start()
+
+    if state['error']:
+        raise Exception('Could not connect to RabbitMQ: {}'.format(state['error']))
+    if state['nacked']:
+        logger.warning('%s of %s messages published to %s could not be confirmed.',
+                       state['nacked'], state['delivery_tag'], queue)
+    if state['returned']:
+        logger.warning('%s of %s messages published to %s were returned as unroutable.',
+                       state['returned'], state['delivery_tag'], queue)
+    return state['nacked'] + state['returned']